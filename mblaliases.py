@@ -0,0 +1,133 @@
+# Book names in all spellings: the internal abbreviations of books.xml and the book names of servers.xml
+import re
+
+from msbiblelib.mblcatalog import get_catalog
+from msbiblelib.mblurls import BOOK_NAME_FIELDS
+
+
+# Characters that are ignored in book names: "1. Mose", "1 Mose", "1Mose" are the same book
+_NAME_SEPARATORS = re.compile(r'[.\s]')
+
+# Prefixes shorter than this are not resolved, even if they are unique
+_MIN_PREFIX = 2
+
+# A reference with a book name: book, then chapter and verse numbers or a to-book.
+# The book name is everything up to the first digit or dash (a leading digit belongs to the name: "1. Mose")
+_NAMED_REFERENCE = re.compile(
+    r'^\s*(\d?[^\d\-–]+?)\s*'
+    r'(?:(\d[\d.,:\s\-–]*)|[-–]\s*(\d?[^\d\-–]+?))?\s*$'
+)
+
+_DASHES_AND_BLANKS = str.maketrans({'–': '-', ' ': None, '\t': None})
+
+
+def _name_key(name):
+    # Lower case, without dots and blanks
+    return _NAME_SEPARATORS.sub('', name).lower()
+
+
+def _build_alias_names(catalog):
+    # Name key -> upper case abbreviation. The abbreviations of books.xml always win over server book names;
+    # between servers, the first one in servers.xml wins
+    names = {}
+    for server in catalog.servers:
+        for book in server['books']:
+            for field in BOOK_NAME_FIELDS:
+                if book.get(field):
+                    names.setdefault(_name_key(book[field]), book['abbreviation'].upper())
+    for book in catalog.books:
+        names[_name_key(book['abbrev'])] = book['abbrev'].upper()
+    return names
+
+
+class _AliasTable:
+    """
+    names: name key -> abbreviation
+    prefixes: every prefix of a name key (from _MIN_PREFIX characters) -> abbreviation, None if the prefix
+    belongs to names of several books
+    """
+
+    def __init__(self, catalog):
+        self.names = _build_alias_names(catalog)
+        self.prefixes = {}
+        for key, abbrev in self.names.items():
+            for end in range(_MIN_PREFIX, len(key)):
+                prefix = key[:end]
+                self.prefixes[prefix] = abbrev if self.prefixes.get(prefix, abbrev) == abbrev else None
+
+        # Abbreviation -> its names, in the order they were found
+        self.book_names = {}
+        for key, abbrev in self.names.items():
+            self.book_names.setdefault(abbrev, []).append(key)
+
+
+def _build_alias_table(catalog):
+    return _AliasTable(catalog)
+
+
+class AliasIndex:
+    """
+    Resolves book names as users type them ("Römer", "Röm", "Rom", "Romans", "1. Mose", "1 Joh") to the internal
+    abbreviations of books.xml, with one dictionary lookup. Case, dots and blanks do not matter
+    Known are the abbreviations of books.xml and all book names of servers.xml (name_de, name_en, name_extra),
+    and every prefix of them that belongs to one book only ("Offenba" -> OFF). A known name always wins over
+    a prefix ("Jo" is a name, not a prefix of "Joh")
+
+    Pass it to References(aliases=...) to parse references with book names: "Römer 8,28", "1. Mose 1-3"
+    """
+
+    def __init__(self):
+        get_catalog().bind(self, {'_table': ('aliases', _build_alias_table)})
+
+    def __reduce__(self):
+        # The index has no state of its own: in another process (e.g. a worker of References.parse_references())
+        # it is built from the catalog of that process
+        return AliasIndex, ()
+
+    def __len__(self):
+        return len(self._table.names)
+
+    def resolve(self, name):
+        """Returns the upper case abbreviation of a book name or of a unique prefix; None if there is none"""
+        return self._resolve(self._table, name)
+
+    @staticmethod
+    def _resolve(table, name):
+        # Takes the table as argument, so one call sees one version of the aliases also if they are reloaded
+        key = _name_key(name)
+        abbrev = table.names.get(key)
+        if abbrev is None and len(key) >= _MIN_PREFIX:
+            abbrev = table.prefixes.get(key)
+        return abbrev
+
+    def is_known_name(self, name):
+        """True for complete names only, not for prefixes"""
+        return _name_key(name) in self._table.names
+
+    def get_book_names(self, abbrev):
+        """Returns all known names of a book (lower case, without dots and blanks)"""
+        return list(self._table.book_names.get(abbrev.upper(), ()))
+
+    def normalize_reference(self, reference):
+        """
+        Replaces the book names of a reference by the internal abbreviations and removes the blanks:
+        "Römer 8, 28" -> "röm8,28", "1. Mose - 2. Mose" -> "gen-ex"
+        Names that cannot be resolved, and references of another form, are returned as they are (without blanks),
+        so parse_reference() reports them
+        """
+        match = _NAMED_REFERENCE.match(reference)
+        if match is None:
+            return reference.translate(_DASHES_AND_BLANKS)
+
+        table = self._table
+        book, numbers, tobook = match.groups()
+        result = self._resolve_lower(table, book)
+        if numbers is not None:
+            result += numbers.translate(_DASHES_AND_BLANKS)
+        elif tobook is not None:
+            result += '-' + self._resolve_lower(table, tobook)
+        return result
+
+    def _resolve_lower(self, table, name):
+        abbrev = self._resolve(table, name)
+        return abbrev.lower() if abbrev is not None else name.translate(_DASHES_AND_BLANKS)
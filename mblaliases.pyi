@@ -0,0 +1,37 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from .mblcatalog import Catalog
+
+_NAME_SEPARATORS: re.Pattern
+_MIN_PREFIX: int
+_NAMED_REFERENCE: re.Pattern
+_DASHES_AND_BLANKS: Dict[int, Optional[str]]
+
+def _name_key(name: str) -> str: ...
+def _build_alias_names(catalog: Catalog) -> Dict[str, str]: ...
+
+
+class _AliasTable:
+    names: Dict[str, str]
+    prefixes: Dict[str, Optional[str]]
+    book_names: Dict[str, List[str]]
+
+    def __init__(self, catalog: Catalog) -> None: ...
+
+
+def _build_alias_table(catalog: Catalog) -> _AliasTable: ...
+
+
+class AliasIndex:
+    _table: _AliasTable
+
+    def __init__(self) -> None: ...
+    def __reduce__(self) -> Tuple[type, Tuple[()]]: ...
+    def __len__(self) -> int: ...
+    def resolve(self, name: str) -> Optional[str]: ...
+    @staticmethod
+    def _resolve(table: _AliasTable, name: str) -> Optional[str]: ...
+    def is_known_name(self, name: str) -> bool: ...
+    def get_book_names(self, abbrev: str) -> List[str]: ...
+    def normalize_reference(self, reference: str) -> str: ...
+    def _resolve_lower(self, table: _AliasTable, name: str) -> str: ...
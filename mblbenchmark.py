@@ -0,0 +1,1028 @@
+# Benchmarks
+# Run with: python -m msbiblelib.mblbenchmark
+#   python -m msbiblelib.mblbenchmark --save baseline.json      (keep the results as a baseline)
+#   python -m msbiblelib.mblbenchmark --compare baseline.json   (report the changes against a baseline)
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+
+from msbiblelib import mblbooks, mblservers, mblversions
+from msbiblelib.mblaliases import AliasIndex, _build_alias_table
+from msbiblelib.mblbooks import Books, _import_numpy
+from msbiblelib.mblcatalog import Catalog, build_snapshot, get_catalog
+from msbiblelib.mblchaptercache import _HEADER, _MAGIC, ChapterCache, _make_key
+from msbiblelib.mblcoverage import Coverage, _build_coverage
+from msbiblelib.mblfetch import ChapterFetcher, percentile
+from msbiblelib.mblreferences import References, _classify_reference
+from msbiblelib.mblservers import Bibleservers
+from msbiblelib.mblservice import ValidationService
+from msbiblelib.mblsort import argsort_keys, dedupe_references, get_sort_keys, group_by_book
+from msbiblelib.mblurls import BOOK_NAME_FIELDS, ChapterUrls
+from msbiblelib.mblversions import Versions
+
+
+SOURCES = ('books', 'versions', 'servers')
+
+# The reference patterns as they were before _classify_reference(): tried one after the other,
+# from complex to simple. Kept as the reference implementation for check_parser()
+_SEQUENTIAL_PATTERNS = [
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)(\d+)\.(\d+)-(\d+)\.(\d+)$'), 'FBFCFVTCTV',
+     ['frombook', 'fromchapter', 'fromverse', 'tochapter', 'toverse']),
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)(\d+)\.(\d+)-(\d+)$'), 'FBFCFVTV',
+     ['frombook', 'fromchapter', 'fromverse', 'toverse']),
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)(\d+)\.(\d+)$'), 'FBFCFV', ['frombook', 'fromchapter', 'fromverse']),
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)(\d+)-(\d+)$'), 'FBFCTC', ['frombook', 'fromchapter', 'tochapter']),
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)(\d+)$'), 'FBFC', ['frombook', 'fromchapter']),
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)-(\d?[a-zA-Z]+)$'), 'FBTB', ['frombook', 'tobook']),
+    (re.compile(r'^(\d?[a-zöA-ZÖ]+)$'), 'FB', ['frombook']),
+]
+
+
+def _classify_reference_sequential(reference):
+    for pattern, pattern_type, keys in _SEQUENTIAL_PATTERNS:
+        match = pattern.match(reference)
+        if match:
+            components = {}
+            for i, key in enumerate(keys):
+                value = match.group(i + 1)
+                components[key] = value if key in ('frombook', 'tobook') else int(value)
+            return pattern_type, components
+    return None
+
+
+def reference_corpus():
+    """
+    References of all patterns for every book and chapter in books.xml, in upper, lower and readable case,
+    plus malformed ones
+    """
+    books = Books()
+    corpus = []
+    for abbrevs in zip(books.get_valid_abbreviations(), books.get_valid_abbreviations_readable()):
+        for b in {abbrevs[0], abbrevs[0].lower(), abbrevs[1]}:
+            corpus += [b, f'{b}-off', f'{b}-', f'-{b}']
+            for ch in range(1, books.get_max_chapter(b) + 1):
+                maxv = books.get_max_verse(b, ch)
+                corpus += [
+                    f'{b}{ch}', f'{b}{ch}-{ch + 1}', f'{b}{ch}.1', f'{b}{ch}.1-{maxv}', f'{b}{ch}.{maxv}-{ch + 1}.1',
+                    f'{b}{ch}.', f'{b}{ch}-{ch + 1}.2', f'{b}{ch}.1-', f'{b}{ch}.1.2', f'{b} {ch}', f'{ch}{b}',
+                ]
+    return corpus
+
+
+class _SequentialReferences(References):
+    # parse_reference() as it was before _classify_reference(), with the sequential patterns
+    _classify = staticmethod(_classify_reference_sequential)
+
+
+def check_parser():
+    """
+    Differential test: parse_reference() must give the same complete results as the implementation with the
+    sequential patterns, for every reference of reference_corpus()
+    Returns the list of (reference, result, expected result) that differ
+    """
+    parser = References()
+    sequential = _SequentialReferences()
+    differences = []
+    for reference in reference_corpus():
+        result = parser.parse_reference(reference)
+        expected = sequential.parse_reference(reference)
+        if result != expected:
+            differences.append((reference, result, expected))
+    return differences
+
+
+def check_chapter_cache():
+    """
+    Recovery of ChapterCache from a torn entry at the end of the data file, as a writer leaves it behind that is
+    killed in the middle of a write or runs out of disk space: the entries written afterwards must be readable,
+    by the same cache object and by a new one, and the file must not keep the torn bytes
+    Returns the list of failed checks
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ChapterCache(directory)
+        cache.put('s', 'v', 'GEN', 1, b'hello')
+        data_path = os.path.join(directory, 'chapters.dat')
+
+        key = _make_key('s', 'v', 'EX', 1).encode('utf-8')
+        payload = zlib.compress(b'never completed')
+        header = _HEADER.pack(_MAGIC, len(key), len(payload), zlib.crc32(payload), time.time())
+        torn_tails = {
+            'header only': header[:10],
+            'entry without the end of its payload': header + key + payload[:-3],
+        }
+        for i, (case, tail) in enumerate(torn_tails.items()):
+            with open(data_path, 'ab') as f:
+                f.write(tail)
+            payload = f'world {i}'.encode('ascii')
+            cache.put('s', 'v', 'EX', 2 + i, payload)
+            if cache.get('s', 'v', 'EX', 2 + i) != payload:
+                failures.append(f'{case}: the next entry cannot be read')
+            if cache.get('s', 'v', 'GEN', 1) != b'hello':
+                failures.append(f'{case}: an older entry was lost')
+            if cache.get_stats()['bytes'] != os.path.getsize(data_path):
+                failures.append(f'{case}: the torn bytes are still in the data file')
+            with ChapterCache(directory) as other:
+                if other.get('s', 'v', 'EX', 2 + i) != payload:
+                    failures.append(f'{case}: another cache object cannot read the next entry')
+        cache.close()
+    return failures
+
+
+def _timeit(func, repeat):
+    """
+    Calls func() repeat times
+    Returns the timings in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summary(timings):
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+    }
+
+
+def bench_startup(repeat=20):
+    """
+    Compares the time needed to load books, versions and servers into a fresh catalog,
+    once from the XML files and once from the binary snapshot
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Work on a copy, so the package directory is not touched
+        package_catalog = Catalog()
+        for source in SOURCES:
+            shutil.copy(package_catalog.get_path(source), data_dir)
+        build_snapshot(data_dir)
+
+        def load(use_snapshot):
+            catalog = Catalog(data_dir, use_snapshot=use_snapshot)
+            for source in SOURCES:
+                catalog.get_records(source)
+
+        return {
+            'xml': _summary(_timeit(lambda: load(False), repeat)),
+            'snapshot': _summary(_timeit(lambda: load(True), repeat)),
+        }
+
+
+def bench_parser(repeat=5):
+    """
+    Compares the classification of references by the single compiled pattern and by the sequential patterns
+    """
+    corpus = reference_corpus()
+
+    def classify(func):
+        for reference in corpus:
+            func(reference)
+
+    return {
+        'single pass': _summary(_timeit(lambda: classify(_classify_reference), repeat)),
+        'sequential': _summary(_timeit(lambda: classify(_classify_reference_sequential), repeat)),
+    }
+
+
+def _stand_in_handler(delay=0.0, status=200):
+    """
+    A minimal keep-alive HTTP server for the Bible servers: it answers every GET after delay seconds, with a small
+    page containing the path (status 200) or with an error status
+    """
+    reason = {200: 'OK', 503: 'Service Unavailable'}[status]
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b'\r\n\r\n')
+                path = request.split(b' ', 2)[1]
+                if delay:
+                    await asyncio.sleep(delay)
+                body = b'<html><body>' + path + b'</body></html>'
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: text/html\r\nContent-Length: %d\r\n\r\n'
+                             % (status, reason.encode('latin-1'), len(body)))
+                writer.write(body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # The client closed the connection, or the event loop is shutting down
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+def _base_url(server):
+    return f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}/'
+
+
+def bench_fetch(versions=('NIV2011', 'ELB1905', 'LXX'), per_server_limit=8):
+    """
+    Fetches all chapters of some versions from a local stand-in for the Bible servers
+    Returns the statistics of the fetcher (throughput, latency percentiles)
+    """
+    async def run():
+        server = await asyncio.start_server(_stand_in_handler(), '127.0.0.1', 0)
+        fetcher = ChapterFetcher(per_server_limit=per_server_limit,
+                                 base_urls={srv['name']: _base_url(server) for srv in Bibleservers().get_servers()})
+        urls = ChapterUrls()
+        jobs = [(version, abbrev, ch) for version in versions for abbrev, ch, _ in urls.get_version_urls(version)]
+        async with server:
+            await fetcher.fetch(jobs)
+        return fetcher.get_stats()
+
+    return asyncio.run(run())
+
+
+class _FailoverFetcher(ChapterFetcher):
+    # versions.xml has no <alternatives> yet: this fetcher adds some, so that the failover can be measured
+    def __init__(self, alternatives, **kwargs):
+        super().__init__(**kwargs)
+        self._alternatives = alternatives
+
+    def get_candidates(self, version):
+        candidates = super().get_candidates(version)
+        for name in self._alternatives.get(version, ()):
+            candidates += super().get_candidates(name)[:1]
+        return candidates
+
+
+def bench_fetch_failover(jobs=50, per_server_limit=2, timeout=0.1, delay=0.02):
+    """
+    Fetches chapters of NIV2011 (Biblegateway), with ESV2016 (Bibleserver) as its alternative, from local stand-ins:
+      queued: Biblegateway answers in delay seconds. The jobs wait much longer than timeout for one of the
+              per_server_limit connections, but none of them may time out
+      failing: Biblegateway answers with HTTP 503, every job fails over to Bibleserver
+      slow: Biblegateway answers after twice the timeout, every job times out and fails over to Bibleserver
+    Returns the statistics of the fetcher per case
+    """
+    cases = {
+        'queued': _stand_in_handler(delay=delay),
+        'failing': _stand_in_handler(status=503),
+        'slow': _stand_in_handler(delay=2 * timeout),
+    }
+    chapters = ChapterUrls().get_version_urls('NIV2011')[:jobs]
+
+    async def run(handler):
+        healthy = await asyncio.start_server(_stand_in_handler(), '127.0.0.1', 0)
+        primary = await asyncio.start_server(handler, '127.0.0.1', 0)
+        base_urls = {srv['name']: _base_url(healthy) for srv in Bibleservers().get_servers()}
+        base_urls['Biblegateway'] = _base_url(primary)
+
+        fetcher = _FailoverFetcher({'NIV2011': ['ESV2016']}, per_server_limit=per_server_limit, timeout=timeout,
+                                   base_urls=base_urls)
+        async with healthy, primary:
+            await fetcher.fetch([('NIV2011', abbrev, ch) for abbrev, ch, _ in chapters])
+        return fetcher.get_stats()
+
+    return {name: asyncio.run(run(handler)) for name, handler in cases.items()}
+
+
+# The benchmark suite
+# Every case is measured as time per operation (seconds) and peak memory (bytes allocated by Python during
+# one run, with tracemalloc). The results can be saved as a baseline and compared with later runs.
+
+# Increase when the cases or the layout of the results change
+_BASELINE_FORMAT = 1
+
+# Changes of the fastest time per operation that are reported as slower / faster. The minimum is compared, not
+# the median: it is the least disturbed by other processes
+DEFAULT_THRESHOLD = 0.10
+
+# Runs in a new interpreter: imports the modules and creates the objects, and reports the time of each step.
+# With tracing, it reports the peak memory of each step instead
+_COLD_START_SCRIPT = """
+import json, sys, time, tracemalloc
+trace = sys.argv[1] == '1'
+if trace:
+    tracemalloc.start()
+steps = {}
+def step(name, start):
+    if trace:
+        steps[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+    else:
+        steps[name] = time.perf_counter() - start
+start = time.perf_counter()
+from msbiblelib.mblbooks import Books
+from msbiblelib.mblservers import Bibleservers
+from msbiblelib.mblversions import Versions
+step('import', start)
+start = time.perf_counter()
+Books()
+step('Books', start)
+start = time.perf_counter()
+Versions()
+step('Versions', start)
+start = time.perf_counter()
+Bibleservers()
+step('Bibleservers', start)
+print(json.dumps(steps))
+"""
+
+
+# Minimum duration of one timing in _measure(), so that timer resolution and noise do not dominate
+_MIN_TIMING = 0.005
+
+
+def _measure(func, ops, repeat):
+    """
+    Calls func() repeatedly; one call performs ops operations
+    Returns the time per operation (min, median, max) and the peak memory of one more, traced call
+    """
+    # Each timing runs func() often enough to take at least _MIN_TIMING seconds
+    start = time.perf_counter()
+    func()
+    number = max(1, int(_MIN_TIMING / max(time.perf_counter() - start, 1e-9)))
+    ops *= number
+
+    def run():
+        for _ in range(number):
+            func()
+
+    timings = _timeit(run, repeat)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'min': min(timings) / ops,
+        'median': statistics.median(timings) / ops,
+        'max': max(timings) / ops,
+        'ops': ops,
+        'peak_memory': peak,
+    }
+
+
+def _run_cold_start(trace):
+    # The package must be importable in the new interpreter exactly as it is here
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    output = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT, '1' if trace else '0'],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def bench_cold_start(repeat=5):
+    """
+    Import of the modules and construction of the first Books, Versions and Bibleservers objects,
+    each in a new interpreter (so nothing is cached yet, apart from the snapshot file if it was built)
+    """
+    runs = [_run_cold_start(False) for _ in range(repeat)]
+    peaks = _run_cold_start(True)
+
+    results = {}
+    for name in peaks:
+        timings = [run[name] for run in runs]
+        results[f'cold.{name}'] = {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'max': max(timings),
+            'ops': 1,
+            'peak_memory': peaks[name],
+        }
+    return results
+
+
+def _lookup_arguments():
+    # Method name -> list of argument tuples that cover the whole catalog, plus some unknown values
+    books = Books()
+    versions = Versions()
+    abbrevs = list(books.get_valid_abbreviations()) + ['XYZ', 'gen', 'Mt']
+    chapters = [(b, ch) for b in books.get_valid_abbreviations() for ch in range(1, books.get_max_chapter(b) + 1)]
+    verses = [(b, ch, v) for b, ch in chapters[::7] for v in (1, books.get_max_verse(b, ch), 999)]
+    names = [v['name'] for v in versions.get_versions()] + ['unknown', 'niv2011']
+
+    one_abbrev = [(b,) for b in abbrevs]
+    one_name = [(n,) for n in names]
+    return {
+        'Books.get_valid_abbreviations': [()],
+        'Books.get_valid_abbreviations_readable': [()],
+        'Books.get_one_chapter_books': [()],
+        'Books.get_psalms_with_heading': [()],
+        'Books.get_verse_count': [()],
+        'Books.get_sort_value': one_abbrev,
+        'Books.get_max_chapter': one_abbrev,
+        'Books.get_testament': one_abbrev,
+        'Books.get_latex_abbrev': one_abbrev,
+        'Books.get_book_ordinal_range': one_abbrev,
+        'Books.get_max_verse': chapters + [('GEN', 99), ('XYZ', 1)],
+        'Books.get_chapter_ordinal_range': chapters + [('GEN', 99), ('XYZ', 1)],
+        'Books.get_heading_verses': chapters + [('GEN', 99), ('XYZ', 1)],
+        'Books.get_verse_ordinal': verses,
+        'Books.get_verse_from_ordinal': [(o,) for o in range(0, books.get_verse_count() + 2, 13)],
+        'Books.get_book_numbers': [(abbrevs * 100,)],
+        'Versions.get_versions': [()],
+        'Versions.get_version_record': one_name,
+        'Versions.get_version_language': one_name,
+        'Versions.get_version_content': one_name,
+        'Versions.get_version_extracontent': one_name,
+        'Versions.get_version_server': one_name,
+        'Versions.get_version_versification': one_name,
+        'Versions.get_hosting_server': [(v,) for v in versions.get_versions()],
+    }
+
+
+# Methods that need NumPy; they are skipped if it is not installed
+_NUMPY_METHODS = ('Books.get_verse_tables', 'Books.get_book_numbers')
+
+
+def bench_lookups(repeat=20):
+    """
+    Latency of every get_* method of Books and Versions (get_versions_filtered() has its own benchmark)
+    New methods are found automatically; they are called without arguments unless _lookup_arguments() knows them
+    """
+    arguments = _lookup_arguments()
+    has_numpy = _import_numpy() is not None
+    results = {}
+    for obj in (Books(), Versions()):
+        class_name = type(obj).__name__
+        for method_name in sorted(dir(obj)):
+            if not method_name.startswith('get_') or method_name == 'get_versions_filtered':
+                continue
+            name = f'{class_name}.{method_name}'
+            if not has_numpy and name in _NUMPY_METHODS:
+                continue
+            method = getattr(obj, method_name)
+            args_list = arguments.get(name, [()])
+
+            def run(method=method, args_list=args_list):
+                for args in args_list:
+                    method(*args)
+
+            results[f'lookup.{name}'] = _measure(run, len(args_list), repeat)
+    return results
+
+
+# Share of each reference type in mixed_corpus(), roughly as they occur in texts
+_CORPUS_MIX = (
+    ('FBFCFV', 30),
+    ('FBFCFVTV', 25),
+    ('FBFC', 14),
+    ('FBFCFVTCTV', 8),
+    ('FBFCTC', 8),
+    ('FB', 5),
+    ('FBTB', 3),
+    ('invalid', 7),
+)
+
+
+def mixed_corpus(size=20000, seed=1):
+    """
+    A reproducible list of references of all seven types plus invalid ones (see _CORPUS_MIX), with upper,
+    lower and readable book names and all accepted chapter/verse separators
+    """
+    books = Books()
+    rnd = random.Random(seed)
+    abbrevs = list(zip(books.get_valid_abbreviations(), books.get_valid_abbreviations_readable()))
+    types = [t for t, _ in _CORPUS_MIX]
+    weights = [w for _, w in _CORPUS_MIX]
+
+    corpus = []
+    for reference_type in rnd.choices(types, weights, k=size):
+        upper, readable = rnd.choice(abbrevs)
+        b = rnd.choice((upper, upper.lower(), readable))
+        sep = rnd.choice('..:,')
+        ch = rnd.randint(1, books.get_max_chapter(upper))
+        maxv = books.get_max_verse(upper, ch)
+        v = rnd.randint(1, maxv)
+
+        if reference_type == 'FB':
+            reference = b
+        elif reference_type == 'FBTB':
+            reference = f'{b}-{rnd.choice(abbrevs)[1]}'
+        elif reference_type == 'FBFC':
+            reference = f'{b}{ch}'
+        elif reference_type == 'FBFCTC':
+            reference = f'{b}{ch}-{rnd.randint(ch, books.get_max_chapter(upper))}'
+        elif reference_type == 'FBFCFV':
+            reference = f'{b}{ch}{sep}{v}'
+        elif reference_type == 'FBFCFVTV':
+            reference = f'{b}{ch}{sep}{v}-{rnd.randint(v, maxv)}'
+        elif reference_type == 'FBFCFVTCTV':
+            to_ch = rnd.randint(ch, books.get_max_chapter(upper))
+            reference = f'{b}{ch}{sep}{v}-{to_ch}{sep}{rnd.randint(1, books.get_max_verse(upper, to_ch))}'
+        else:
+            reference = rnd.choice((f'{b}{ch}{sep}', f'{b} {ch}', f'{ch}{b}', f'{b}{ch}{sep}{v}-', 'xyz1.1',
+                                    f'{b}{ch}{sep}{maxv + 1}', f'{b}{ch}-{ch}{sep}2', ''))
+        corpus.append(reference)
+    return corpus
+
+
+def bench_parse_reference(repeat=5, size=20000):
+    """Time per reference of References.parse_reference() on mixed_corpus(), without a cache"""
+    corpus = mixed_corpus(size)
+    references = References()
+
+    def run():
+        for reference in corpus:
+            references.parse_reference(reference)
+
+    return {'parse_reference.mixed': _measure(run, len(corpus), repeat)}
+
+
+def bench_check_verses(repeat=5, size=200000, seed=1):
+    """
+    Checks random (book, chapter, verse) triples, about half of them valid: with one call of Books.check_verses()
+    and row by row with get_verse_ordinal(). Returns nothing if NumPy is not installed
+    """
+    np = _import_numpy()
+    if np is None:
+        return {}
+
+    books = Books()
+    abbrevs = books.get_valid_abbreviations()
+    rnd = np.random.default_rng(seed)
+    b = rnd.integers(-1, len(abbrevs) + 1, size)
+    c = rnd.integers(0, 151, size)
+    v = rnd.integers(0, 60, size)
+    rows = list(zip(b.tolist(), c.tolist(), v.tolist()))
+
+    def per_row():
+        for book, chapter, verse in rows:
+            if 0 <= book < len(abbrevs):
+                books.get_verse_ordinal(abbrevs[book], chapter, verse)
+
+    return {
+        'check_verses.vectorized': _measure(lambda: books.check_verses(b, c, v), size, repeat),
+        'check_verses.per_row': _measure(per_row, size, repeat),
+    }
+
+
+def bench_sort(repeat=5, size=20000):
+    """
+    Sorting parsed references: by the precomputed keys (argsort_keys()) and with a key function that looks up
+    the book order with Books.get_sort_value() for every reference; dedupe and group by book
+    """
+    books = Books()
+    parser = References()
+    parsed = [parser.parse_reference(reference) for reference in mixed_corpus(size)]
+    valid = [p for p in parsed if p['passed']]
+    keys = get_sort_keys(parsed, parser)
+
+    def by_lookup():
+        sorted(valid, key=lambda p: (books.get_sort_value(p['frombook']), p['fromchapter'], p['fromverse']))
+
+    return {
+        'sort.keys': _measure(lambda: get_sort_keys(parsed, parser), size, repeat),
+        'sort.argsort_keys': _measure(lambda: argsort_keys(keys), size, repeat),
+        'sort.by_sort_value': _measure(by_lookup, len(valid), repeat),
+        'sort.dedupe': _measure(lambda: dedupe_references(parsed, parser), size, repeat),
+        'sort.group_by_book': _measure(lambda: group_by_book(parsed, parser), size, repeat),
+    }
+
+
+def bench_coverage(repeat=20):
+    """
+    "In which versions can 2joh be read?": with the coverage bitsets, and by scanning versions.xml and the book
+    lists of the servers as before; and the versions for a book span (gen-dtn)
+    """
+    coverage = Coverage()
+    books = Books()
+    versions = Versions()
+    servers = Bibleservers()
+
+    def scan(abbrev):
+        found = []
+        testament = books.get_testament(abbrev)
+        for version in versions.get_versions():
+            content = version['content'].upper()
+            if content != 'FB' and content != testament and abbrev not in (version['extracontent'] or ()):
+                continue
+            server = servers.get_server_by_name(version['server'] or '')
+            if server is not None and server['status'] != 'inactive' \
+                    and any(book['abbreviation'] == abbrev for book in server['books']):
+                found.append(version['name'])
+        return found
+
+    return {
+        'coverage.book_versions': _measure(lambda: coverage.get_book_versions('2JOH', True), 1, repeat),
+        'coverage.book_versions_scan': _measure(lambda: scan('2JOH'), 1, repeat),
+        'coverage.book_servers': _measure(lambda: coverage.get_book_servers('2JOH'), 1, repeat),
+        'coverage.versions_for_span': _measure(lambda: coverage.get_versions_for_references(['gen-dtn'], True),
+                                               1, repeat),
+    }
+
+
+def bench_aliases(repeat=20):
+    """
+    Book names: building the alias index (its peak memory is the footprint), resolving a name with it and by
+    scanning the book lists of the servers, and parse_reference() with book names
+    """
+    catalog = get_catalog()
+    aliases = AliasIndex()
+    servers = Bibleservers()
+    parser = References(aliases=aliases)
+    names = ['Römer', 'röm', 'Romans', '1. Mose', 'Offenbarung', 'Psalm', 'Hebr', 'xyz']
+    references = ['Römer 8,28', '1. Mose 1-3', 'Joh 3:16', 'Genesis - Exodus', 'Psalm 23', 'Xyz 1,1']
+
+    def scan():
+        for name in names:
+            key = name.replace('.', '').replace(' ', '').lower()
+            for server in servers.get_servers():
+                if any(key in (book[field].replace('.', '').replace(' ', '').lower()
+                               for field in BOOK_NAME_FIELDS if book.get(field)) for book in server['books']):
+                    break
+
+    return {
+        'aliases.build': _measure(lambda: _build_alias_table(catalog), 1, repeat),
+        'aliases.resolve': _measure(lambda: [aliases.resolve(name) for name in names], len(names), repeat),
+        'aliases.resolve_scan': _measure(scan, len(names), repeat),
+        'aliases.parse_reference': _measure(lambda: [parser._parse_reference(reference) for reference in references],
+                                            len(references), repeat),
+    }
+
+
+def _filter_values():
+    # Values for each filter of get_versions_filtered(), taken from versions.xml
+    versions = Versions().get_versions()
+    return {
+        'vfilter': [v['name'] for v in versions[::20]],
+        'lfilter': ['de', 'en'],
+        'sfilter': versions[len(versions) // 2]['server'],
+        'ffilter': sorted({v['family'] for v in versions if v['family']})[:3],
+        'cfilter': ['NT', 'FB'],
+    }
+
+
+def bench_filters(repeat=20):
+    """Cost of get_versions_filtered() for every combination of the filters"""
+    versions = Versions()
+    values = _filter_values()
+    names = ('lfilter', 'sfilter', 'ffilter', 'cfilter')
+
+    # The version filter replaces all others, so it is measured alone
+    combinations = [('vfilter',)]
+    for n in range(len(names) + 1):
+        combinations += itertools.combinations(names, n)
+
+    results = {}
+    for combination in combinations:
+        kwargs = {'vfilter': None, 'lfilter': None, 'sfilter': None}
+        kwargs.update({name: values[name] for name in combination})
+
+        label = '+'.join(name[0] for name in combination) or 'none'
+        results[f'filter.{label}'] = _measure(lambda kwargs=kwargs: versions.get_versions_filtered(**kwargs), 1,
+                                              repeat)
+    return results
+
+
+def run_suite(quick=False):
+    """
+    Runs all cases of the suite
+    Returns {'meta': {...}, 'cases': {case name: {'min', 'median', 'max', 'ops', 'peak_memory'}}}
+    """
+    repeat = 3 if quick else None
+    cases = {}
+    for bench in (bench_cold_start, bench_lookups, bench_parse_reference, bench_filters, bench_check_verses,
+                  bench_sort, bench_coverage, bench_aliases):
+        cases.update(bench() if repeat is None else bench(repeat=repeat))
+
+    return {
+        'meta': {
+            'format': _BASELINE_FORMAT,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'cases': cases,
+    }
+
+
+def save_baseline(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('format') != _BASELINE_FORMAT:
+        raise ValueError(f'{path} was written by another version of the benchmark suite')
+    return baseline
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the fastest time per operation and the peak memory of every case with a baseline
+    Returns a list of rows: (case, baseline min, min, ratio, baseline peak, peak, verdict)
+    The verdict is 'slower', 'faster', 'ok', 'new' (not in the baseline) or 'missing' (only in the baseline)
+    """
+    old_cases = baseline['cases']
+    new_cases = results['cases']
+    rows = []
+    for name in sorted(set(old_cases) | set(new_cases)):
+        old = old_cases.get(name)
+        new = new_cases.get(name)
+        if old is None:
+            rows.append((name, None, new['min'], None, None, new['peak_memory'], 'new'))
+            continue
+        if new is None:
+            rows.append((name, old['min'], None, None, old['peak_memory'], None, 'missing'))
+            continue
+
+        ratio = new['min'] / old['min'] if old['min'] > 0 else 1.0
+        if ratio > 1 + threshold:
+            verdict = 'slower'
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'ok'
+        rows.append((name, old['min'], new['min'], ratio, old['peak_memory'], new['peak_memory'], verdict))
+    return rows
+
+
+def _format_time(seconds):
+    if seconds is None:
+        return '-'
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.3f} ms'
+    return f'{seconds * 1e6:.3f} us'
+
+
+def _format_memory(size):
+    if size is None:
+        return '-'
+    return f'{size / 1024:.1f} KiB'
+
+
+def print_suite(results):
+    meta = results['meta']
+    print(f'Suite: Python {meta["python"]} ({meta["implementation"]}) on {meta["platform"]}')
+    print(f'  {"case":<45} {"median/op":>12} {"min/op":>12} {"peak memory":>14}')
+    for name, case in results['cases'].items():
+        print(f'  {name:<45} {_format_time(case["median"]):>12} {_format_time(case["min"]):>12} '
+              f'{_format_memory(case["peak_memory"]):>14}')
+
+
+def print_comparison(rows, baseline):
+    meta = baseline['meta']
+    print(f'Comparison with the baseline of {meta["time"]} (Python {meta["python"]}, {meta["platform"]})')
+    print(f'  {"case":<45} {"baseline":>12} {"now":>12} {"ratio":>7} {"memory before":>14} {"memory now":>14}')
+    for name, old, new, ratio, old_peak, new_peak, verdict in rows:
+        ratio_text = f'{ratio:.2f}x' if ratio is not None else '-'
+        print(f'  {name:<45} {_format_time(old):>12} {_format_time(new):>12} {ratio_text:>7} '
+              f'{_format_memory(old_peak):>14} {_format_memory(new_peak):>14}  {verdict}')
+    slower = sum(1 for row in rows if row[-1] == 'slower')
+    faster = sum(1 for row in rows if row[-1] == 'faster')
+    print(f'  {slower} slower, {faster} faster, {len(rows) - slower - faster} unchanged/new/missing')
+
+
+def bench_reload(repeat=10):
+    """
+    An edit of servers.xml in a running process: Catalog.reload() (parse servers.xml again, swap, rebuild what
+    depends on it) against a restart (a new catalog that loads and builds everything). Then the same reloads
+    while a thread does lookups all the time; its slowest lookup shows whether readers have to wait
+    """
+    derived = {
+        'books.index': mblbooks._build_books_index,
+        'books.verse_ordinals': mblbooks._build_verse_ordinals,
+        'versions.index': mblversions._build_versions_index,
+        'versions.names': mblversions._build_names_index,
+        'servers.names': mblservers._build_names_index,
+        'books.data': mblbooks._build_books_data,
+        'versions.data': mblversions._build_versions_data,
+        'servers.data': mblservers._build_servers_data,
+        'coverage': _build_coverage,
+        'aliases': _build_alias_table,
+    }
+
+    def build_all(catalog):
+        for name, builder in derived.items():
+            catalog.get_derived(name, builder)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        package_catalog = Catalog()
+        for source in SOURCES:
+            shutil.copy(package_catalog.get_path(source), data_dir)
+
+        catalog = Catalog(data_dir, use_snapshot=False)
+        build_all(catalog)
+        servers_path = catalog.get_path('servers')
+        with open(servers_path, encoding='utf-8') as f:
+            servers_xml = f.read()
+
+        edits = itertools.count()
+
+        def edit_and_reload():
+            with open(servers_path, 'w', encoding='utf-8') as f:
+                f.write(servers_xml + f'<!-- {next(edits)} -->\n')
+            start = time.perf_counter()
+            changed = catalog.reload()
+            build_all(catalog)
+            assert changed == ['servers']
+            return time.perf_counter() - start
+
+        reload_times = [edit_and_reload() for _ in range(repeat)]
+
+        # The same with a reader
+        stop = threading.Event()
+        lookups = []
+
+        def reader():
+            while not stop.is_set():
+                start = time.perf_counter()
+                catalog.get_derived('servers.names', mblservers._build_names_index).get('obohu')
+                lookups.append(time.perf_counter() - start)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        try:
+            for _ in range(repeat):
+                edit_and_reload()
+        finally:
+            stop.set()
+            thread.join()
+
+        def restart():
+            build_all(Catalog(data_dir, use_snapshot=False))
+
+        return {
+            'reload': _summary(reload_times),
+            'restart': _summary(_timeit(restart, repeat)),
+            'lookups': len(lookups),
+            'slowest_lookup': max(lookups),
+        }
+
+
+async def _post_json(reader, writer, path, request):
+    # One request on a keep-alive connection to the validation service
+    body = json.dumps(request).encode('utf-8')
+    writer.write(f'POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+def bench_service(clients=32, requests_per_client=100, batch_size=20000, max_batch=256, max_delay=0.002):
+    """
+    Load test of the validation service on localhost: clients send single references at the same time, each on
+    its own keep-alive connection, then one client sends a large batch
+    Returns the throughput and the latencies seen by the clients, and the statistics of the service
+    """
+    corpus = mixed_corpus(clients * requests_per_client + batch_size)
+
+    async def run():
+        service = ValidationService(port=0, max_batch=max_batch, max_delay=max_delay)
+        host, port = await service.start()
+        latencies = []
+
+        async def client(references):
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                for reference in references:
+                    start = time.perf_counter()
+                    await _post_json(reader, writer, '/parse', {'reference': reference})
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                writer.close()
+
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(client(corpus[i * requests_per_client:(i + 1) * requests_per_client])
+                                   for i in range(clients)))
+            single_seconds = time.perf_counter() - start
+
+            reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            results = await _post_json(reader, writer, '/parse', {'references': corpus[-batch_size:]})
+            batch_seconds = time.perf_counter() - start
+            writer.close()
+            assert len(results) == batch_size
+        finally:
+            stats = service.get_stats()
+            await service.close()
+
+        return {
+            'requests': len(latencies),
+            'requests_per_second': len(latencies) / single_seconds,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99),
+            'batch_references_per_second': batch_size / batch_seconds,
+            'service': stats,
+        }
+
+    return asyncio.run(run())
+
+
+def _print_results(title, results):
+    print(title)
+    for name, summary in results.items():
+        values = '  '.join(f'{k} {v * 1000:9.3f} ms' for k, v in summary.items())
+        print(f'  {name:<12} {values}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of msbiblelib')
+    parser.add_argument('--save', metavar='FILE', help='save the results of the suite as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results of the suite with a baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative change of the fastest time that counts as slower/faster (default: %(default)s)')
+    parser.add_argument('--quick', action='store_true', help='fewer repetitions')
+    parser.add_argument('--suite-only', action='store_true',
+                        help='skip the comparisons of old and new implementations and the fetch benchmark')
+    args = parser.parse_args(argv)
+
+    # A parser that does not give the same results as before fails the run, whatever the timings are
+    differences = check_parser()
+    print(f'Parser differential check: {len(reference_corpus())} references, {len(differences)} differences')
+    for reference, result, expected in differences[:10]:
+        print(f'  {reference!r}: {dict(result)} != {dict(expected)}')
+
+    cache_failures = check_chapter_cache()
+    print(f'Chapter cache recovery check: {len(cache_failures)} failures')
+    for failure in cache_failures:
+        print(f'  {failure}')
+
+    results = run_suite(quick=args.quick)
+    print_suite(results)
+    if args.save:
+        save_baseline(results, args.save)
+        print(f'Baseline written to {args.save}')
+
+    slower = 0
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, baseline)
+        slower = sum(1 for row in rows if row[-1] == 'slower')
+
+    if not args.suite_only:
+        _run_comparisons()
+
+    # A non-zero exit code, so regressions can stop a build
+    return 1 if slower or differences or cache_failures else 0
+
+
+def _run_comparisons():
+    startup = bench_startup()
+    _print_results('Startup (load books, versions, servers)', startup)
+    speedup = startup['xml']['median'] / startup['snapshot']['median']
+    print(f'  snapshot is {speedup:.1f}x faster')
+
+    parser = bench_parser()
+    _print_results(f'Classify {len(reference_corpus())} references', parser)
+    speedup = parser['sequential']['median'] / parser['single pass']['median']
+    print(f'  single pass is {speedup:.1f}x faster')
+
+    reload = bench_reload()
+    _print_results('Picking up an edit of servers.xml', {'reload': reload['reload'], 'restart': reload['restart']})
+    print(f'  reload is {reload["restart"]["median"] / reload["reload"]["median"]:.1f}x faster; '
+          f'slowest of {reload["lookups"]} lookups in another thread: {reload["slowest_lookup"] * 1000:.3f} ms')
+
+    for max_batch in (1, 256):
+        service = bench_service(max_batch=max_batch, max_delay=0.002 if max_batch > 1 else 0)
+        print(f'Validation service, {service["requests"]} single-reference requests from 32 clients '
+              f'(max_batch {max_batch}, mean batch {service["service"]["mean_batch_size"]:.1f})')
+        print(f'  {service["requests_per_second"]:.0f} requests/s  p50 {service["latency_p50"] * 1000:.3f} ms  '
+              f'p90 {service["latency_p90"] * 1000:.3f} ms  p99 {service["latency_p99"] * 1000:.3f} ms')
+    print(f'  one batch request: {service["batch_references_per_second"]:.0f} references/s')
+
+    fetch = bench_fetch()
+    print(f'Fetch {fetch["jobs"]} chapters from a local stand-in server ({fetch["failed"]} failed)')
+    print(f'  {fetch["throughput"]:.0f} chapters/s  p50 {fetch["latency_p50"] * 1000:.3f} ms  '
+          f'p90 {fetch["latency_p90"] * 1000:.3f} ms  p99 {fetch["latency_p99"] * 1000:.3f} ms')
+
+    failover = bench_fetch_failover()
+    print(f'Fetch {failover["queued"]["jobs"]} chapters with failover to an alternative version')
+    for case, stats in failover.items():
+        print(f'  {case:<8} {stats["failed"]} failed  {stats["failovers"]} failovers  '
+              f'p50 {stats["latency_p50"] * 1000:.3f} ms  max {stats["latency_max"] * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,144 @@
-import os
-import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from msbiblelib.mblcatalog import get_catalog, parse_books
+
+
+# NumPy is optional; it is only needed for get_verse_tables() and check_verses(). It is imported on first use:
+# importing it takes longer than loading the whole catalog
+_numpy = None
+_numpy_checked = False
+
+
+def _build_valid_abbrevs(catalog):
+    return tuple(book['abbrev'] for book in catalog.books)
+
+
+def _build_books_index(catalog):
+    # Upper case abbreviation -> book record
+    return {book['abbrev'].upper(): book for book in catalog.books}
+
+
+def _build_sort_values_index(catalog):
+    # Upper case abbreviation -> position of the book in the canon
+    return {book['abbrev'].upper(): i for i, book in enumerate(catalog.books)}
+
+
+def _build_psalms_with_heading(catalog):
+    # A tuple: it is shared by all callers of Books.get_psalms_with_heading()
+    for book in catalog.books:
+        if book['abbrev'].upper() == 'PS':
+            return tuple(ch for ch, heading in enumerate(book['headings']) if heading)
+    return ()
+
+
+def _build_psalms_with_heading_set(catalog):
+    return frozenset(_build_psalms_with_heading(catalog))
+
+
+class _VerseOrdinals:
+    """
+    Numbers all verses of the Bible consecutively, in canonical order: GEN 1.1 is 1, GEN 1.2 is 2, ...
+    The tables are built from the verse counts in books.xml
+    """
+
+    def __init__(self, books):
+        # Upper case abbreviation -> position of the book
+        self.book_index = {}
+
+        # Position of the book -> index of its first chapter in the chapter tables. One more entry at the end,
+        # so the chapters of book b are chapter_start[b] .. chapter_start[b + 1] - 1
+        self.chapter_start = array('H')
+
+        # Ordinal of the last verse before each chapter. One more entry at the end: the number of all verses
+        self.chapter_offsets = array('L')
+
+        # Chapter table index -> position of the book, chapter number
+        self.chapter_book = array('B')
+        self.chapter_number = array('H')
+
+        total = 0
+        for b, book in enumerate(books):
+            self.book_index[book['abbrev'].upper()] = b
+            self.chapter_start.append(len(self.chapter_offsets))
+            for ch in range(1, book['maxchapter'] + 1):
+                self.chapter_offsets.append(total)
+                self.chapter_book.append(b)
+                self.chapter_number.append(ch)
+                total += book['chapters'][ch]
+        self.chapter_start.append(len(self.chapter_offsets))
+        self.chapter_offsets.append(total)
+
+
+def _build_verse_ordinals(catalog):
+    return _VerseOrdinals(catalog.books)
+
+
+def _build_verse_tables(catalog):
+    # NumPy views of the verse ordinal tables, see Books.get_verse_tables()
+    np = _require_numpy()
+    o = catalog.get_derived('books.verse_ordinals', _build_verse_ordinals)
+    chapter_start = np.array(o.chapter_start, dtype=np.int64)
+    chapter_offsets = np.array(o.chapter_offsets, dtype=np.int64)
+    tables = {
+        'book_index': dict(o.book_index),
+        'chapter_start': chapter_start,
+        'chapter_offsets': chapter_offsets,
+        'verse_counts': np.diff(chapter_offsets),
+    }
+    # The tables are shared by all callers
+    for value in tables.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+    return tables
+
+
+# Everything Books takes from the catalog, in one object that is never changed
+_BooksData = namedtuple('_BooksData', ('books', 'valid_abbrevs', 'index', 'sort_values', 'verse_ordinals'))
+
+
+def _build_books_data(catalog):
+    return _BooksData(
+        catalog.books,
+
+        # List of valid abbreviations, in canonical order
+        catalog.get_derived('books.valid_abbrevs', _build_valid_abbrevs),
+
+        # Indexes for the lookups; the keys are upper case abbreviations
+        catalog.get_derived('books.index', _build_books_index),
+        catalog.get_derived('books.sort_values', _build_sort_values_index),
+
+        # Tables for the conversion between verses and verse ordinals
+        catalog.get_derived('books.verse_ordinals', _build_verse_ordinals),
+    )
+
+
+# Attributes of Books that are taken from the catalog, see Catalog.bind(). One attribute only, so Catalog.reload()
+# replaces all structures at once; a method that reads self._data once works on one version of books.xml
+_CATALOG_ATTRIBUTES = {
+    '_data': ('books.data', _build_books_data),
+}
+
+
+def _import_numpy():
+    """Returns the numpy module; None if it is not installed"""
+    global _numpy, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+        _numpy_checked = True
+    return _numpy
+
+
+def _require_numpy():
+    np = _import_numpy()
+    if np is None:
+        raise ImportError('NumPy is required for the vectorized functions of Books (pip install numpy)')
+    return np
 
 
 class Books:
@@ -8,56 +147,24 @@ class Books:
     # They should not need to care about case, so we provide both upper and lower case names
     _a_one_chapter_books = ['OB', 'PHIM', '2JOH', '3JOH', 'JUD', 'ob', 'phim', '2joh', '3joh', 'jud']
 
-    # There are Psalms with a heading. MT includes the heading in v 1, some translations don't
-    # This is the list of affected psalms
-    _a_psalms_with_heading = [3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 15, 16, 19, 20, 21, 22, 30, 31, 34, 36, 39, 40,
-                              41, 42, 44, 45, 46, 47, 48, 49, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63,
-                              64, 65, 66, 67, 68, 69, 70, 75, 76, 77, 80, 81, 83, 84, 85, 88, 89, 102, 108, 140, 142]
-
     def __init__(self):
 
-        # List of valid abbreviations. It will be filled in parse_books()
-        self._a_valid_abbrevs = []
-
-        # Read the books data from the xml file. As this is a package, we need to use the absolute path
-        cwd = os.path.dirname(os.path.abspath(__file__))
-        self._ad_books = self.parse_books(os.path.join(cwd, 'books.xml'))
+        # The books data is read from books.xml only once per process and shared by all instances;
+        # the attributes are updated by Catalog.reload()
+        self._catalog = get_catalog()
+        self._catalog.bind(self, _CATALOG_ATTRIBUTES)
 
     def parse_books(self, xml_file):
         # Parse the XML file
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-
-        # Initialize an empty list to store dictionaries
-        book_data = []
-
-        # Iterate over each book in the XML
-        for book in root.findall('book'):
-            # Initialize a dictionary to store book data
-            book_info = {
-                'abbrev': book.get('abbrev'),
-                'maxchapter': int(book.get('maxchapter')),
-                'testament': book.get('testament'),
-                'latex_abbrev': book.get('latex_abbrev'),
-                'chapters': {}
-            }
-
-            # Remember this abbrev as a valid one
-            self._a_valid_abbrevs.append(book.get('abbrev'))
-
-            # Iterate over each chapter in the book
-            for chapter in book.findall('chapter'):
-                chapter_num = int(chapter.get('number'))
-                verses = int(chapter.get('verses'))
-                book_info['chapters'][chapter_num] = verses
-
-            # Add book_info to the book_data list
-            book_data.append(book_info)
+        book_data = parse_books(xml_file)
+
+        # Remember the abbrevs as valid ones
+        self._data = self._data._replace(valid_abbrevs=[book['abbrev'] for book in book_data])
 
         return book_data
 
     def get_valid_abbreviations(self):
-        return self._a_valid_abbrevs
+        return self._data.valid_abbrevs
 
 
     # python
@@ -67,7 +174,7 @@ class Books:
         Non-letter characters before the first letter are preserved.
         """
         readable = []
-        for abbr in self._a_valid_abbrevs:
+        for abbr in self._data.valid_abbrevs:
             if not isinstance(abbr, str) or abbr == "":
                 readable.append(abbr)
                 continue
@@ -92,23 +199,21 @@ class Books:
         return readable
 
     def is_valid_abbreviation(self, abbrev):
-        return abbrev.upper() in self._a_valid_abbrevs
+        return abbrev.upper() in self._data.index
 
     @classmethod
     def get_one_chapter_books(cls):
         return cls._a_one_chapter_books
 
     def get_sort_value(self, abbrev):
-        try:
-            return self._a_valid_abbrevs.index(abbrev.upper())
-        except ValueError:
-            return -1  # or any other value to indicate that the abbrev was not found
+        return self._data.sort_values.get(abbrev.upper(), -1)  # -1 indicates that the abbrev was not found
 
     # Get the highest chapter of a book
     def get_max_chapter(self, abbr):
-        for book in self._ad_books:
-            if book.get('abbrev') == abbr.upper():
-                return int(book.get('maxchapter'))
+        book = self._data.index.get(abbr.upper())
+        if book is not None:
+            return book['maxchapter']
+        return None
 
     # Get the highest verse in a chapter of a book
     def get_max_verse(self, abbr, ch):
@@ -120,16 +225,23 @@ class Books:
             except ValueError:
                 return None  # Return None if conversion fails
 
-        # Iterate through the list of book dictionaries
-        for book in self._ad_books:
-            if book['abbrev'] == abbr.upper():
-                # Retrieve the verse count for the specified chapter dictionary
-                return book['chapters'].get(ch, None)  # Return None if the chapter is not found
+        book = self._data.index.get(abbr.upper())
+        if book is not None:
+            # Retrieve the verse count for the specified chapter; chapters[0] is not used
+            chapters = book['chapters']
+            try:
+                if 1 <= ch < len(chapters):
+                    return chapters[ch]
+            except TypeError:
+                pass
+            return None  # Return None if the chapter is not found
         return None  # Return None if the book abbreviation is not found
 
+    # There are Psalms with a heading. MT includes the heading in v 1, some translations don't
+    # The affected psalms are marked in books.xml, see get_heading_verses()
     @classmethod
     def get_psalms_with_heading(cls):
-        return cls._a_psalms_with_heading
+        return get_catalog().get_derived('books.psalms_with_heading', _build_psalms_with_heading)
 
     @classmethod
     # Determine if a given Psalm has a heading. There are versions that do not consider the heading part of v 1
@@ -137,17 +249,150 @@ class Books:
         # The chapter might come as an integer or as a string - but we need an integer
         if isinstance(ch, str):
             ch = int(ch)
-        return ch in cls._a_psalms_with_heading
+        return ch in get_catalog().get_derived('books.psalms_with_heading_set', _build_psalms_with_heading_set)
+
+    def get_heading_verses(self, abbr, ch):
+        """Number of verses that the heading of a chapter takes in the MT numbering (0: no heading)"""
+        book = self._data.index.get(abbr.upper())
+        if book is None:
+            return 0
+        try:
+            ch = int(ch)
+        except ValueError:
+            return 0
+        headings = book['headings']
+        return headings[ch] if 1 <= ch < len(headings) else 0
 
     # Determine if a book is in OT or NT
     def get_testament(self, book):
-        for b in self._ad_books:
-            if b['abbrev'] == book.upper():
-                return b['testament']
+        b = self._data.index.get(book.upper())
+        if b is not None:
+            return b['testament']
         return None
 
     def get_latex_abbrev(self, book):
-        for b in self._ad_books:
-            if b['abbrev'] == book.upper():
-                return b['latex_abbrev']
+        b = self._data.index.get(book.upper())
+        if b is not None:
+            return b['latex_abbrev']
         return None
+
+    # Verse ordinals: all verses of the Bible are numbered consecutively, starting with GEN 1.1 = 1.
+    # Like this, positions can be stored, sorted and compared as integers
+
+    @staticmethod
+    def _get_chapter_slot(o, abbr, ch):
+        # Index of a chapter in the verse ordinal tables o; None if the book or the chapter does not exist
+        b = o.book_index.get(abbr.upper())
+        if b is None:
+            return None
+
+        # The chapter might come as an integer or as a string
+        try:
+            ch = int(ch)
+        except ValueError:
+            return None
+
+        first = o.chapter_start[b]
+        if ch < 1 or ch > o.chapter_start[b + 1] - first:
+            return None
+        return first + ch - 1
+
+    def get_verse_count(self):
+        """Number of verses in the whole Bible = the highest verse ordinal"""
+        return self._data.verse_ordinals.chapter_offsets[-1]
+
+    def get_verse_ordinal(self, abbr, ch, v):
+        """Returns the ordinal of a verse, None if the verse does not exist"""
+        o = self._data.verse_ordinals
+        slot = self._get_chapter_slot(o, abbr, ch)
+        if slot is None:
+            return None
+
+        try:
+            v = int(v)
+        except ValueError:
+            return None
+
+        offsets = o.chapter_offsets
+        if v < 1 or offsets[slot] + v > offsets[slot + 1]:
+            return None
+        return offsets[slot] + v
+
+    def get_verse_from_ordinal(self, ordinal):
+        """Returns (abbreviation, chapter, verse) for a verse ordinal, None if it is out of range"""
+        data = self._data
+        o = data.verse_ordinals
+        if ordinal < 1 or ordinal > o.chapter_offsets[-1]:
+            return None
+
+        # The chapter is the last one that starts before the ordinal
+        slot = bisect_left(o.chapter_offsets, ordinal) - 1
+        return (data.valid_abbrevs[o.chapter_book[slot]], o.chapter_number[slot],
+                ordinal - o.chapter_offsets[slot])
+
+    def get_chapter_ordinal_range(self, abbr, ch):
+        """Returns the ordinals of the first and the last verse of a chapter, None if it does not exist"""
+        o = self._data.verse_ordinals
+        slot = self._get_chapter_slot(o, abbr, ch)
+        if slot is None:
+            return None
+
+        offsets = o.chapter_offsets
+        return offsets[slot] + 1, offsets[slot + 1]
+
+    def get_book_ordinal_range(self, abbr):
+        """Returns the ordinals of the first and the last verse of a book, None if it does not exist"""
+        o = self._data.verse_ordinals
+        b = o.book_index.get(abbr.upper())
+        if b is None:
+            return None
+
+        return o.chapter_offsets[o.chapter_start[b]] + 1, o.chapter_offsets[o.chapter_start[b + 1]]
+
+    # Vectorized access with NumPy, for checking many verses at once (e.g. columns of a pandas DataFrame)
+
+    def get_verse_tables(self):
+        """
+        Returns the verse counts as NumPy arrays (read-only, shared):
+        'book_index': upper case abbreviation -> book number (position in the canon, from 0)
+        'chapter_start': book number -> index of its first chapter in the chapter arrays; one more entry at the end,
+                         so book b has the chapters chapter_start[b] .. chapter_start[b + 1] - 1
+        'chapter_offsets': chapter index -> ordinal of the last verse before the chapter; one more entry at the end
+        'verse_counts': chapter index -> number of verses
+        Requires NumPy
+        """
+        _require_numpy()
+        return self._catalog.get_derived('books.verse_tables', _build_verse_tables)
+
+    def get_book_numbers(self, abbrevs):
+        """Converts abbreviations (any case) to book numbers for check_verses(); -1 for unknown ones"""
+        np = _require_numpy()
+        book_index = self._data.verse_ordinals.book_index
+        # Each distinct abbreviation is looked up only once
+        unique, inverse = np.unique(np.asarray(abbrevs, dtype=str), return_inverse=True)
+        numbers = np.array([book_index.get(abbrev.upper(), -1) for abbrev in unique.tolist()], dtype=np.int64)
+        return numbers[inverse].reshape(np.shape(abbrevs))
+
+    def check_verses(self, books, chapters, verses):
+        """
+        Checks many verses in one call
+        books: book numbers (see get_book_numbers()); chapters, verses: integers. Arrays of the same shape
+        Returns (valid, ordinals): a boolean array that is True where the verse exists, and the verse ordinals
+        (see get_verse_ordinal()), 0 where the verse does not exist
+        Requires NumPy
+        """
+        np = _require_numpy()
+        tables = self.get_verse_tables()
+        chapter_start = tables['chapter_start']
+        b = np.asarray(books, dtype=np.int64)
+        c = np.asarray(chapters, dtype=np.int64)
+        v = np.asarray(verses, dtype=np.int64)
+
+        # Invalid values are replaced by 0 before they are used as indexes
+        valid = (b >= 0) & (b < len(chapter_start) - 1)
+        b = np.where(valid, b, 0)
+        valid &= (c >= 1) & (c <= chapter_start[b + 1] - chapter_start[b])
+        slot = np.where(valid, chapter_start[b] + c - 1, 0)
+        valid &= (v >= 1) & (v <= tables['verse_counts'][slot])
+        ordinals = np.where(valid, tables['chapter_offsets'][slot] + v, 0)
+        return valid, ordinals
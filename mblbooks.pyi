@@ -1,13 +1,47 @@
-from typing import List, Dict, Any, Optional, ClassVar
+from array import array
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Optional, ClassVar, Sequence, Tuple, Union
+from .mblcatalog import Catalog
+from .mblrecords import BookRecord
+
+
+def _build_verse_tables(catalog: Catalog) -> Dict[str, Any]: ...
+def _import_numpy() -> Optional[Any]: ...
+def _require_numpy() -> Any: ...
+def _build_psalms_with_heading(catalog: Catalog) -> Tuple[int, ...]: ...
+def _build_psalms_with_heading_set(catalog: Catalog) -> FrozenSet[int]: ...
+_CATALOG_ATTRIBUTES: Dict[str, Any]
+
+
+class _VerseOrdinals:
+    book_index: Dict[str, int]
+    chapter_start: array
+    chapter_offsets: array
+    chapter_book: array
+    chapter_number: array
+
+    def __init__(self, books: Sequence[Dict[str, Any]]) -> None: ...
+
+
+class _BooksData(NamedTuple):
+    books: Tuple[BookRecord, ...]
+    valid_abbrevs: Sequence[str]
+    index: Dict[str, BookRecord]
+    sort_values: Dict[str, int]
+    verse_ordinals: _VerseOrdinals
+
+
+def _build_books_data(catalog: Catalog) -> _BooksData: ...
 
 
 class Books:
     _a_one_chapter_books: ClassVar[List[str]]
-    _a_psalms_with_heading: ClassVar[List[int]]
+
+    _catalog: Catalog
+    _data: _BooksData
 
     def __init__(self) -> None: ...
     def parse_books(self, xml_file: str) -> List[Dict[str, Any]]: ...
-    def get_valid_abbreviations(self) -> List[str]: ...
+    def get_valid_abbreviations(self) -> Sequence[str]: ...
     def is_valid_abbreviation(self, abbrev: str) -> bool: ...
     @classmethod
     def get_one_chapter_books(cls) -> List[str]: ...
@@ -15,8 +49,19 @@ class Books:
     def get_max_chapter(self, abbr: str) -> Optional[int]: ...
     def get_max_verse(self, abbr: str, ch: Any) -> Optional[int]: ...
     @classmethod
-    def get_psalms_with_heading(cls) -> List[int]: ...
+    def get_psalms_with_heading(cls) -> Tuple[int, ...]: ...
     @classmethod
     def is_psalm_with_heading(cls, ch: Any) -> bool: ...
+    def get_heading_verses(self, abbr: str, ch: Union[int, str]) -> int: ...
     def get_testament(self, book: str) -> Optional[str]: ...
     def get_latex_abbrev(self, book: str) -> Optional[str]: ...
+    @staticmethod
+    def _get_chapter_slot(o: _VerseOrdinals, abbr: str, ch: Any) -> Optional[int]: ...
+    def get_verse_count(self) -> int: ...
+    def get_verse_ordinal(self, abbr: str, ch: Any, v: Any) -> Optional[int]: ...
+    def get_verse_from_ordinal(self, ordinal: int) -> Optional[Tuple[str, int, int]]: ...
+    def get_chapter_ordinal_range(self, abbr: str, ch: Any) -> Optional[Tuple[int, int]]: ...
+    def get_book_ordinal_range(self, abbr: str) -> Optional[Tuple[int, int]]: ...
+    def get_verse_tables(self) -> Dict[str, Any]: ...
+    def get_book_numbers(self, abbrevs: Any) -> Any: ...
+    def check_verses(self, books: Any, chapters: Any, verses: Any) -> Tuple[Any, Any]: ...
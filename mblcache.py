@@ -0,0 +1,72 @@
+# In-memory caches
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Size-bounded cache: when it is full, the least recently used entry is dropped
+    Safe to share between threads. None cannot be cached, get() uses it for "not found"
+    """
+
+    def __init__(self, capacity=1024):
+        if capacity < 1:
+            raise ValueError('The capacity of a cache must be at least 1')
+
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters for get_stats()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key=None):
+        """Removes one entry, or all entries if no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def set_capacity(self, capacity):
+        if capacity < 1:
+            raise ValueError('The capacity of a cache must be at least 1')
+
+        with self._lock:
+            self._capacity = capacity
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'capacity': self._capacity,
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,20 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    _capacity: int
+    _entries: OrderedDict
+    _lock: threading.Lock
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(self, capacity: int = ...) -> None: ...
+    def get(self, key: Hashable) -> Any: ...
+    def put(self, key: Hashable, value: Any) -> None: ...
+    def invalidate(self, key: Optional[Hashable] = ...) -> None: ...
+    def set_capacity(self, capacity: int) -> None: ...
+    def get_stats(self) -> Dict[str, int]: ...
+    def __len__(self) -> int: ...
@@ -0,0 +1,527 @@
+# Process-wide catalog of the XML data (books, versions, servers)
+import hashlib
+import marshal
+import os
+import sys
+import threading
+import weakref
+import xml.etree.ElementTree as ET
+
+from msbiblelib.mblrecords import RECORD_TYPES
+
+
+# The XML files are part of the package, so we need the absolute path
+_DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Source name -> file name
+_SOURCE_FILES = {
+    'books': 'books.xml',
+    'versions': 'versions.xml',
+    'servers': 'servers.xml',
+}
+
+# Precompiled binary form of the three XML files, see build_snapshot()
+SNAPSHOT_FILE = 'catalog.snapshot'
+
+# Increase when the layout of the snapshot or of the records changes
+_SNAPSHOT_FORMAT = 3
+
+
+def parse_books(xml_file):
+    """
+    Reads books.xml
+    Returns a list of dictionaries, one per book, in canonical order
+    """
+    tree = ET.parse(xml_file)
+    root = tree.getroot()
+
+    book_data = []
+    for book in root.findall('book'):
+        book_info = {
+            'abbrev': book.get('abbrev'),
+            'maxchapter': int(book.get('maxchapter')),
+            'testament': book.get('testament'),
+            'latex_abbrev': book.get('latex_abbrev'),
+            'chapters': {},
+            'headings': {}
+        }
+
+        # Chapter number -> number of verses; chapter number -> number of verses of the heading (psalms)
+        for chapter in book.findall('chapter'):
+            book_info['chapters'][int(chapter.get('number'))] = int(chapter.get('verses'))
+            if chapter.get('heading'):
+                book_info['headings'][int(chapter.get('number'))] = int(chapter.get('heading'))
+
+        book_data.append(book_info)
+
+    return book_data
+
+
+def parse_versions(xml_file):
+    """
+    Reads versions.xml
+    Returns a list of dictionaries, one per version
+    """
+    versions = []
+    tree = ET.parse(xml_file)
+    root = tree.getroot()
+
+    for version in root.findall('version'):
+        # helper: safely get text (returns default when missing or None)
+        def t(tag, default=''):
+            val = version.findtext(tag, default)
+            return val if val is not None else default
+
+        extracontent_text = t('extracontent', '')
+        extracontent = (
+            [s.strip() for s in extracontent_text.split(',') if s.strip()]
+            if extracontent_text
+            else None
+        )
+
+        alternatives_text = t('alternatives', '')
+        alternatives = (
+            [s.strip() for s in alternatives_text.split(',') if s.strip()]
+            if alternatives_text
+            else None
+        )
+
+        version_dict = {
+            'name': t('name'),
+            'servername': t('servername'),
+            'language': t('language'),
+            'content': t('content'),
+            'server': t('server'),
+            'fullname': t('fullname'),
+            'year': t('year'),
+            'denomination': t('denomination'),
+            'extracontent': extracontent,
+            'comment': t('comment'),
+            'family': t('family'),
+            'alternatives': alternatives,
+            'versification': t('versification') or 'MT',
+        }
+        versions.append(version_dict)
+
+    return versions
+
+
+def parse_servers(xml_file):
+    """
+    Reads servers.xml
+    Returns a list of dictionaries, one per server
+    """
+    servers = []
+    tree = ET.parse(xml_file)
+    root = tree.getroot()
+    for server in root.findall('bibleserver'):
+        server_dict = {}
+        server_dict['name'] = server.find('name').text
+        server_dict['url'] = server.find('url').text
+        server_dict['chapterurl'] = server.find('chapterurl').text
+        # The status is an attribute (<bibleserver status="inactive">); older files used a <status> element
+        if server.get('status') is not None:
+            server_dict['status'] = server.get('status')
+        else:
+            server_dict['status'] = server.find('status').text if server.find('status') is not None else 'active'
+        server_dict['weight'] = int(server.get('weight', 0))
+        server_dict['books'] = []
+        for book in server.findall('books/book'):
+            book_dict = {}
+            book_dict['name_de'] = book.get('name_de')
+            book_dict['name_en'] = book.get('name_en') if book.get('name_en') is not None else book.get('name_de')
+            book_dict['name_extra'] = book.get('name_extra') if book.get('name_extra') is not None else book.get('name_de')
+            book_dict['abbreviation'] = book.text
+            server_dict['books'].append(book_dict)
+        servers.append(server_dict)
+    return servers
+
+
+_PARSERS = {
+    'books': parse_books,
+    'versions': parse_versions,
+    'servers': parse_servers,
+}
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_snapshot(data_dir=None, snapshot_file=None):
+    """
+    Compiles books.xml, versions.xml and servers.xml into one binary file (marshal format)
+    The hash of every XML file is stored with its records, so a stale snapshot is detected when loading
+    Returns the path of the snapshot
+    """
+    data_dir = data_dir if data_dir is not None else _DATA_DIR
+    snapshot_file = snapshot_file if snapshot_file is not None else os.path.join(data_dir, SNAPSHOT_FILE)
+
+    sources = {}
+    for source, file_name in _SOURCE_FILES.items():
+        path = os.path.join(data_dir, file_name)
+        sources[source] = {
+            'hash': _file_hash(path),
+            'records': _PARSERS[source](path),
+        }
+
+    snapshot = {
+        'format': _SNAPSHOT_FORMAT,
+        # marshal is only guaranteed to be readable by the same Python version
+        'python': sys.implementation.cache_tag,
+        'sources': sources,
+    }
+
+    # Write to a temporary file first, so nobody ever reads a half-written snapshot
+    tmp_file = f'{snapshot_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(marshal.dumps(snapshot))
+    os.replace(tmp_file, snapshot_file)
+
+    return snapshot_file
+
+
+def read_snapshot(snapshot_file):
+    """
+    Returns the content of a snapshot file, or None if it is missing, unreadable or was built by another
+    Python version or format
+    """
+    try:
+        # Reading the whole file first is much faster than marshal.load() on the file object
+        with open(snapshot_file, 'rb') as f:
+            snapshot = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if not isinstance(snapshot, dict) \
+            or snapshot.get('format') != _SNAPSHOT_FORMAT \
+            or snapshot.get('python') != sys.implementation.cache_tag:
+        return None
+
+    return snapshot
+
+
+def _file_signature(path):
+    # Cheap test for changes of a file: modification time and size
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _to_records(source, records):
+    record_type = RECORD_TYPES[source]
+    return tuple(record_type.from_dict(record) for record in records)
+
+
+class _CatalogState:
+    """
+    Everything a catalog has loaded and derived:
+    records: source name -> tuple of records
+    files: source name -> (signature, hash) of the XML file the records were read from
+    derived: name -> structure derived from the records
+    dependencies: name of a derived structure -> names of the sources its builder read, directly or through
+    other derived structures
+    Missing entries are added when they are needed. Nothing is ever replaced or removed: reload() publishes
+    a new state instead
+    """
+
+    __slots__ = ('records', 'files', 'derived', 'dependencies')
+
+    def __init__(self, records=None, files=None, derived=None, dependencies=None):
+        self.records = records if records is not None else {}
+        self.files = files if files is not None else {}
+        self.derived = derived if derived is not None else {}
+        self.dependencies = dependencies if dependencies is not None else {}
+
+    def replace(self, changed, files):
+        """
+        Returns a new state with the records of the changed sources (source name -> records) and the new file
+        information. Derived structures that depend on a changed source are left out; so are those that did not
+        read any source, because their dependencies are not known
+        """
+        records = dict(self.records)
+        records.update(changed)
+        derived = {}
+        dependencies = {}
+        for name, value in self.derived.items():
+            sources = self.dependencies.get(name)
+            if sources and sources.isdisjoint(changed):
+                derived[name] = value
+                dependencies[name] = sources
+        return _CatalogState(records, {**self.files, **files}, derived, dependencies)
+
+
+class Catalog:
+    """
+    The parsed content of books.xml, versions.xml and servers.xml
+    Each file is read at most once, when it is needed for the first time, or again by reload() after it changed.
+    All Books, Versions, Bibleservers and References objects share the same data - so it must never be changed
+
+    All data is kept in one _CatalogState. Readers take the current state without locking; reload() builds the
+    new records outside of the lock and then replaces the whole state with one assignment
+    """
+
+    def __init__(self, data_dir=None, use_snapshot=True):
+        self._data_dir = data_dir if data_dir is not None else _DATA_DIR
+        self._lock = threading.RLock()
+
+        # Only one reload() at a time; lookups do not wait for it
+        self._reload_lock = threading.Lock()
+
+        # Content of the snapshot file; None: not read yet, False: not available
+        self._snapshot = None if use_snapshot else False
+
+        self._state = _CatalogState()
+
+        # Builders that run in this thread: a stack with a set of the sources each one reads
+        self._local = threading.local()
+        # Number of builders running (in the thread that holds the lock); 0 means nothing is to be tracked
+        self._building = 0
+
+        # Increased by every reload() that published a new state
+        self._generation = 0
+
+        # Objects whose attributes are set from the catalog, see bind(): object -> attributes
+        self._bound = weakref.WeakKeyDictionary()
+
+        # Called after reload() with the catalog and the names of the changed sources
+        self._listeners = []
+
+    def get_path(self, source):
+        return os.path.join(self._data_dir, _SOURCE_FILES[source])
+
+    def _track(self, sources):
+        # Adds sources to the dependencies of all builders that run in this thread
+        for frame in getattr(self._local, 'stack', ()):
+            frame.update(sources)
+
+    def get_records(self, source):
+        records = self._state.records.get(source)
+        if records is None:
+            with self._lock:
+                # Another thread might have been faster
+                state = self._state
+                records = state.records.get(source)
+                if records is None:
+                    records, file_info = self._load_records(source)
+                    state.files[source] = file_info
+                    state.records[source] = records
+        if self._building:
+            self._track((source,))
+        return records
+
+    def _load_records(self, source):
+        # Returns (records, (signature, hash) of the file)
+        # The snapshot is only used if the XML file did not change since it was built
+        path = self.get_path(source)
+        file_info = _file_signature(path), _file_hash(path)
+        snapshot = self._get_snapshot()
+        if snapshot:
+            entry = snapshot['sources'].get(source)
+            if entry is not None and entry['hash'] == file_info[1]:
+                return _to_records(source, entry['records']), file_info
+
+        return _to_records(source, _PARSERS[source](path)), file_info
+
+    def _get_snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = read_snapshot(os.path.join(self._data_dir, SNAPSHOT_FILE)) or False
+        return self._snapshot
+
+    def get_derived(self, name, builder):
+        """
+        Returns a structure that is computed from the records only once, e.g. an index
+        builder is called with the catalog as its only argument. The sources it reads are recorded, so reload()
+        drops the structure only if one of them changed
+        """
+        state = self._state
+        value = state.derived.get(name)
+        if value is None:
+            with self._lock:
+                state = self._state
+                value = state.derived.get(name)
+                if value is None:
+                    value = self._build(state, name, builder)
+        if self._building:
+            self._track(state.dependencies.get(name, ()))
+        return value
+
+    def _build(self, state, name, builder):
+        # Called with the lock held
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(set())
+        self._building += 1
+        try:
+            value = builder(self)
+        finally:
+            self._building -= 1
+            sources = stack.pop()
+        state.dependencies[name] = frozenset(sources)
+        state.derived[name] = value
+        return value
+
+    def reload(self, force=False):
+        """
+        Reads the XML files again that changed since they were loaded (modification time or size, then content)
+        The new records are published with one atomic swap: until then, readers in other threads use the old data;
+        they never wait for the parsing and never see a half-built state. Derived structures that depend on
+        a changed file are dropped and built again when they are needed; all others are kept
+        Files that were not loaded yet are not read. force: check the content of all loaded files
+        Returns the names of the changed sources
+        """
+        with self._reload_lock:
+            changed = {}
+            files = {}
+            for source, (signature, file_hash) in list(self._state.files.items()):
+                path = self.get_path(source)
+                new_signature = _file_signature(path)
+                if new_signature == signature and not force:
+                    continue
+                new_hash = _file_hash(path)
+                files[source] = new_signature, new_hash
+                if new_hash != file_hash:
+                    changed[source] = _to_records(source, _PARSERS[source](path))
+
+            if not files:
+                return []
+            with self._lock:
+                self._state = self._state.replace(changed, files)
+                self._generation += 1
+                bound = list(self._bound.items())
+
+            # The objects get the new data; like this, the derived structures they use are also built again now,
+            # in this thread, and not by the next lookup
+            if changed:
+                for obj, attributes in bound:
+                    self._set_attributes(obj, attributes)
+
+        changed = sorted(changed)
+        if changed:
+            for listener in list(self._listeners):
+                listener(self, changed)
+        return changed
+
+    def bind(self, obj, attributes):
+        """
+        Sets attributes of an object to records or derived structures of the catalog, and sets them again after
+        every reload() that changed something, so long-lived objects follow the changes at no cost per lookup
+        attributes: attribute name -> source name ('books') or (name of the derived structure, builder)
+        Each attribute is replaced with one assignment and always refers to a complete structure. Structures that
+        must fit together belong in one object bound to one attribute (see Books), because reload() sets several
+        attributes one after the other. The object is not kept alive by the catalog
+        """
+        with self._lock:
+            self._bound[obj] = attributes
+        # If a reload() published a new state meanwhile, the values might be outdated already
+        while True:
+            generation = self._generation
+            self._set_attributes(obj, attributes)
+            if generation == self._generation:
+                break
+
+    def _set_attributes(self, obj, attributes):
+        # All values are taken (and built if necessary) first, then set one after the other
+        values = [(attribute, self.get_records(spec) if isinstance(spec, str) else self.get_derived(*spec))
+                  for attribute, spec in attributes.items()]
+        for attribute, value in values:
+            setattr(obj, attribute, value)
+
+    def add_reload_listener(self, listener):
+        """
+        listener(catalog, names of the changed sources) is called after every reload() that changed something,
+        e.g. to clear an LRUCache of References.parse_reference() results when books.xml changed
+        """
+        self._listeners.append(listener)
+
+    def remove_reload_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @property
+    def books(self):
+        return self.get_records('books')
+
+    @property
+    def versions(self):
+        return self.get_records('versions')
+
+    @property
+    def servers(self):
+        return self.get_records('servers')
+
+
+class CatalogWatcher:
+    """
+    Calls Catalog.reload() every interval seconds in a background thread, so long-running processes pick up
+    edits of the XML files without a restart:
+
+        watcher = CatalogWatcher(interval=2.0).start()
+        ...
+        watcher.stop()
+
+    A file that cannot be read or parsed (e.g. while it is being written) is tried again at the next check;
+    the catalog keeps the previous data meanwhile, and the error is in last_error
+    """
+
+    def __init__(self, catalog=None, interval=2.0):
+        self._catalog = catalog if catalog is not None else get_catalog()
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='mblcatalog-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.check()
+
+    def check(self):
+        """Reloads changed files now; returns the names of the changed sources"""
+        try:
+            changed = self._catalog.reload()
+        except Exception as e:
+            self.last_error = e
+            return []
+        self.last_error = None
+        if changed:
+            self.reloads += 1
+        return changed
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Returns the catalog that is shared by the whole process
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
+
+
+if __name__ == '__main__':
+    # Build step: python -m msbiblelib.mblcatalog
+    print(f'Snapshot written to {build_snapshot()}')
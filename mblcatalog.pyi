@@ -0,0 +1,87 @@
+import threading
+import weakref
+from typing import List, Dict, Any, Callable, FrozenSet, Iterable, Optional, Tuple, TypeVar, Union
+
+from .mblrecords import BookRecord, Record, ServerRecord, VersionRecord
+
+_T = TypeVar('_T')
+
+SNAPSHOT_FILE: str
+
+
+def parse_books(xml_file: str) -> List[Dict[str, Any]]: ...
+def parse_versions(xml_file: str) -> List[Dict[str, Any]]: ...
+def parse_servers(xml_file: str) -> List[Dict[str, Any]]: ...
+def build_snapshot(data_dir: Optional[str] = ..., snapshot_file: Optional[str] = ...) -> str: ...
+def read_snapshot(snapshot_file: str) -> Optional[Dict[str, Any]]: ...
+def _file_signature(path: str) -> Tuple[int, int]: ...
+def _to_records(source: str, records: List[Dict[str, Any]]) -> Tuple[Record, ...]: ...
+
+# Attribute name -> source name, or (name of the derived structure, builder)
+_AttributeSpec = Union[str, Tuple[str, Callable[[Catalog], Any]]]
+
+
+class _CatalogState:
+    records: Dict[str, Tuple[Record, ...]]
+    files: Dict[str, Tuple[Tuple[int, int], str]]
+    derived: Dict[str, Any]
+    dependencies: Dict[str, FrozenSet[str]]
+
+    def __init__(self, records: Optional[Dict[str, Tuple[Record, ...]]] = ...,
+                 files: Optional[Dict[str, Tuple[Tuple[int, int], str]]] = ...,
+                 derived: Optional[Dict[str, Any]] = ..., dependencies: Optional[Dict[str, FrozenSet[str]]] = ...) -> None: ...
+    def replace(self, changed: Dict[str, Tuple[Record, ...]],
+                files: Dict[str, Tuple[Tuple[int, int], str]]) -> _CatalogState: ...
+
+
+class Catalog:
+    _data_dir: str
+    _lock: threading.RLock
+    _snapshot: Union[None, bool, Dict[str, Any]]
+    _reload_lock: threading.Lock
+    _state: _CatalogState
+    _local: threading.local
+    _building: int
+    _generation: int
+    _bound: weakref.WeakKeyDictionary
+    _listeners: List[Callable[[Catalog, List[str]], None]]
+
+    def __init__(self, data_dir: Optional[str] = ..., use_snapshot: bool = ...) -> None: ...
+    def get_path(self, source: str) -> str: ...
+    def _track(self, sources: Iterable[str]) -> None: ...
+    def get_records(self, source: str) -> Tuple[Record, ...]: ...
+    def _load_records(self, source: str) -> Tuple[Tuple[Record, ...], Tuple[Tuple[int, int], str]]: ...
+    def _get_snapshot(self) -> Union[bool, Dict[str, Any]]: ...
+    def get_derived(self, name: str, builder: Callable[[Catalog], _T]) -> _T: ...
+    def _build(self, state: _CatalogState, name: str, builder: Callable[[Catalog], _T]) -> _T: ...
+    def reload(self, force: bool = ...) -> List[str]: ...
+    def bind(self, obj: Any, attributes: Dict[str, _AttributeSpec]) -> None: ...
+    def _set_attributes(self, obj: Any, attributes: Dict[str, _AttributeSpec]) -> None: ...
+    def add_reload_listener(self, listener: Callable[[Catalog, List[str]], None]) -> None: ...
+    def remove_reload_listener(self, listener: Callable[[Catalog, List[str]], None]) -> None: ...
+    @property
+    def books(self) -> Tuple[BookRecord, ...]: ...
+    @property
+    def versions(self) -> Tuple[VersionRecord, ...]: ...
+    @property
+    def servers(self) -> Tuple[ServerRecord, ...]: ...
+
+
+class CatalogWatcher:
+    _catalog: Catalog
+    _interval: float
+    _stop: threading.Event
+    _thread: Optional[threading.Thread]
+    reloads: int
+    last_error: Optional[Exception]
+
+    def __init__(self, catalog: Optional[Catalog] = ..., interval: float = ...) -> None: ...
+    def start(self) -> CatalogWatcher: ...
+    def stop(self) -> None: ...
+    def __enter__(self) -> CatalogWatcher: ...
+    def __exit__(self, *exc_info: Any) -> None: ...
+    def _run(self) -> None: ...
+    def check(self) -> List[str]: ...
+
+
+def get_catalog() -> Catalog: ...
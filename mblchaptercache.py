@@ -0,0 +1,338 @@
+# Persistent cache for downloaded chapters
+import marshal
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; there, only the threads of one process are synchronized
+    fcntl = None
+
+
+# Every entry in the data file: header, key (UTF-8), compressed payload
+# Header: magic, length of the key, length of the payload, CRC32 of the payload, time of storing
+_HEADER = struct.Struct('<4sHIId')
+_MAGIC = b'MBLC'
+
+# Payload length of an entry that marks a key as deleted
+_DELETED = 0xFFFFFFFF
+
+# Increase when the layout of the index file changes
+_INDEX_FORMAT = 1
+
+# After an eviction the data file is at most this part of the byte budget, so it is not compacted on every put()
+_LOW_WATERMARK = 0.75
+
+
+def _make_key(server, version, book, chapter):
+    return f'{server.lower()}\x1f{version.lower()}\x1f{book.upper()}\x1f{int(chapter)}'
+
+
+class ChapterCache:
+    """
+    Stores chapters on disk, keyed by (server, version, book, chapter)
+
+    The payloads are compressed with zlib and appended to one data file. An index (key -> position) is kept
+    in memory and saved in a small index file by flush() and close(). Reads go through a memory map of the
+    data file, so a hit only touches its own entry.
+
+    If the data file grows beyond max_bytes, it is rewritten with the most recently used entries only (LRU).
+    Entries older than ttl seconds are expired; if a revalidate function is given, it is called as
+    revalidate(server, version, book, chapter, payload, stored_at) and may return True (still valid),
+    new payload bytes (replace the entry) or False/None (drop it).
+
+    Several processes can use the same directory: writers hold an exclusive lock on a lock file, readers pick up
+    entries that other processes appended, and a compaction by another process is detected by the changed inode.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, ttl=None, revalidate=None, compression_level=6):
+        os.makedirs(directory, exist_ok=True)
+        self._data_path = os.path.join(directory, 'chapters.dat')
+        self._index_path = os.path.join(directory, 'chapters.idx')
+        self._lock_path = os.path.join(directory, 'chapters.lock')
+
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._revalidate = revalidate
+        self._compression_level = compression_level
+
+        self._lock = threading.RLock()
+
+        # Key -> (offset of the payload, length of the payload, time of storing)
+        self._entries = {}
+        # Key -> time of the last access, for the LRU eviction
+        self._access = {}
+
+        # The data file: inode (changes on compaction), number of bytes in the index, file object, memory map
+        self._ino = None
+        self._size = 0
+        self._file = None
+        self._mmap = None
+
+        # Counters for get_stats()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+        with self._lock:
+            self._open()
+
+    # Locking and loading
+
+    @contextmanager
+    def _file_lock(self):
+        # Exclusive lock across processes, for all changes of the data and the index file
+        with open(self._lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open(self):
+        self._close_files()
+        self._entries = {}
+        self._size = 0
+
+        # The data file is only appended to; 'ab' creates it if necessary
+        self._file = open(self._data_path, 'ab')
+        self._ino = os.fstat(self._file.fileno()).st_ino
+
+        # Start with the saved index if it belongs to this data file, then read what was appended since
+        index = self._read_index()
+        if index is not None and index['ino'] == self._ino \
+                and index['size'] <= os.fstat(self._file.fileno()).st_size:
+            self._entries = index['entries']
+            for key, last_access in index['access'].items():
+                self._access.setdefault(key, last_access)
+            self._size = index['size']
+
+        self._scan()
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, 'rb') as f:
+                index = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(index, dict) or index.get('format') != _INDEX_FORMAT:
+            return None
+        return index
+
+    def _remap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        size = os.fstat(self._file.fileno()).st_size
+        if size > 0:
+            with open(self._data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        return size
+
+    def _scan(self):
+        # Adds the entries from self._size to the end of the data file to the index
+        size = self._remap()
+        offset = self._size
+        while offset + _HEADER.size <= size:
+            magic, key_length, payload_length, _, stored_at = _HEADER.unpack_from(self._mmap, offset)
+            if magic != _MAGIC:
+                break
+            key_start = offset + _HEADER.size
+            payload_start = key_start + key_length
+            end = payload_start + (0 if payload_length == _DELETED else payload_length)
+            # Another process might still be writing this entry
+            if end > size:
+                break
+
+            try:
+                key = self._mmap[key_start:payload_start].decode('utf-8')
+            except UnicodeDecodeError:
+                # Not an entry: the rest of a torn one
+                break
+            if payload_length == _DELETED:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = (payload_start, payload_length, stored_at)
+            offset = end
+        self._size = offset
+
+    def _refresh(self):
+        # Picks up changes by other processes: a compaction (new inode) or appended entries
+        try:
+            st = os.stat(self._data_path)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_ino != self._ino:
+            self._open()
+        elif st.st_size > self._size:
+            self._scan()
+
+    # Reading and writing
+
+    def _read_payload(self, key):
+        offset, length, stored_at = self._entries[key]
+        with memoryview(self._mmap)[offset:offset + length] as compressed:
+            _, _, _, crc, _ = _HEADER.unpack_from(self._mmap, offset - _HEADER.size - len(key.encode('utf-8')))
+            if zlib.crc32(compressed) != crc:
+                return None
+            return zlib.decompress(compressed)
+
+    def get(self, server, version, book, chapter):
+        """Returns the cached chapter (bytes), None if it is not cached or has expired"""
+        key = _make_key(server, version, book, chapter)
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            payload = self._read_payload(key)
+            if payload is None:
+                # Damaged entry
+                self._misses += 1
+                return None
+
+            if self._ttl is not None and time.time() - entry[2] > self._ttl:
+                self._expired += 1
+                result = self._revalidate(server, version, book, chapter, payload, entry[2]) \
+                    if self._revalidate is not None else None
+                if result is True:
+                    # Still valid: store it again to reset its age
+                    self.put(server, version, book, chapter, payload)
+                elif isinstance(result, (bytes, bytearray)):
+                    payload = bytes(result)
+                    self.put(server, version, book, chapter, payload)
+                else:
+                    self.delete(server, version, book, chapter)
+                    self._misses += 1
+                    return None
+
+            self._access[key] = time.time()
+            self._hits += 1
+            return payload
+
+    def _append(self, key, payload):
+        # Writes one entry; payload None marks the key as deleted
+        key_bytes = key.encode('utf-8')
+        if payload is None:
+            header = _HEADER.pack(_MAGIC, len(key_bytes), _DELETED, 0, time.time())
+            data = b''
+        else:
+            data = zlib.compress(payload, self._compression_level)
+            header = _HEADER.pack(_MAGIC, len(key_bytes), len(data), zlib.crc32(data), time.time())
+
+        with self._file_lock():
+            self._refresh()
+            # Bytes after the last complete entry are left over from a writer that was killed or ran out of disk
+            # space; nobody else is writing now. They are cut off, or all later entries would be unreachable
+            if os.fstat(self._file.fileno()).st_size > self._size:
+                os.ftruncate(self._file.fileno(), self._size)
+
+            # One write call, so other processes never see a partial header
+            self._file.write(header + key_bytes + data)
+            self._file.flush()
+            self._scan()
+
+            if self._size > self._max_bytes:
+                self._compact()
+
+    def put(self, server, version, book, chapter, payload):
+        key = _make_key(server, version, book, chapter)
+        with self._lock:
+            self._append(key, payload)
+            self._access[key] = time.time()
+
+    def delete(self, server, version, book, chapter):
+        key = _make_key(server, version, book, chapter)
+        with self._lock:
+            if key in self._entries:
+                self._append(key, None)
+            self._access.pop(key, None)
+
+    def _compact(self):
+        # Rewrites the data file with the most recently used entries; the file lock must be held
+        by_recency = sorted(self._entries, key=lambda k: self._access.get(k, self._entries[k][2]), reverse=True)
+
+        tmp_path = f'{self._data_path}.{os.getpid()}.tmp'
+        budget = self._max_bytes * _LOW_WATERMARK
+        written = 0
+        with open(tmp_path, 'wb') as f:
+            for key in by_recency:
+                offset, length, _ = self._entries[key]
+                start = offset - _HEADER.size - len(key.encode('utf-8'))
+                size = offset + length - start
+                if written + size > budget:
+                    self._evictions += 1
+                    self._access.pop(key, None)
+                    continue
+                # The entries are copied as they are, without decompressing them
+                f.write(self._mmap[start:offset + length])
+                written += size
+        os.replace(tmp_path, self._data_path)
+
+        self._open()
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            'format': _INDEX_FORMAT,
+            'ino': self._ino,
+            'size': self._size,
+            'entries': self._entries,
+            'access': {key: t for key, t in self._access.items() if key in self._entries},
+        }
+        tmp_path = f'{self._index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(marshal.dumps(index))
+        os.replace(tmp_path, self._index_path)
+
+    def flush(self):
+        """Saves the index, so the next process does not need to read the whole data file"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            self._write_index()
+
+    def _close_files(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self.flush()
+            self._close_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self._max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evictions': self._evictions,
+            }
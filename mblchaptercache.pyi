@@ -0,0 +1,58 @@
+import mmap
+import struct
+import threading
+from typing import Any, BinaryIO, Callable, ContextManager, Dict, Iterator, Optional, Tuple, Union
+
+_HEADER: struct.Struct
+_MAGIC: bytes
+_DELETED: int
+_INDEX_FORMAT: int
+_LOW_WATERMARK: float
+
+_Revalidate = Callable[[str, str, str, int, bytes, float], Union[bool, bytes, None]]
+
+def _make_key(server: str, version: str, book: str, chapter: int) -> str: ...
+
+
+class ChapterCache:
+    _data_path: str
+    _index_path: str
+    _lock_path: str
+    _max_bytes: int
+    _ttl: Optional[float]
+    _revalidate: Optional[_Revalidate]
+    _compression_level: int
+    _lock: threading.RLock
+    _entries: Dict[str, Tuple[int, int, float]]
+    _access: Dict[str, float]
+    _ino: Optional[int]
+    _size: int
+    _file: Optional[BinaryIO]
+    _mmap: Optional[mmap.mmap]
+    _hits: int
+    _misses: int
+    _expired: int
+    _evictions: int
+
+    def __init__(self, directory: str, max_bytes: int = ..., ttl: Optional[float] = ...,
+                 revalidate: Optional[_Revalidate] = ..., compression_level: int = ...) -> None: ...
+    def _file_lock(self) -> ContextManager[None]: ...
+    def _open(self) -> None: ...
+    def _read_index(self) -> Optional[Dict[str, Any]]: ...
+    def _remap(self) -> int: ...
+    def _scan(self) -> None: ...
+    def _refresh(self) -> None: ...
+    def _read_payload(self, key: str) -> Optional[bytes]: ...
+    def get(self, server: str, version: str, book: str, chapter: int) -> Optional[bytes]: ...
+    def _append(self, key: str, payload: Optional[bytes]) -> None: ...
+    def put(self, server: str, version: str, book: str, chapter: int, payload: bytes) -> None: ...
+    def delete(self, server: str, version: str, book: str, chapter: int) -> None: ...
+    def _compact(self) -> None: ...
+    def _write_index(self) -> None: ...
+    def flush(self) -> None: ...
+    def _close_files(self) -> None: ...
+    def close(self) -> None: ...
+    def __enter__(self) -> ChapterCache: ...
+    def __exit__(self, *exc_info: Any) -> None: ...
+    def __len__(self) -> int: ...
+    def get_stats(self) -> Dict[str, int]: ...
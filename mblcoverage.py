@@ -0,0 +1,229 @@
+# Which versions and servers contain which books
+from msbiblelib.mblbooks import Books
+from msbiblelib.mblcatalog import get_catalog
+from msbiblelib.mblreferences import References
+
+
+def _bits(mask):
+    # Positions of the set bits, in ascending order
+    positions = []
+    while mask:
+        low = mask & -mask
+        positions.append(low.bit_length() - 1)
+        mask ^= low
+    return positions
+
+
+class _CoverageMatrix:
+    """
+    Bitsets (Python integers) over the books and over the versions, built from books.xml, versions.xml and
+    servers.xml. Bit b of a book bitset is the book at position b of books.xml, bit v of a version bitset the
+    version at position v of versions.xml, bit s of a server bitset the server at position s of servers.xml
+    """
+
+    def __init__(self, catalog):
+        books = catalog.books
+        self.abbrevs = tuple(book['abbrev'] for book in books)
+
+        # Upper case abbreviation -> bit
+        self.book_bits = {abbrev.upper(): b for b, abbrev in enumerate(self.abbrevs)}
+        testaments = {}
+        for b, book in enumerate(books):
+            testaments[book['testament'].upper()] = testaments.get(book['testament'].upper(), 0) | 1 << b
+        all_books = (1 << len(books)) - 1
+
+        # Servers: the books each one provides; inactive servers provide nothing
+        self.server_names = tuple(server['name'] for server in catalog.servers)
+        self.server_bits = {}
+        self.server_books = []
+        for s, server in enumerate(catalog.servers):
+            self.server_bits.setdefault(server['name'].lower(), s)
+            mask = 0
+            if server['status'] != 'inactive':
+                for book in server['books']:
+                    b = self.book_bits.get(book['abbreviation'].upper())
+                    if b is not None:
+                        mask |= 1 << b
+            self.server_books.append(mask)
+
+        # Versions: the books of their content and extracontent, and of these the books that their server provides
+        self.version_names = tuple(version['name'] for version in catalog.versions)
+        self.version_bits = {}
+        self.version_books = []
+        self.version_available = []
+        self.version_server = []
+        for v, version in enumerate(catalog.versions):
+            self.version_bits.setdefault(version['name'].lower(), v)
+            content = (version['content'] or '').upper()
+            mask = all_books if content == 'FB' else testaments.get(content, 0)
+            for abbrev in version['extracontent'] or ():
+                b = self.book_bits.get(abbrev.upper())
+                if b is not None:
+                    mask |= 1 << b
+            s = self.server_bits.get((version['server'] or '').lower())
+            self.version_books.append(mask)
+            self.version_available.append(mask & self.server_books[s] if s is not None else 0)
+            self.version_server.append(s)
+
+        # The transposed matrices: book -> versions that contain it / that are available with it
+        self.book_versions = [0] * len(books)
+        self.book_available = [0] * len(books)
+        self.book_servers = [0] * len(books)
+        for v in range(len(self.version_names)):
+            for b in _bits(self.version_books[v]):
+                self.book_versions[b] |= 1 << v
+            for b in _bits(self.version_available[v]):
+                self.book_available[b] |= 1 << v
+                self.book_servers[b] |= 1 << self.version_server[v]
+
+
+def _build_coverage(catalog):
+    return _CoverageMatrix(catalog)
+
+
+class Coverage:
+    """
+    Answers "which books does a version contain" and "in which versions / on which servers can a book be read"
+    from bitsets that are built once per process, so a query is a few integer operations instead of scans over
+    versions.xml and servers.xml
+
+    A version contains the books of its content (FB, OT, NT) and its extracontent. With available=True, only the
+    books that the hosting server of the version provides count, and nothing of an inactive server. The servers of
+    a book are the active servers that provide it for at least one version that contains it
+    """
+
+    def __init__(self):
+        get_catalog().bind(self, {'_matrix': ('coverage', _build_coverage)})
+        self._biblebooks = Books()
+        self._references = References()
+
+    # Each public method reads self._matrix once and passes it on, so it works on one version of the XML files,
+    # also if Catalog.reload() replaces the matrix meanwhile
+
+    @staticmethod
+    def _version_mask(matrix, version, available):
+        v = matrix.version_bits.get(version.lower())
+        if v is None:
+            return None
+        return (matrix.version_available if available else matrix.version_books)[v]
+
+    @staticmethod
+    def _versions(matrix, mask):
+        names = matrix.version_names
+        return [names[v] for v in _bits(mask)]
+
+    @staticmethod
+    def _servers(matrix, mask):
+        names = matrix.server_names
+        return [names[s] for s in _bits(mask)]
+
+    @staticmethod
+    def _books_mask(matrix, abbrevs):
+        mask = 0
+        for abbrev in abbrevs:
+            b = matrix.book_bits.get(abbrev.upper())
+            if b is None:
+                return None
+            mask |= 1 << b
+        return mask
+
+    def get_books_mask(self, abbrevs):
+        """Returns the bitset of a list of books; None if one of them is unknown"""
+        return self._books_mask(self._matrix, abbrevs)
+
+    def _reference_mask(self, matrix, reference):
+        if isinstance(reference, str):
+            reference = self._references.parse_reference(reference)
+        span = self._references.get_ordinal_range(reference)
+        if span is None:
+            return None
+
+        bits = matrix.book_bits
+        first = bits[self._biblebooks.get_verse_from_ordinal(span[0])[0].upper()]
+        last = bits[self._biblebooks.get_verse_from_ordinal(span[1])[0].upper()]
+        return (1 << last + 1) - (1 << first)
+
+    def get_reference_mask(self, reference):
+        """
+        Returns the bitset of the books a reference covers (gen-ex: all books from GEN to EX); None if it is invalid
+        The reference can be a string or a result of References.parse_reference()
+        """
+        return self._reference_mask(self._matrix, reference)
+
+    def get_version_books(self, version, available=False):
+        """Returns the abbreviations of the books of a version, in canonical order; None for an unknown version"""
+        matrix = self._matrix
+        mask = self._version_mask(matrix, version, available)
+        if mask is None:
+            return None
+        abbrevs = matrix.abbrevs
+        return [abbrevs[b] for b in _bits(mask)]
+
+    def has_book(self, version, abbrev, available=False):
+        matrix = self._matrix
+        mask = self._version_mask(matrix, version, available)
+        b = matrix.book_bits.get(abbrev.upper())
+        return mask is not None and b is not None and bool(mask >> b & 1)
+
+    def get_book_versions(self, abbrev, available=False):
+        """Returns the names of the versions that contain a book, in the order of versions.xml"""
+        matrix = self._matrix
+        b = matrix.book_bits.get(abbrev.upper())
+        if b is None:
+            return []
+        return self._versions(matrix, (matrix.book_available if available else matrix.book_versions)[b])
+
+    def get_book_servers(self, abbrev):
+        """Returns the names of the active servers on which a book can be read, in the order of servers.xml"""
+        matrix = self._matrix
+        b = matrix.book_bits.get(abbrev.upper())
+        if b is None:
+            return []
+        return self._servers(matrix, matrix.book_servers[b])
+
+    @staticmethod
+    def _intersect(matrix, mask, available):
+        # Versions (bitset) and servers (bitset) that have all books of the bitset
+        per_book = matrix.book_available if available else matrix.book_versions
+        versions = -1
+        servers = -1
+        for b in _bits(mask):
+            versions &= per_book[b]
+            servers &= matrix.book_servers[b]
+        if versions == -1:
+            return 0, 0
+        return versions, servers
+
+    def _references_mask(self, matrix, references):
+        # The books of all references; 0 if one of them is invalid
+        mask = 0
+        for reference in references:
+            reference_mask = self._reference_mask(matrix, reference)
+            if reference_mask is None:
+                return 0
+            mask |= reference_mask
+        return mask
+
+    def get_versions_for_books(self, abbrevs, available=False):
+        """Returns the names of the versions that contain all of the books"""
+        matrix = self._matrix
+        mask = self._books_mask(matrix, abbrevs)
+        return self._versions(matrix, self._intersect(matrix, mask, available)[0]) if mask else []
+
+    def get_versions_for_references(self, references, available=False):
+        """
+        Returns the names of the versions that contain all books of all references (book spans included)
+        An invalid reference cannot be read anywhere, so the result is empty
+        """
+        matrix = self._matrix
+        mask = self._references_mask(matrix, references)
+        return self._versions(matrix, self._intersect(matrix, mask, available)[0]) if mask else []
+
+    def get_servers_for_references(self, references):
+        """
+        Returns the names of the active servers that provide all books of all references; each book for at
+        least one version that contains it
+        """
+        matrix = self._matrix
+        mask = self._references_mask(matrix, references)
+        return self._servers(matrix, self._intersect(matrix, mask, True)[1]) if mask else []
@@ -0,0 +1,58 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+from .mblbooks import Books
+from .mblcatalog import Catalog
+from .mblreferences import References
+
+_Reference = Union[str, Mapping[str, Any]]
+
+def _bits(mask: int) -> List[int]: ...
+
+
+class _CoverageMatrix:
+    abbrevs: Tuple[str, ...]
+    book_bits: Dict[str, int]
+    server_names: Tuple[str, ...]
+    server_bits: Dict[str, int]
+    server_books: List[int]
+    version_names: Tuple[str, ...]
+    version_bits: Dict[str, int]
+    version_books: List[int]
+    version_available: List[int]
+    version_server: List[Optional[int]]
+    book_versions: List[int]
+    book_available: List[int]
+    book_servers: List[int]
+
+    def __init__(self, catalog: Catalog) -> None: ...
+
+
+def _build_coverage(catalog: Catalog) -> _CoverageMatrix: ...
+
+
+class Coverage:
+    _matrix: _CoverageMatrix
+    _biblebooks: Books
+    _references: References
+
+    def __init__(self) -> None: ...
+    @staticmethod
+    def _version_mask(matrix: _CoverageMatrix, version: str, available: bool) -> Optional[int]: ...
+    @staticmethod
+    def _versions(matrix: _CoverageMatrix, mask: int) -> List[str]: ...
+    @staticmethod
+    def _servers(matrix: _CoverageMatrix, mask: int) -> List[str]: ...
+    @staticmethod
+    def _books_mask(matrix: _CoverageMatrix, abbrevs: Iterable[str]) -> Optional[int]: ...
+    def get_books_mask(self, abbrevs: Iterable[str]) -> Optional[int]: ...
+    def _reference_mask(self, matrix: _CoverageMatrix, reference: _Reference) -> Optional[int]: ...
+    def get_reference_mask(self, reference: _Reference) -> Optional[int]: ...
+    def get_version_books(self, version: str, available: bool = ...) -> Optional[List[str]]: ...
+    def has_book(self, version: str, abbrev: str, available: bool = ...) -> bool: ...
+    def get_book_versions(self, abbrev: str, available: bool = ...) -> List[str]: ...
+    def get_book_servers(self, abbrev: str) -> List[str]: ...
+    @staticmethod
+    def _intersect(matrix: _CoverageMatrix, mask: int, available: bool) -> Tuple[int, int]: ...
+    def _references_mask(self, matrix: _CoverageMatrix, references: Iterable[_Reference]) -> int: ...
+    def get_versions_for_books(self, abbrevs: Iterable[str], available: bool = ...) -> List[str]: ...
+    def get_versions_for_references(self, references: Iterable[_Reference], available: bool = ...) -> List[str]: ...
+    def get_servers_for_references(self, references: Iterable[_Reference]) -> List[str]: ...
@@ -0,0 +1,245 @@
+# Finding Bible references in free text
+import io
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from msbiblelib.mblaliases import _build_alias_table, _name_key
+from msbiblelib.mblcatalog import get_catalog
+from msbiblelib.mblreferences import References
+
+
+# Chapter and verse numbers have at most three digits; like this, a match has a bounded length,
+# which the handling of chunk boundaries relies on
+_NUMBER = r'\d{1,3}'
+
+# Between the digit and the name of numbered books ("1. Mose", "1 Joh") and between a book and its chapter ("Gen 1",
+# "Gen. 1", "Gen1"). Like all parts of the pattern, this matches a bounded number of characters
+_GAP = r'\.?[ \t]?'
+
+_DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def _build_aliases(catalog, server_names):
+    # Name key -> internal abbreviation; the same names as AliasIndex, without prefixes
+    if server_names:
+        return catalog.get_derived('aliases', _build_alias_table).names
+    return {_name_key(book['abbrev']): book['abbrev'].upper() for book in catalog.books}
+
+
+def _trie_pattern(words):
+    """
+    Builds one regular expression that matches any of the words, with common prefixes factored out
+    ("gen", "genesis" -> "gen(?:esis)?"), so the regex engine walks the words like a trie instead of trying
+    them one after the other. Longer words are preferred. After a leading digit, _GAP is allowed
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node, previous):
+        alternatives = []
+        optional = '' in node
+        for ch in sorted(ch for ch in node if ch):
+            prefix = _GAP if previous.isdigit() and not ch.isdigit() else ''
+            alternatives.append(prefix + re.escape(ch) + build(node[ch], ch))
+        if not alternatives:
+            return ''
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        group = '(?:' + '|'.join(alternatives) + ')'
+        return group + '?' if optional else group
+
+    return build(trie, '')
+
+
+def _build_pattern(aliases, require_chapter):
+    book = _trie_pattern(aliases)
+    numbers = (
+        rf'{_GAP}(?P<chapter>{_NUMBER})(?:[.:,](?P<verse>{_NUMBER}))?'
+        rf'(?:[ \t]?[-–][ \t]?(?P<to>{_NUMBER})(?:[.:,](?P<toverse>{_NUMBER}))?)?'
+    )
+    if require_chapter:
+        rest = numbers
+    else:
+        # Also whole books ("Gen") and book spans ("Gen-Ex"); these must not be followed by a letter
+        rest = rf'(?:{numbers}|[ \t]?[-–][ \t]?(?P<tobook>{book})(?!\w)|(?!\w))'
+    pattern = rf'(?<!\w)(?P<book>{book}){rest}(?!\d)'
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _longest_match(aliases):
+    # Upper bound for the length of a match: two book names (book span) or one book name and the numbers,
+    # with all separators and gaps
+    longest_name = max(len(name) for name in aliases)
+    return 2 * (2 * longest_name + 8) + 4 * 3 + 16
+
+
+def _build_tables(catalog, server_names, require_chapter):
+    # (aliases, pattern, longest match) for one combination of the options
+    names = 'servers' if server_names else 'books'
+    aliases = catalog.get_derived(f'extract.aliases.{names}', lambda c: _build_aliases(c, server_names))
+    return aliases, _build_pattern(aliases, require_chapter), _longest_match(aliases)
+
+
+class ReferenceExtractor:
+    """
+    Finds Bible references in free text ("Joh 3,16", "1. Mose 1:1-3", "Röm 8,28-9,3") and validates them
+    with References.parse_reference()
+
+    All book abbreviations of books.xml (and, with server_names, the book names of servers.xml, e.g. "1. Mose",
+    "Genesis") are compiled into one pattern. Matches are normalized ("Röm 8,28" -> "röm8.28") before they
+    are parsed. By default, only references with a chapter are found, because many abbreviations are also
+    common words ("Am", "Hi", "Jo"); with require_chapter=False, whole books and book spans are found too.
+    """
+
+    def __init__(self, server_names=False, require_chapter=True, valid_only=True, cache=None):
+        self._options = {
+            'server_names': server_names,
+            'require_chapter': require_chapter,
+            'valid_only': valid_only,
+        }
+        self._valid_only = valid_only
+        self._references = References(cache=cache)
+
+        # (aliases, pattern, longest match): built once per process for each combination of the options, and
+        # again after Catalog.reload(). One attribute, so an extraction uses the same tables from start to end
+        names = 'servers' if server_names else 'books'
+        get_catalog().bind(self, {'_tables': (f'extract.tables.{names}.{require_chapter}',
+                                              lambda c: _build_tables(c, server_names, require_chapter))})
+
+    def get_pattern(self):
+        return self._tables[1]
+
+    def _resolve(self, match, aliases):
+        # The match as a normalized reference
+        groups = match.groupdict()
+        reference = aliases[_name_key(groups['book'])].lower()
+        if groups['chapter'] is not None:
+            reference += groups['chapter']
+            if groups['verse'] is not None:
+                reference += '.' + groups['verse']
+            if groups['to'] is not None:
+                reference += '-' + groups['to']
+                if groups['toverse'] is not None:
+                    reference += '.' + groups['toverse']
+        elif groups.get('tobook') is not None:
+            reference += '-' + aliases[_name_key(groups['tobook'])].lower()
+        return reference
+
+    def _result(self, match, offset, aliases):
+        parsed_info = self._references.parse_reference(self._resolve(match, aliases))
+        if self._valid_only and not parsed_info['passed']:
+            return None
+        return {
+            'start': offset + match.start(),
+            'end': offset + match.end(),
+            'text': match.group(),
+            'parsed': parsed_info,
+        }
+
+    def extract_text(self, text):
+        """Returns the references in a string, see extract()"""
+        return list(self.extract(text))
+
+    def extract(self, stream, chunk_size=_DEFAULT_CHUNK_SIZE):
+        """
+        Yields the references in a text, in order of their position
+        stream: a string, a text file object or an iterable of strings (e.g. lines)
+        Each result is a dictionary: 'start', 'end' (character positions in the whole text), 'text' (as found)
+        and 'parsed' (the result of parse_reference()). Without valid_only, invalid references are included
+        The text is read in chunks of chunk_size characters, so the memory does not grow with its size
+        """
+        aliases, pattern, overlap = self._tables
+        if isinstance(stream, str):
+            stream = io.StringIO(stream)
+        if hasattr(stream, 'read'):
+            chunks = iter(lambda: stream.read(chunk_size), '')
+        else:
+            chunks = iter(stream)
+
+        # After the first cut, buffer[0] is the character before the part that is still to be scanned,
+        # so the pattern can check that a match does not start within a word
+        buffer = ''
+        offset = 0
+        scan_from = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buffer += chunk
+            if len(buffer) < chunk_size + overlap:
+                continue
+
+            # A match starting before cut is complete: it is shorter than the overlap, so it ends before the end
+            # of the buffer and the characters after it are known. Matches from cut on are looked for again
+            # with the next chunk
+            cut = len(buffer) - overlap
+            for match in pattern.finditer(buffer, scan_from):
+                if match.start() >= cut:
+                    break
+                result = self._result(match, offset, aliases)
+                scan_from = match.end()
+                if result is not None:
+                    yield result
+
+            # Everything before cut has been scanned; keep one character before cut for the next scan
+            scan_from = max(scan_from, cut) - (cut - 1)
+            buffer = buffer[cut - 1:]
+            offset += cut - 1
+
+        # The end of the text
+        for match in pattern.finditer(buffer, scan_from):
+            result = self._result(match, offset, aliases)
+            if result is not None:
+                yield result
+
+    def extract_file(self, path, encoding='utf-8', chunk_size=_DEFAULT_CHUNK_SIZE):
+        """Returns the references in a text file, see extract()"""
+        with open(path, encoding=encoding, errors='replace') as f:
+            return list(self.extract(f, chunk_size))
+
+    def extract_files(self, paths, processes=None, encoding='utf-8'):
+        """
+        Yields (path, list of references) for many text files, in the order of the paths
+        processes: number of worker processes; 1 works in this process, None uses all cores
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if processes <= 1:
+            for path in paths:
+                yield path, self.extract_file(path, encoding)
+            return
+
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self._options,)) as executor:
+            # Only a few files are in the pool at any time, so the memory does not grow with the number of files
+            pending = deque()
+            for path in paths:
+                pending.append((path, executor.submit(_extract_file, path, encoding)))
+                if len(pending) >= 2 * processes:
+                    path, future = pending.popleft()
+                    yield path, future.result()
+            while pending:
+                path, future = pending.popleft()
+                yield path, future.result()
+
+
+# Each worker process of extract_files() uses its own ReferenceExtractor
+_worker_extractor = None
+
+
+def _init_worker(options):
+    global _worker_extractor
+    _worker_extractor = ReferenceExtractor(**options)
+
+
+def _extract_file(path, encoding):
+    results = _worker_extractor.extract_file(path, encoding)
+    # MappingProxyType (results from a cache) cannot be pickled
+    for result in results:
+        result['parsed'] = dict(result['parsed'])
+    return results
@@ -0,0 +1,41 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, TextIO, Tuple, Union
+
+from .mblcache import LRUCache
+from .mblcatalog import Catalog
+from .mblreferences import References
+
+_NUMBER: str
+_GAP: str
+_DEFAULT_CHUNK_SIZE: int
+
+def _build_aliases(catalog: Catalog, server_names: bool) -> Dict[str, str]: ...
+def _trie_pattern(words: Iterable[str]) -> str: ...
+def _build_pattern(aliases: Dict[str, str], require_chapter: bool) -> re.Pattern: ...
+def _longest_match(aliases: Dict[str, str]) -> int: ...
+def _build_tables(catalog: Catalog, server_names: bool,
+                  require_chapter: bool) -> Tuple[Dict[str, str], re.Pattern, int]: ...
+
+
+class ReferenceExtractor:
+    _options: Dict[str, bool]
+    _valid_only: bool
+    _references: References
+    _tables: Tuple[Dict[str, str], re.Pattern, int]
+
+    def __init__(self, server_names: bool = ..., require_chapter: bool = ..., valid_only: bool = ...,
+                 cache: Optional[LRUCache] = ...) -> None: ...
+    def get_pattern(self) -> re.Pattern: ...
+    def _resolve(self, match: re.Match, aliases: Dict[str, str]) -> str: ...
+    def _result(self, match: re.Match, offset: int, aliases: Dict[str, str]) -> Optional[Dict[str, Any]]: ...
+    def extract_text(self, text: str) -> List[Dict[str, Any]]: ...
+    def extract(self, stream: Union[str, TextIO, Iterable[str]], chunk_size: int = ...) -> Iterator[Dict[str, Any]]: ...
+    def extract_file(self, path: str, encoding: str = ..., chunk_size: int = ...) -> List[Dict[str, Any]]: ...
+    def extract_files(self, paths: Iterable[str], processes: Optional[int] = ...,
+                      encoding: str = ...) -> Iterator[Tuple[str, List[Dict[str, Any]]]]: ...
+
+
+_worker_extractor: Optional[ReferenceExtractor]
+
+def _init_worker(options: Dict[str, bool]) -> None: ...
+def _extract_file(path: str, encoding: str) -> List[Dict[str, Any]]: ...
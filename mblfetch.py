@@ -0,0 +1,297 @@
+# Fetching chapters from the Bible servers
+import asyncio
+import math
+import ssl
+import time
+from urllib.parse import quote, urlsplit
+
+from msbiblelib.mblservers import Bibleservers
+from msbiblelib.mblurls import ChapterUrls
+from msbiblelib.mblversions import Versions
+
+
+class FetchError(Exception):
+    pass
+
+
+def percentile(values, p):
+    """p-th percentile (0..100) of a list of numbers, by the nearest rank; None for an empty list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[k]
+
+
+class _HostPool:
+    """
+    Keep-alive connections to one host, and a limit for the number of requests running at the same time
+    The timeout (seconds, None for none) counts from the start of a request; the wait for a free slot is not
+    included, so a long queue does not time out requests that the host answers in time
+    """
+
+    def __init__(self, scheme, host, port, limit, timeout=None):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if scheme == 'https' else None
+        self._timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self._idle = []
+
+    async def _connect(self):
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def get(self, target):
+        """
+        Sends a GET request for target (path and query)
+        Returns (status, body); raises asyncio.TimeoutError if the host does not answer in time
+        """
+        async with self._semaphore:
+            return await asyncio.wait_for(self._get(target), self._timeout)
+
+    async def _get(self, target):
+        # An idle connection might have been closed by the server in the meantime; then we try once more
+        # with a new one
+        while self._idle:
+            reader, writer = self._idle.pop()
+            try:
+                return await self._request(reader, writer, target)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+            except BaseException:
+                writer.close()
+                raise
+
+        reader, writer = await self._connect()
+        try:
+            return await self._request(reader, writer, target)
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _request(self, reader, writer, target):
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n'
+                     f'Accept-Encoding: identity\r\nUser-Agent: msbiblelib\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by the server')
+        parts = status_line.decode('latin-1').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise FetchError(f'Invalid status line {status_line!r}')
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close' and not parts[0].startswith('HTTP/1.0')
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, body
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class ChapterFetcher:
+    """
+    Downloads chapters with asyncio
+    A job is (version, abbreviation, chapter). The version is resolved to its hosting server with Versions and
+    Bibleservers. If the server fails or times out, the versions listed in <alternatives> (versions.xml) are
+    tried, ordered by the weight of their servers. Inactive servers are skipped.
+    Connections are kept open and reused per host; per_server_limit requests per host run at the same time.
+    With a ChapterCache, cached chapters are not downloaded again and downloaded ones are stored.
+    """
+
+    def __init__(self, per_server_limit=4, timeout=10.0, base_urls=None, cache=None):
+        self._versions = Versions()
+        self._servers = Bibleservers()
+        self._urls = ChapterUrls()
+        self._per_server_limit = per_server_limit
+        self._timeout = timeout
+
+        # Server name -> URL that replaces the server's <url>, e.g. a local stand-in server for tests
+        self._base_urls = {name.lower(): url for name, url in (base_urls or {}).items()}
+
+        # Optional ChapterCache
+        self._cache = cache
+
+        # (scheme, host, port) -> _HostPool; created in the running event loop
+        self._pools = {}
+
+        # Statistics of the last fetch()
+        self._stats = {}
+
+    def get_candidates(self, version):
+        """
+        Returns (version, server record) for the version and its alternatives on active servers,
+        ordered by server weight; the version itself comes first among servers of the same weight
+        """
+        names = [version]
+        record = self._versions.get_version_record(version)
+        if record is not None and record.get('alternatives'):
+            names += record['alternatives']
+
+        candidates = []
+        for name in names:
+            server = self._servers.get_server_by_name(self._versions.get_version_server(name) or '')
+            if server is not None and server['status'] != 'inactive':
+                candidates.append((name, server))
+
+        # sort() is stable, so the order of versions.xml decides between equal weights
+        candidates.sort(key=lambda candidate: -candidate[1].get('weight', 0))
+        return candidates
+
+    def _get_url(self, version, server, abbrev, chapter):
+        url = self._urls.get_chapter_url(version, abbrev, chapter)
+        if url is None:
+            return None
+        base_url = self._base_urls.get(server['name'].lower())
+        if base_url is not None and url.startswith(server['url']):
+            url = base_url + url[len(server['url']):]
+        return url
+
+    def _get_pool(self, url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = _HostPool(parts.scheme, parts.hostname, port, self._per_server_limit, self._timeout)
+            self._pools[key] = pool
+        # Book names may contain blanks and umlauts ("2 John", "Matthäus")
+        target = quote(parts.path or '/', safe="/%:@!$'()*+,;=~")
+        if parts.query:
+            target += '?' + quote(parts.query, safe="/%:@!$'()*+,;=&?~")
+        return pool, target
+
+    async def fetch_chapter(self, version, abbrev, chapter):
+        """
+        Fetches one chapter
+        Returns a dictionary with the job, the server and URL that were used, the HTTP status, the body (bytes),
+        the errors of all attempts and the latency in seconds. 'body' is None if all servers failed
+        """
+        result = {
+            'version': version,
+            'book': abbrev,
+            'chapter': chapter,
+            'server': None,
+            'url': None,
+            'status': None,
+            'body': None,
+            'errors': [],
+            'cached': False,
+            'latency': 0.0,
+        }
+
+        # The cache locks a file and (de)compresses: it runs in a thread, so the other downloads go on meanwhile
+        loop = asyncio.get_running_loop()
+
+        start = time.perf_counter()
+        for candidate, server in self.get_candidates(version):
+            url = self._get_url(candidate, server, abbrev, chapter)
+            if url is None:
+                continue
+
+            result['server'] = server['name']
+            result['url'] = url
+            if self._cache is not None:
+                body = await loop.run_in_executor(None, self._cache.get, server['name'], candidate, abbrev, chapter)
+                if body is not None:
+                    result['body'] = body
+                    result['cached'] = True
+                    break
+
+            pool, target = self._get_pool(url)
+            try:
+                status, body = await pool.get(target)
+            except asyncio.TimeoutError:
+                result['errors'].append(f'{server["name"]}: timeout')
+                continue
+            except (OSError, FetchError, asyncio.IncompleteReadError, ValueError) as e:
+                result['errors'].append(f'{server["name"]}: {e!r}')
+                continue
+
+            result['status'] = status
+            if 200 <= status < 300:
+                result['body'] = body
+                if self._cache is not None:
+                    await loop.run_in_executor(None, self._cache.put, server['name'], candidate, abbrev, chapter,
+                                               body)
+                break
+            result['errors'].append(f'{server["name"]}: HTTP {status}')
+
+        if not result['errors'] and result['url'] is None:
+            result['errors'].append('No server provides this chapter')
+
+        result['latency'] = time.perf_counter() - start
+        return result
+
+    async def fetch(self, jobs):
+        """
+        Fetches many chapters; jobs is a list of (version, abbreviation, chapter)
+        Returns the results of fetch_chapter() in the order of the jobs
+        """
+        start = time.perf_counter()
+        try:
+            results = await asyncio.gather(*(self.fetch_chapter(*job) for job in jobs))
+        finally:
+            self.close()
+        elapsed = time.perf_counter() - start
+
+        latencies = [r['latency'] for r in results]
+        self._stats = {
+            'jobs': len(results),
+            'succeeded': sum(1 for r in results if r['body'] is not None),
+            'failed': sum(1 for r in results if r['body'] is None),
+            'failovers': sum(1 for r in results if r['body'] is not None and r['errors']),
+            'cached': sum(1 for r in results if r['cached']),
+            'seconds': elapsed,
+            'throughput': len(results) / elapsed if elapsed > 0 else 0.0,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99),
+            'latency_max': max(latencies) if latencies else None,
+        }
+        return results
+
+    def fetch_all(self, jobs):
+        """Synchronous version of fetch()"""
+        return asyncio.run(self.fetch(jobs))
+
+    def get_stats(self):
+        """Throughput (chapters per second) and latency percentiles (seconds) of the last fetch()"""
+        return dict(self._stats)
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
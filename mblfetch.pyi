@@ -0,0 +1,53 @@
+import asyncio
+import ssl
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from .mblchaptercache import ChapterCache
+from .mblservers import Bibleservers
+from .mblurls import ChapterUrls
+from .mblversions import Versions
+
+
+class FetchError(Exception): ...
+
+
+def percentile(values: Sequence[float], p: float) -> Optional[float]: ...
+
+
+class _HostPool:
+    host: str
+    port: int
+    ssl: Optional[ssl.SSLContext]
+    _timeout: Optional[float]
+    _semaphore: asyncio.Semaphore
+    _idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]
+
+    def __init__(self, scheme: str, host: str, port: int, limit: int, timeout: Optional[float] = ...) -> None: ...
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]: ...
+    async def get(self, target: str) -> Tuple[int, bytes]: ...
+    async def _get(self, target: str) -> Tuple[int, bytes]: ...
+    async def _request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                       target: str) -> Tuple[int, bytes]: ...
+    def close(self) -> None: ...
+
+
+class ChapterFetcher:
+    _versions: Versions
+    _servers: Bibleservers
+    _urls: ChapterUrls
+    _per_server_limit: int
+    _timeout: float
+    _base_urls: Dict[str, str]
+    _cache: Optional[ChapterCache]
+    _pools: Dict[Tuple[str, str, int], _HostPool]
+    _stats: Dict[str, Any]
+
+    def __init__(self, per_server_limit: int = ..., timeout: float = ...,
+                 base_urls: Optional[Dict[str, str]] = ..., cache: Optional[ChapterCache] = ...) -> None: ...
+    def get_candidates(self, version: str) -> List[Tuple[str, Dict[str, Any]]]: ...
+    def _get_url(self, version: str, server: Dict[str, Any], abbrev: str, chapter: int) -> Optional[str]: ...
+    def _get_pool(self, url: str) -> Tuple[_HostPool, str]: ...
+    async def fetch_chapter(self, version: str, abbrev: str, chapter: int) -> Dict[str, Any]: ...
+    async def fetch(self, jobs: Iterable[Tuple[str, str, int]]) -> List[Dict[str, Any]]: ...
+    def fetch_all(self, jobs: Iterable[Tuple[str, str, int]]) -> List[Dict[str, Any]]: ...
+    def get_stats(self) -> Dict[str, Any]: ...
+    def close(self) -> None: ...
@@ -0,0 +1,171 @@
+# Interval index over the verse spans of references
+from array import array
+
+from msbiblelib.mblreferences import References
+
+
+def merge_spans(spans):
+    """
+    Merges overlapping and adjacent (first, last) verse ordinal spans
+    Returns a sorted list of disjoint spans
+    """
+    merged = []
+    for first, last in sorted(spans):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+class ReferenceIndex:
+    """
+    Stores references as spans of verse ordinals (see Books.get_verse_ordinal()) and answers
+    "which references contain / overlap / lie within this reference" in O(log n + number of results)
+    Book spans (gen-ex) and chapter spans (gen1-3) are expanded with the verse counts from books.xml
+
+    The spans are kept sorted by their first verse. On top of this sorted array, an implicit balanced
+    binary tree stores for every subtree the highest last verse, so subtrees that end before the query
+    can be skipped. The tree is rebuilt on the first query after references were added.
+    """
+
+    def __init__(self, references=None, parser=None):
+        # Used to parse the references and to convert between references and spans
+        self._parser = parser if parser is not None else References()
+
+        # Spans and the items that were stored for them, in the order they were added
+        self._spans = []
+        self._items = []
+
+        # Sorted arrays and the tree; None if they need to be rebuilt
+        self._starts = None
+        self._ends = None
+        self._max_ends = None
+        self._order = None
+
+        if references is not None:
+            for reference in references:
+                self.add(reference)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def _get_span(self, reference):
+        # A reference can be given as a string or as the result of parse_reference()
+        if isinstance(reference, str):
+            reference = self._parser.parse_reference(reference)
+        return self._parser.get_ordinal_range(reference)
+
+    def add(self, reference, item=None):
+        """
+        Stores a reference; item is returned by the queries (default: the reference itself)
+        Returns False if the reference is invalid and was not stored
+        """
+        span = self._get_span(reference)
+        if span is None:
+            return False
+
+        self._spans.append(span)
+        self._items.append(item if item is not None else reference)
+        self._starts = None
+        return True
+
+    def add_span(self, first, last, item):
+        """Stores an item for a span of verse ordinals"""
+        self._spans.append((first, last))
+        self._items.append(item)
+        self._starts = None
+
+    def _build(self):
+        order = sorted(range(len(self._spans)), key=lambda i: self._spans[i])
+        starts = array('L', (self._spans[i][0] for i in order))
+        ends = array('L', (self._spans[i][1] for i in order))
+        max_ends = array('L', [0]) * len(order)
+
+        # The root of a range [lo, hi) is its middle; it stores the highest end of the whole range
+        def build(lo, hi):
+            if lo >= hi:
+                return 0
+            mid = (lo + hi) // 2
+            max_end = max(ends[mid], build(lo, mid), build(mid + 1, hi))
+            max_ends[mid] = max_end
+            return max_end
+
+        build(0, len(order))
+
+        # _starts is set last: as soon as it is not None, the other arrays are complete
+        self._order = array('L', order)
+        self._ends = ends
+        self._max_ends = max_ends
+        self._starts = starts
+
+    def _search(self, first, last):
+        # Positions (in the sorted arrays) of all spans that overlap first..last
+        if self._starts is None:
+            self._build()
+
+        starts, ends, max_ends = self._starts, self._ends, self._max_ends
+        found = []
+        stack = [(0, len(starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            # Nothing in this subtree reaches the query
+            if max_ends[mid] < first:
+                continue
+            # Spans right of mid start even later; only look at them if mid starts within the query
+            if starts[mid] <= last:
+                if ends[mid] >= first:
+                    found.append(mid)
+                stack.append((mid + 1, hi))
+            stack.append((lo, mid))
+
+        found.sort()
+        return found
+
+    def _query(self, reference, condition):
+        span = self._get_span(reference)
+        if span is None:
+            return []
+
+        first, last = span
+        found = self._search(first, last)
+        starts, ends, order = self._starts, self._ends, self._order
+        return [self._items[order[i]] for i in found if condition(starts[i], ends[i], first, last)]
+
+    def find_overlapping(self, reference):
+        """Returns the items of all stored references that share at least one verse with the reference"""
+        return self._query(reference, lambda s, e, first, last: True)
+
+    def find_containing(self, reference):
+        """Returns the items of all stored references that contain the whole reference"""
+        return self._query(reference, lambda s, e, first, last: s <= first and e >= last)
+
+    def find_contained(self, reference):
+        """Returns the items of all stored references that lie completely within the reference"""
+        return self._query(reference, lambda s, e, first, last: s >= first and e <= last)
+
+    def get_spans(self):
+        return list(self._spans)
+
+    def get_merged_spans(self):
+        """Returns the verses covered by the stored references as sorted, disjoint spans"""
+        return merge_spans(self._spans)
+
+    def get_merged_references(self):
+        """Returns the verses covered by the stored references as a sorted list of the shortest references"""
+        references = []
+        for first, last in self.get_merged_spans():
+            references += self._parser.get_references_for_ordinal_range(first, last)
+        return references
+
+    def union(self, other):
+        """Returns a new index with the references of both indexes"""
+        index = ReferenceIndex(parser=self._parser)
+        for source in (self, other):
+            for span, item in zip(source._spans, source._items):
+                index.add_span(span[0], span[1], item)
+        return index
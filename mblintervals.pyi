@@ -0,0 +1,33 @@
+from array import array
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple, Union
+from .mblreferences import References
+
+_Reference = Union[str, Mapping[str, Any]]
+
+def merge_spans(spans: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]: ...
+
+
+class ReferenceIndex:
+    _parser: References
+    _spans: List[Tuple[int, int]]
+    _items: List[Any]
+    _starts: Optional[array]
+    _ends: Optional[array]
+    _max_ends: Optional[array]
+    _order: Optional[array]
+
+    def __init__(self, references: Optional[Iterable[_Reference]] = ..., parser: Optional[References] = ...) -> None: ...
+    def __len__(self) -> int: ...
+    def _get_span(self, reference: _Reference) -> Optional[Tuple[int, int]]: ...
+    def add(self, reference: _Reference, item: Any = ...) -> bool: ...
+    def add_span(self, first: int, last: int, item: Any) -> None: ...
+    def _build(self) -> None: ...
+    def _search(self, first: int, last: int) -> List[int]: ...
+    def _query(self, reference: _Reference, condition: Callable[[int, int, int, int], bool]) -> List[Any]: ...
+    def find_overlapping(self, reference: _Reference) -> List[Any]: ...
+    def find_containing(self, reference: _Reference) -> List[Any]: ...
+    def find_contained(self, reference: _Reference) -> List[Any]: ...
+    def get_spans(self) -> List[Tuple[int, int]]: ...
+    def get_merged_spans(self) -> List[Tuple[int, int]]: ...
+    def get_merged_references(self) -> List[str]: ...
+    def union(self, other: ReferenceIndex) -> ReferenceIndex: ...
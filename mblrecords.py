@@ -0,0 +1,154 @@
+# Read-only record types for the catalog (books, versions, servers)
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+def _freeze(value):
+    # Strings are interned, so equal values (languages, server names, ...) are stored only once;
+    # lists become tuples
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    # The opposite of _freeze, for to_dict(): lists and dictionaries
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, memoryview):
+        return value.tolist()
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class Record(Mapping):
+    """
+    Base class of the catalog records: fixed fields in __slots__, no changes after creation
+    For compatibility with the former dictionaries, the fields can also be read with record['field'],
+    record.get('field'), keys(), items() and so on. A record compares equal to a dictionary with the same content
+    Records are hashable, so they can be used as dictionary keys and in sets
+    Records are not dictionaries: json.dumps() needs record.to_dict(), and copy() returns a dictionary
+    """
+
+    __slots__ = ()
+
+    # Names of the fields, in order, and as a set; set by the subclasses
+    _fields = ()
+    _field_set = frozenset()
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            # Arrays are shared by the whole process; they are stored as read-only views
+            if isinstance(value, array):
+                value = memoryview(value).toreadonly()
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(*(_freeze(d.get(name)) for name in cls._fields))
+
+    def to_dict(self):
+        """Returns the content as a new, mutable dictionary of lists and dictionaries, e.g. for JSON"""
+        return {name: _thaw(getattr(self, name)) for name in self._fields}
+
+    def copy(self):
+        # As dict.copy() of the former dictionaries
+        return self.to_dict()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} records cannot be changed')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} records cannot be changed')
+
+    def __getitem__(self, key):
+        if key not in self._field_set:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, key):
+        return key in self._field_set
+
+    def __hash__(self):
+        # Views of arrays are not hashable; their content is
+        return hash(tuple(value.tobytes() if isinstance(value, memoryview) else value
+                          for value in (getattr(self, name) for name in self._fields)))
+
+    def __reduce__(self):
+        # __setattr__ is blocked, so pickle must use the constructor; views cannot be pickled, arrays can
+        return type(self), tuple(array(value.format, value) if isinstance(value, memoryview) else value
+                                 for value in (getattr(self, name) for name in self._fields))
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self._fields)
+        return f'{type(self).__name__}({fields})'
+
+
+class BookRecord(Record):
+    """
+    A book of books.xml
+    chapters: read-only memoryview of an array('H'), chapters[ch] is the number of verses of chapter ch;
+              chapters[0] is not used (0)
+    headings: read-only memoryview of an array('B') of the same length, the number of verses of the heading
+              of a psalm (0: none)
+    """
+
+    __slots__ = ('abbrev', 'maxchapter', 'testament', 'latex_abbrev', 'chapters', 'headings')
+    _fields = __slots__
+    _field_set = frozenset(__slots__)
+
+    @classmethod
+    def from_dict(cls, d):
+        last = max(d['chapters'], default=0)
+        chapters = array('H', (d['chapters'].get(ch, 0) for ch in range(last + 1)))
+        headings = array('B', (d.get('headings', {}).get(ch, 0) for ch in range(last + 1)))
+        return cls(_freeze(d['abbrev']), d['maxchapter'], _freeze(d['testament']), _freeze(d['latex_abbrev']),
+                   chapters, headings)
+
+
+class VersionRecord(Record):
+    """A version of versions.xml; extracontent and alternatives are tuples or None"""
+
+    __slots__ = ('name', 'servername', 'language', 'content', 'server', 'fullname', 'year', 'denomination',
+                 'extracontent', 'comment', 'family', 'alternatives', 'versification')
+    _fields = __slots__
+    _field_set = frozenset(__slots__)
+
+
+class ServerBookRecord(Record):
+    """The names of a book on a server"""
+
+    __slots__ = ('name_de', 'name_en', 'name_extra', 'abbreviation')
+    _fields = __slots__
+    _field_set = frozenset(__slots__)
+
+
+class ServerRecord(Record):
+    """A server of servers.xml; books is a tuple of ServerBookRecord"""
+
+    __slots__ = ('name', 'url', 'chapterurl', 'status', 'weight', 'books')
+    _fields = __slots__
+    _field_set = frozenset(__slots__)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(_freeze(d['name']), _freeze(d['url']), _freeze(d['chapterurl']), _freeze(d['status']),
+                   d['weight'], tuple(ServerBookRecord.from_dict(book) for book in d['books']))
+
+
+# Source name of the catalog -> record type
+RECORD_TYPES = {
+    'books': BookRecord,
+    'versions': VersionRecord,
+    'servers': ServerRecord,
+}
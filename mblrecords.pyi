@@ -0,0 +1,71 @@
+from array import array
+from collections.abc import Mapping
+from typing import Any, ClassVar, Dict, FrozenSet, Iterator, Optional, Tuple, Type, TypeVar
+
+_R = TypeVar('_R', bound=Record)
+
+def _freeze(value: Any) -> Any: ...
+def _thaw(value: Any) -> Any: ...
+
+
+class Record(Mapping):
+    _fields: ClassVar[Tuple[str, ...]]
+    _field_set: ClassVar[FrozenSet[str]]
+
+    def __init__(self, *values: Any) -> None: ...
+    @classmethod
+    def from_dict(cls: Type[_R], d: Dict[str, Any]) -> _R: ...
+    # Not a dict: json.dumps() needs to_dict(); copy() returns a mutable dict, not a record
+    def to_dict(self) -> Dict[str, Any]: ...
+    def copy(self) -> Dict[str, Any]: ...
+    def __getitem__(self, key: str) -> Any: ...
+    def __iter__(self) -> Iterator[str]: ...
+    def __len__(self) -> int: ...
+    def __contains__(self, key: object) -> bool: ...
+    def __hash__(self) -> int: ...
+    def __reduce__(self) -> Tuple[Type[Record], Tuple[Any, ...]]: ...
+
+
+class BookRecord(Record):
+    abbrev: str
+    maxchapter: int
+    testament: str
+    latex_abbrev: str
+    # Read-only views of array('H') and array('B')
+    chapters: memoryview
+    headings: memoryview
+
+
+class VersionRecord(Record):
+    name: str
+    servername: str
+    language: str
+    content: str
+    server: str
+    fullname: str
+    year: str
+    denomination: str
+    extracontent: Optional[Tuple[str, ...]]
+    comment: str
+    family: str
+    alternatives: Optional[Tuple[str, ...]]
+    versification: str
+
+
+class ServerBookRecord(Record):
+    name_de: Optional[str]
+    name_en: Optional[str]
+    name_extra: Optional[str]
+    abbreviation: str
+
+
+class ServerRecord(Record):
+    name: str
+    url: str
+    chapterurl: str
+    status: str
+    weight: int
+    books: Tuple[ServerBookRecord, ...]
+
+
+RECORD_TYPES: Dict[str, Type[Record]]
@@ -1,14 +1,108 @@
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from types import MappingProxyType
 
 from msbiblelib.mblbooks import Books
-
+from msbiblelib.mblcache import LRUCache
+
+
+# Separators that are accepted for chapter and verse; they are normalized to '.'
+_NORMALIZE = str.maketrans({',': '.', ':': '.'})
+
+# One pattern for all types of references, so a reference is classified in a single pass; see
+# _classify_reference(). The regex for the book names must also include 'ö' for "Kön", "Röm"
+_REFERENCE = re.compile(
+    r'^(\d?[a-zöA-ZÖ]+)'               # from-book
+    r'(?:(\d+)(?:\.(\d+))?'            # from-chapter, from-verse
+    r'(?:-(\d+)(?:\.(\d+))?)?'         # to-chapter or to-verse; to-verse
+    r'|-(\d?[a-zA-Z]+))?$'             # or to-book
+)
+
+
+def _classify_reference(reference):
+    """
+    Determines the type of a (normalized) reference and its components
+    Returns (type, dictionary of components) or None if the reference has no valid pattern
+    """
+    match = _REFERENCE.match(reference)
+    if match is None:
+        return None
+
+    frombook, fromchapter, fromverse, to, toverse, tobook = match.groups()
+
+    # gen, gen-ex
+    if fromchapter is None:
+        if tobook is None:
+            return 'FB', {'frombook': frombook}
+        return 'FBTB', {'frombook': frombook, 'tobook': tobook}
+
+    # gen1, gen1-2
+    if fromverse is None:
+        if to is None:
+            return 'FBFC', {'frombook': frombook, 'fromchapter': int(fromchapter)}
+        if toverse is None:
+            return 'FBFCTC', {'frombook': frombook, 'fromchapter': int(fromchapter), 'tochapter': int(to)}
+        # gen1-2.6 is not a valid pattern
+        return None
+
+    # gen1.1, gen1.1-6, gen1.1-2.6
+    if to is None:
+        return 'FBFCFV', {'frombook': frombook, 'fromchapter': int(fromchapter), 'fromverse': int(fromverse)}
+    if toverse is None:
+        return 'FBFCFVTV', {'frombook': frombook, 'fromchapter': int(fromchapter), 'fromverse': int(fromverse),
+                            'toverse': int(to)}
+    return 'FBFCFVTCTV', {'frombook': frombook, 'fromchapter': int(fromchapter), 'fromverse': int(fromverse),
+                          'tochapter': int(to), 'toverse': int(toverse)}
+
+
+# Each worker process of parse_references() uses its own References object, with the options of the caller
+_worker_references = None
+
+
+def _init_worker(aliases, cache_size):
+    global _worker_references
+    _worker_references = References(cache=LRUCache(cache_size) if cache_size else None, aliases=aliases)
+
+
+def _parse_chunk(chunk):
+    global _worker_references
+    if _worker_references is None:
+        _worker_references = References()
+    parse = _worker_references.parse_reference
+    if _worker_references.get_cache() is not None:
+        # Cached results are read-only mappings, which cannot be sent back to the calling process
+        return [dict(parse(reference)) for reference in chunk]
+    return [parse(reference) for reference in chunk]
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class References:
 
-    def __init__(self):
+    # Classifies a normalized reference, see _classify_reference(); another classifier can be set by subclasses,
+    # e.g. for differential tests
+    _classify = staticmethod(_classify_reference)
+
+    def __init__(self, cache=None, aliases=None):
         self._biblebooks = Books()
 
+        # Optional LRUCache for the results of parse_reference(). It can be shared by several References objects
+        # with the same aliases
+        self._cache = cache
+
+        # Optional AliasIndex: book names ("Römer 8,28") are replaced by the abbreviations before the analysis
+        self._aliases = aliases
+
     def parse_reference(self, reference):
         """
         Analyses a given reference
@@ -16,7 +110,28 @@ class References:
         Plausibility checks (book name, chapter and verse numbers, formal checks)
         Corrects references from one-chapter books: inserts chapter "1"
         Returns the reference in normalized form; messages if checks failed
+        With aliases, book names are replaced by the abbreviations first ("Römer 8,28" is röm8.28)
+        With a cache, the result is a read-only mapping, because it is shared by all callers
         """
+        if self._cache is None:
+            return self._parse_reference(reference)
+
+        parsed_info = self._cache.get(reference)
+        if parsed_info is None:
+            parsed_info = MappingProxyType(self._parse_reference(reference))
+            self._cache.put(reference, parsed_info)
+        return parsed_info
+
+    def get_cache(self):
+        return self._cache
+
+    def get_aliases(self):
+        return self._aliases
+
+    def _parse_reference(self, reference):
+        if self._aliases is not None:
+            reference = self._aliases.normalize_reference(reference)
+
         parsed_info = {
             # Result of the analysis: True if a pattern could be identified and all values are within the limits;
             # False otherwise
@@ -24,8 +139,8 @@ class References:
             # One or more error descriptions
             'messages': '',
             # The reference in normalized form
-            'reference': reference.translate(str.maketrans({',': '.', ':': '.'})),
-            # Type of the reference; see patterns[] below
+            'reference': reference.translate(_NORMALIZE),
+            # Type of the reference; see _classify_reference()
             'type': '',
             # Components of the reference
             'frombook': '',
@@ -36,169 +151,280 @@ class References:
             'toverse': 0
         }
 
-        # Patterns of references. From complex to simple, otherwise wrong matches!
-        # The regex for the book names must also include 'ö' for "Kön", "Röm"
-        patterns = [
-            # gen1.1-2.6
-            (r'^(\d?[a-zöA-ZÖ]+)(\d+)\.(\d+)-(\d+)\.(\d+)$', 'FBFCFVTCTV',
-             ['frombook', 'fromchapter', 'fromverse', 'tochapter', 'toverse']),
+        classified = self._classify(parsed_info['reference'])
+        if classified is None:
+            parsed_info['passed'] = False
+            parsed_info['messages'] = 'Ungültiges Muster in der Stellenangabe.'
+            return parsed_info
+
+        pattern_type, components = classified
+        parsed_info['type'] = pattern_type
+        parsed_info.update(components)
 
-            # gen1.1-6
-            (r'^(\d?[a-zöA-ZÖ]+)(\d+)\.(\d+)-(\d+)$', 'FBFCFVTV', ['frombook', 'fromchapter', 'fromverse', 'toverse']),
+        # For 1-chapter books, a little correction might be necessary:
+        # They might have given us "2joh3", "3" looking like a chapter. In this case the plausibility checks
+        # will not work, so we insert "1" as the chapter
+        if parsed_info['type'] in ['FBFC', 'FBFCTC'] \
+            and parsed_info['frombook'] in Books.get_one_chapter_books():
 
-            # gen1.1
-            (r'^(\d?[a-zöA-ZÖ]+)(\d+)\.(\d+)$', 'FBFCFV', ['frombook', 'fromchapter', 'fromverse']),
+            # In reality, what looks like the chapter is the verse
+            parsed_info['fromverse'] = int(parsed_info['fromchapter'])
 
-            # gen1-2
-            (r'^(\d?[a-zöA-ZÖ]+)(\d+)-(\d+)$', 'FBFCTC', ['frombook', 'fromchapter', 'tochapter']),
+            # Same if there is a to-verse
+            if parsed_info['type'] == 'FBFCTC':
+                parsed_info['toverse'] = int(parsed_info['tochapter'])
 
-            # gen1
-            (r'^(\d?[a-zöA-ZÖ]+)(\d+)$', 'FBFC', ['frombook', 'fromchapter']),
+                # Of course the type needs to be changed, for the return and for internal use
+                pattern_type = 'FBFCFVTV'
+                parsed_info['type'] = pattern_type
 
-            # gen-ex
-            (r'^(\d?[a-zöA-ZÖ]+)-(\d?[a-zA-Z]+)$', 'FBTB', ['frombook', 'tobook']),
+                # The reference must be corrected
+                parsed_info['reference'] = parsed_info['frombook'] + '1.' + str(parsed_info['fromverse']) + '-' + \
+                                           str(parsed_info['toverse'])
 
-            # gen
-            (r'^(\d?[a-zöA-ZÖ]+)$', 'FB', ['frombook'])
-        ]
+                # There is no more tochapter anymore
+                parsed_info['tochapter'] = 0
 
-        for pattern, pattern_type, keys in patterns:
-            match = re.match(pattern, parsed_info['reference'])
-            if match:
+            else:
+                pattern_type = 'FBFCFV'
                 parsed_info['type'] = pattern_type
-                for i, key in enumerate(keys):
-                    value = match.group(i + 1) if i + 1 <= len(match.groups()) else 0
-                    # Convert to integers for the relevant keys
-                    if key in ['fromchapter', 'tochapter', 'fromverse', 'toverse']:
-                        parsed_info[key] = int(value)
-                    else:
-                        parsed_info[key] = value
-
-                # For 1-chapter books, a little correction might be necessary:
-                # They might have given us "2joh3", "3" looking like a chapter. In this case the plausibility checks
-                # will not work, so we insert "1" as the chapter
-                if parsed_info['type'] in ['FBFC', 'FBFCTC'] \
-                    and parsed_info['frombook'] in Books.get_one_chapter_books():
-
-                    # In reality, what looks like the chapter is the verse
-                    parsed_info['fromverse'] = int(parsed_info['fromchapter'])
-
-                    # Same if there is a to-verse
-                    if parsed_info['type'] == 'FBFCTC':
-                        parsed_info['toverse'] = int(parsed_info['tochapter'])
-
-                        # Of course the type needs to be changed, for the return and for internal use
-                        pattern_type = 'FBFCFVTV'
-                        parsed_info['type'] = pattern_type
-
-                        # The reference must be corrected
-                        parsed_info['reference'] = parsed_info['frombook'] + '1.' + str(parsed_info['fromverse']) + '-' + \
-                                                   str(parsed_info['toverse'])
-
-                        # There is no more tochapter anymore
-                        parsed_info['tochapter'] = 0
-
-                    else:
-                        pattern_type = 'FBFCFV'
-                        parsed_info['type'] = pattern_type
-                        parsed_info['reference'] = parsed_info['frombook'] + '1.' + str(parsed_info['fromverse'])
-
-                    # In both cases, the chapter is 1
-                    parsed_info['fromchapter'] = 1
-
-
-                # Validation checks
-                errors = []
-
-                # Hopefully the abbreviation(s) is/are valid. If one of them is not, no further checks make sense
-                if not self._biblebooks.is_valid_abbreviation(parsed_info['frombook']):
-                    # This makes the reference invalid
-                    parsed_info['passed'] = False
-                    # Add this information
-                    s = f'Ungültige Abkürzung "{parsed_info["frombook"]}".'
-                    if not parsed_info['messages']:
-                        # There is no other message yet
-                        parsed_info['messages'] = s
-                    else:
-                        # There is a message, we attach ours
-                        parsed_info['messages'] = f"{parsed_info['messages']}\n{s}"
-
-                if parsed_info['tobook'] != '':
-                    if not Books.is_valid_abbreviation(parsed_info['tobook']):
-                        # This makes the reference invalid
-                        parsed_info['passed'] = False
-                        # Add this information
-                        s = f'Ungültige Abkürzung "{parsed_info["tobook"]}".'
-                        if not parsed_info['messages']:
-                            # There is no other message yet
-                            parsed_info['messages'] = s
-                        else:
-                            # There is a message, we attach ours
-                            parsed_info['messages'] = f"{parsed_info['messages']}\n{s}"
-
-                # We can stop here
-                if parsed_info['passed'] is False:
-                    return parsed_info
-
-
-                if pattern_type == 'FBFCTC' and int(parsed_info['tochapter']) <= int(parsed_info['fromchapter']):
-                    errors.append('Bis-Kapitel muss grösser sein als Von-Kapitel.')
-                if pattern_type == 'FBFCFVTCTV' and (int(parsed_info['tochapter']) < int(parsed_info['fromchapter']) or
-                                                     (int(parsed_info['tochapter']) == int(
-                                                         parsed_info['fromchapter']) and
-                                                      int(parsed_info['toverse']) <= int(parsed_info['fromverse']))):
-                    errors.append('To chapter and verse must be greater than from chapter and verse.')
-                if pattern_type == 'FBFCFVTV' and int(parsed_info['toverse']) <= int(parsed_info['fromverse']):
-                    errors.append('Bis-Vers muss grösser sein als Von-Vers.')
-
-                if errors:
-                    parsed_info['messages'] = '\n'.join(errors)
-                    parsed_info['passed'] = False
-
-
-
-
-
-                # In a book span the books might be in the wrong order ("ex-gen")
-                if pattern_type == 'FBTB':
-                    # We made already clear that both abbreviations are valid
-                    if Books.get_sort_value(parsed_info['tobook']) <= Books.get_sort_value(parsed_info['frombook']):
-                        # This makes the reference invalid
-                        parsed_info['passed'] = False
-
-                        s = 'Reihenfolge der Bücher stimmt nicht.'
-                        parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
-
-                        # if not parsed_info['messages']:
-                        #     # There is no other message yet
-                        #     parsed_info['messages'] = s
-                        # else:
-                        #     # There is a message, we attach ours
-                        #     parsed_info['messages'] = f"{parsed_info['messages']}\n{s}"
-
-                # Check if the from-chapter is valid. This is sufficient - a reference of the form
-                # gen1-ex7 will hardly ever occur
-                c = parsed_info['fromchapter']
-                if c != '':
-                    ch = self._biblebooks.get_max_chapter(parsed_info['frombook'])
-                    if int(c) > ch:
-                        parsed_info['passed'] = False
-                        s = f'{parsed_info["frombook"]} hat nur {ch} Kapitel'
-                        parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
-
-
-                # See if we have a from-verse
-                fv = parsed_info['fromverse']
-                if fv != '':
-                    # It must not be bigger than the max verse of the chapter
-                    maxv = self._biblebooks.get_max_verse(parsed_info['frombook'], parsed_info['fromchapter'])
-                    if int(maxv) > maxv:
-                        parsed_info['passed'] = False
-                        s = f'{parsed_info["frombook"]}{parsed_info["fromchapter"]} hat nur {maxv} Verse'
-                        parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
-
-                return parsed_info
-
-        parsed_info['passed'] = False
-        parsed_info['messages'] = 'Ungültiges Muster in der Stellenangabe.'
+                parsed_info['reference'] = parsed_info['frombook'] + '1.' + str(parsed_info['fromverse'])
+
+            # In both cases, the chapter is 1
+            parsed_info['fromchapter'] = 1
+
+
+        # Validation checks
+        errors = []
+
+        # Hopefully the abbreviation(s) is/are valid. If one of them is not, no further checks make sense
+        if not self._biblebooks.is_valid_abbreviation(parsed_info['frombook']):
+            # This makes the reference invalid
+            parsed_info['passed'] = False
+            # Add this information
+            s = f'Ungültige Abkürzung "{parsed_info["frombook"]}".'
+            if not parsed_info['messages']:
+                # There is no other message yet
+                parsed_info['messages'] = s
+            else:
+                # There is a message, we attach ours
+                parsed_info['messages'] = f"{parsed_info['messages']}\n{s}"
+
+        if parsed_info['tobook'] != '':
+            if not self._biblebooks.is_valid_abbreviation(parsed_info['tobook']):
+                # This makes the reference invalid
+                parsed_info['passed'] = False
+                # Add this information
+                s = f'Ungültige Abkürzung "{parsed_info["tobook"]}".'
+                if not parsed_info['messages']:
+                    # There is no other message yet
+                    parsed_info['messages'] = s
+                else:
+                    # There is a message, we attach ours
+                    parsed_info['messages'] = f"{parsed_info['messages']}\n{s}"
+
+        # We can stop here
+        if parsed_info['passed'] is False:
+            return parsed_info
+
+
+        if pattern_type == 'FBFCTC' and int(parsed_info['tochapter']) <= int(parsed_info['fromchapter']):
+            errors.append('Bis-Kapitel muss grösser sein als Von-Kapitel.')
+        if pattern_type == 'FBFCFVTCTV' and (int(parsed_info['tochapter']) < int(parsed_info['fromchapter']) or
+                                             (int(parsed_info['tochapter']) == int(
+                                                 parsed_info['fromchapter']) and
+                                              int(parsed_info['toverse']) <= int(parsed_info['fromverse']))):
+            errors.append('To chapter and verse must be greater than from chapter and verse.')
+        if pattern_type == 'FBFCFVTV' and int(parsed_info['toverse']) <= int(parsed_info['fromverse']):
+            errors.append('Bis-Vers muss grösser sein als Von-Vers.')
+
+        if errors:
+            parsed_info['messages'] = '\n'.join(errors)
+            parsed_info['passed'] = False
+
+
+
+
+
+        # In a book span the books might be in the wrong order ("ex-gen")
+        if pattern_type == 'FBTB':
+            # We made already clear that both abbreviations are valid
+            if self._biblebooks.get_sort_value(parsed_info['tobook']) <= self._biblebooks.get_sort_value(parsed_info['frombook']):
+                # This makes the reference invalid
+                parsed_info['passed'] = False
+
+                s = 'Reihenfolge der Bücher stimmt nicht.'
+                parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
+
+                # if not parsed_info['messages']:
+                #     # There is no other message yet
+                #     parsed_info['messages'] = s
+                # else:
+                #     # There is a message, we attach ours
+                #     parsed_info['messages'] = f"{parsed_info['messages']}\n{s}"
+
+        # Check if the from-chapter is valid. This is sufficient - a reference of the form
+        # gen1-ex7 will hardly ever occur
+        # Book references (gen, gen-ex) have no chapter; all others start with chapter 1
+        if pattern_type not in ('FB', 'FBTB'):
+            c = parsed_info['fromchapter']
+            ch = self._biblebooks.get_max_chapter(parsed_info['frombook'])
+            if int(c) < 1:
+                parsed_info['passed'] = False
+                s = f'{parsed_info["frombook"]} hat kein Kapitel {c}'
+                parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
+            elif int(c) > ch:
+                parsed_info['passed'] = False
+                s = f'{parsed_info["frombook"]} hat nur {ch} Kapitel'
+                parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
+
+
+        # See if we have a from-verse; verses start with 1
+        if pattern_type in ('FBFCFV', 'FBFCFVTV', 'FBFCFVTCTV'):
+            fv = parsed_info['fromverse']
+            # It must not be bigger than the max verse of the chapter.
+            # If the chapter does not exist, there is no max verse - this has been reported above
+            maxv = self._biblebooks.get_max_verse(parsed_info['frombook'], parsed_info['fromchapter'])
+            if int(fv) < 1:
+                parsed_info['passed'] = False
+                s = f'{parsed_info["frombook"]}{parsed_info["fromchapter"]} hat keinen Vers {fv}'
+                parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
+            elif maxv is not None and int(fv) > maxv:
+                parsed_info['passed'] = False
+                s = f'{parsed_info["frombook"]}{parsed_info["fromchapter"]} hat nur {maxv} Verse'
+                parsed_info['messages'] += f'\n{s}' if parsed_info['messages'] else s
+
         return parsed_info
+
+    def get_ordinal_range(self, parsed_info):
+        """
+        Returns the verse ordinals (see Books.get_verse_ordinal()) of the first and the last verse
+        of a parsed reference; None if the reference did not pass the checks
+        Book and chapter references are expanded with the verse counts from books.xml
+        """
+        if not parsed_info['passed']:
+            return None
+
+        books = self._biblebooks
+        pattern_type = parsed_info['type']
+        frombook = parsed_info['frombook']
+
+        if pattern_type == 'FB':
+            return books.get_book_ordinal_range(frombook)
+
+        if pattern_type == 'FBTB':
+            first = books.get_book_ordinal_range(frombook)
+            last = books.get_book_ordinal_range(parsed_info['tobook'])
+            return first[0], last[1]
+
+        if pattern_type == 'FBFC':
+            return books.get_chapter_ordinal_range(frombook, parsed_info['fromchapter'])
+
+        if pattern_type == 'FBFCTC':
+            first = books.get_chapter_ordinal_range(frombook, parsed_info['fromchapter'])
+            last = books.get_chapter_ordinal_range(frombook, parsed_info['tochapter'])
+            if last is None:
+                return None
+            return first[0], last[1]
+
+        first = books.get_verse_ordinal(frombook, parsed_info['fromchapter'], parsed_info['fromverse'])
+        if pattern_type == 'FBFCFV':
+            last = first
+        elif pattern_type == 'FBFCFVTV':
+            last = books.get_verse_ordinal(frombook, parsed_info['fromchapter'], parsed_info['toverse'])
+        else:
+            last = books.get_verse_ordinal(frombook, parsed_info['tochapter'], parsed_info['toverse'])
+
+        # The to-chapter and the to-verse are not checked by parse_reference()
+        if first is None or last is None:
+            return None
+        return first, last
+
+    def get_sort_key(self, parsed_info):
+        """
+        Returns an integer that sorts a parsed reference into canonical order; None if it did not pass the checks
+        The key is first * (n + 1) + last, first and last being the verse ordinals of get_ordinal_range() and n
+        the number of verses (Books.get_verse_count()): by book, chapter and verse, and for the same first verse
+        by the end of the span, so gen1.1 < gen1.1-3 < gen1 < gen. Equal keys mean the same verses
+        """
+        span = self.get_ordinal_range(parsed_info)
+        if span is None:
+            return None
+        return span[0] * (self._biblebooks.get_verse_count() + 1) + span[1]
+
+    def get_references_for_ordinal_range(self, first, last):
+        """
+        The opposite of get_ordinal_range(): returns the shortest normalized references for a range of verse ordinals
+        A range that extends over several books is split into one reference per book (or book span)
+        """
+        books = self._biblebooks
+        references = []
+        while first <= last:
+            book, ch1, v1 = books.get_verse_from_ordinal(first)
+            book_first, book_last = books.get_book_ordinal_range(book)
+            abbrev = book.lower()
+
+            # Whole books: gen, gen-ex
+            if first == book_first and last >= book_last:
+                end_book = book
+                while True:
+                    next_verse = books.get_verse_from_ordinal(book_last + 1)
+                    if next_verse is None or books.get_book_ordinal_range(next_verse[0])[1] > last:
+                        break
+                    end_book = next_verse[0]
+                    book_last = books.get_book_ordinal_range(end_book)[1]
+                references.append(abbrev if end_book == book else f'{abbrev}-{end_book.lower()}')
+                first = book_last + 1
+                continue
+
+            end = min(last, book_last)
+            _, ch2, v2 = books.get_verse_from_ordinal(end)
+
+            # Whole chapters: gen1, gen1-3
+            if v1 == 1 and end == books.get_chapter_ordinal_range(book, ch2)[1]:
+                references.append(f'{abbrev}{ch1}' if ch1 == ch2 else f'{abbrev}{ch1}-{ch2}')
+            elif first == end:
+                references.append(f'{abbrev}{ch1}.{v1}')
+            elif ch1 == ch2:
+                references.append(f'{abbrev}{ch1}.{v1}-{v2}')
+            else:
+                references.append(f'{abbrev}{ch1}.{v1}-{ch2}.{v2}')
+            first = end + 1
+
+        return references
+
+    def parse_references(self, references, processes=1, chunk_size=10000):
+        """
+        Analyses many references, see parse_reference()
+        Yields the results in the order of the references. The references are consumed lazily,
+        so any iterable (e.g. a file or a database cursor) can be processed with constant memory
+        processes: number of worker processes; 1 parses in this process, None uses all cores
+        chunk_size: number of references a worker process gets at once
+        The worker processes use the same aliases, and a cache of the same capacity
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if processes <= 1:
+            parse = self.parse_reference
+            for reference in references:
+                yield parse(reference)
+            return
+
+        cache_size = self._cache.get_stats()['capacity'] if self._cache is not None else None
+        # With a cache, the results are read-only, as those of parse_reference()
+        wrap = MappingProxyType if self._cache is not None else None
+
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self._aliases, cache_size)) as executor:
+            # Only a few chunks are in the pool at any time, so the memory does not grow with the input
+            pending = deque()
+            for chunk in _chunks(references, chunk_size):
+                pending.append(executor.submit(_parse_chunk, chunk))
+                if len(pending) >= 2 * processes:
+                    yield from self._unpack(pending.popleft().result(), wrap)
+            while pending:
+                yield from self._unpack(pending.popleft().result(), wrap)
+
+    @staticmethod
+    def _unpack(results, wrap):
+        return map(wrap, results) if wrap is not None else results
@@ -1,10 +1,37 @@
 # python
-from typing import Dict, Any
+import re
+from typing import Callable, ClassVar, Dict, Any, Iterable, Iterator, List, Mapping, Optional, Tuple
+from .mblaliases import AliasIndex
 from .mblbooks import Books
+from .mblcache import LRUCache
+
+_NORMALIZE: Dict[int, str]
+_REFERENCE: re.Pattern
+
+def _classify_reference(reference: str) -> Optional[Tuple[str, Dict[str, Any]]]: ...
+_worker_references: Optional[References]
+
+def _init_worker(aliases: Optional[AliasIndex], cache_size: Optional[int]) -> None: ...
+def _parse_chunk(chunk: List[str]) -> List[Dict[str, Any]]: ...
+def _chunks(iterable: Iterable[str], size: int) -> Iterator[List[str]]: ...
 
 
 class References:
+    _classify: ClassVar[Callable[[str], Optional[Tuple[str, Dict[str, Any]]]]]
     _biblebooks: Books
+    _cache: Optional[LRUCache]
+    _aliases: Optional[AliasIndex]
 
-    def __init__(self) -> None: ...
-    def parse_reference(self, reference: str) -> Dict[str, Any]: ...
+    def __init__(self, cache: Optional[LRUCache] = ..., aliases: Optional[AliasIndex] = ...) -> None: ...
+    def parse_reference(self, reference: str) -> Mapping[str, Any]: ...
+    def get_cache(self) -> Optional[LRUCache]: ...
+    def get_aliases(self) -> Optional[AliasIndex]: ...
+    def _parse_reference(self, reference: str) -> Dict[str, Any]: ...
+    def get_ordinal_range(self, parsed_info: Mapping[str, Any]) -> Optional[Tuple[int, int]]: ...
+    def get_sort_key(self, parsed_info: Mapping[str, Any]) -> Optional[int]: ...
+    def get_references_for_ordinal_range(self, first: int, last: int) -> List[str]: ...
+    def parse_references(self, references: Iterable[str], processes: Optional[int] = ...,
+                         chunk_size: int = ...) -> Iterator[Mapping[str, Any]]: ...
+    @staticmethod
+    def _unpack(results: List[Dict[str, Any]],
+                wrap: Optional[Callable[[Dict[str, Any]], Mapping[str, Any]]]) -> Iterable[Mapping[str, Any]]: ...
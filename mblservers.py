@@ -1,44 +1,47 @@
 # Everything about Bible servers
-import os
-import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from msbiblelib.mblcatalog import get_catalog, parse_servers
+
+
+def _build_names_index(catalog):
+    # Lower case name -> server record; if a name occurs twice, the first one counts
+    names = {}
+    for server in catalog.servers:
+        names.setdefault(server['name'].lower(), server)
+    return names
+
+
+# Everything Bibleservers takes from the catalog, in one object that is never changed
+_ServersData = namedtuple('_ServersData', ('servers', 'names'))
+
+
+def _build_servers_data(catalog):
+    return _ServersData(catalog.servers, catalog.get_derived('servers.names', _build_names_index))
+
+
+# Attributes of Bibleservers that are taken from the catalog, see Catalog.bind(). One attribute only, so
+# Catalog.reload() replaces all structures at once
+_CATALOG_ATTRIBUTES = {
+    '_data': ('servers.data', _build_servers_data),
+}
 
 
 class Bibleservers:
     def __init__(self):
 
-        # Read the servers data from the xml file. As this is a package, we need to use the absolute path
-        cwd = os.path.dirname(os.path.abspath(__file__))
-        self._servers = self.parse_xml(os.path.join(cwd, 'servers.xml'))
+        # The servers data is read from servers.xml only once per process and shared by all instances;
+        # the attributes are updated by Catalog.reload()
+        get_catalog().bind(self, _CATALOG_ATTRIBUTES)
 
 
     def parse_xml(self, xml_file):
-        servers = []
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        for server in root.findall('bibleserver'):
-            server_dict = {}
-            server_dict['name'] = server.find('name').text
-            server_dict['url'] = server.find('url').text
-            server_dict['chapterurl'] = server.find('chapterurl').text
-            server_dict['status'] = server.find('status').text if server.find('status') is not None else 'active'
-            server_dict['books'] = []
-            for book in server.findall('books/book'):
-                book_dict = {}
-                book_dict['name_de'] = book.get('name_de')
-                book_dict['name_en'] = book.get('name_en') if book.get('name_en') is not None else book.get('name_de')
-                book_dict['name_extra'] = book.get('name_extra') if book.get('name_extra') is not None else book.get('name_de')
-                book_dict['abbreviation'] = book.text
-                server_dict['books'].append(book_dict)
-            servers.append(server_dict)
-        return servers
+        return parse_servers(xml_file)
 
     def get_servers(self):
-        return self._servers
+        # A new list; the records themselves are read-only
+        return list(self._data.servers)
 
 
     def get_server_by_name(self, n):
-        name = n.lower()
-        for srv in self._servers:
-            if name == srv['name'].lower():
-                return srv
-        return None
\ No newline at end of file
+        return self._data.names.get(n.lower())
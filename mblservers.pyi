@@ -0,0 +1,22 @@
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from .mblcatalog import Catalog
+from .mblrecords import ServerRecord
+
+
+
+class _ServersData(NamedTuple):
+    servers: Tuple[ServerRecord, ...]
+    names: Dict[str, ServerRecord]
+
+
+def _build_servers_data(catalog: Catalog) -> _ServersData: ...
+_CATALOG_ATTRIBUTES: Dict[str, Any]
+
+
+class Bibleservers:
+    _data: _ServersData
+
+    def __init__(self) -> None: ...
+    def parse_xml(self, xml_file: str) -> List[Dict[str, Any]]: ...
+    def get_servers(self) -> List[ServerRecord]: ...
+    def get_server_by_name(self, n: str) -> Optional[ServerRecord]: ...
@@ -0,0 +1,343 @@
+# Reference validation as a local service, for programs that are not written in Python
+#
+# Run with: python -m msbiblelib.mblservice [--host 127.0.0.1] [--port 8765] [--unix PATH] [--watch SECONDS]
+#
+# HTTP/JSON over TCP or a Unix socket:
+#   POST /parse   {"reference": "joh3.16"}            -> the result of References.parse_reference()
+#   POST /parse   {"references": ["joh3.16", ...]}    -> a list of results, in the same order
+#   GET  /parse?reference=joh3.16                      -> the result of References.parse_reference()
+#   GET  /stats                                        -> request rate, latency, batches
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from msbiblelib.mblcache import LRUCache
+from msbiblelib.mblcatalog import CatalogWatcher, get_catalog
+from msbiblelib.mblfetch import percentile
+from msbiblelib.mblreferences import References, _parse_chunk
+
+
+# Latencies of this many recent requests are kept for the percentiles
+_LATENCY_WINDOW = 10000
+
+# Largest accepted request body
+_MAX_BODY = 64 * 1024 * 1024
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+}
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ValidationService:
+    """
+    Validates references with References.parse_reference() for HTTP clients
+
+    Requests with a few references are not parsed one by one: they wait up to max_delay seconds in a queue,
+    and all queued references (at most max_batch) are parsed together, each distinct reference only once.
+    Requests with more than max_batch references are parsed as their own batch. Parsing runs outside the
+    event loop (in a thread, or in processes worker processes), so the service keeps accepting requests.
+    All requests share one References object and so one loaded catalog; cache_size enables an LRU cache
+    With watch (seconds), edits of the XML files are picked up while the service runs (see CatalogWatcher),
+    also by the worker processes; the cache is cleared when books.xml changed
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, path=None, max_batch=256, max_delay=0.002, cache_size=None,
+                 processes=1, watch=None):
+        self._host = host
+        self._port = port
+        self._path = path
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._processes = processes
+        self._watch = watch
+
+        self._references = References(cache=LRUCache(cache_size) if cache_size else None)
+
+        self._server = None
+        self._queue = None
+        self._batcher = None
+        self._pool = None
+        self._watcher = None
+
+        # Statistics
+        self._started = None
+        self._requests = 0
+        self._parsed = 0
+        self._batches = 0
+        self._batched = 0
+        self._errors = 0
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        self._request_times = deque(maxlen=_LATENCY_WINDOW)
+
+    # Server
+
+    async def start(self):
+        """Starts listening; returns the bound address (host, port) or the path of the Unix socket"""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batcher())
+        if self._processes > 1:
+            self._pool = ProcessPoolExecutor(self._processes, initializer=_init_worker, initargs=(self._watch,))
+        if self._watch:
+            get_catalog().add_reload_listener(self._on_reload)
+            self._watcher = CatalogWatcher(interval=self._watch).start()
+        self._started = time.monotonic()
+
+        if self._path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self._path)
+            return self._path
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._watcher is not None:
+            self._watcher.stop()
+            get_catalog().remove_reload_listener(self._on_reload)
+            self._watcher = None
+
+    def _on_reload(self, catalog, sources):
+        # The results of parse_reference() only depend on books.xml
+        cache = self._references.get_cache()
+        if cache is not None and 'books' in sources:
+            cache.invalidate()
+
+    # Parsing
+
+    def _parse_batch(self, references):
+        # Runs in a thread
+        parse = self._references.parse_reference
+        return [dict(parse(reference)) for reference in references]
+
+    async def _parse(self, references):
+        loop = asyncio.get_running_loop()
+        self._batches += 1
+        self._parsed += len(references)
+        if self._pool is not None:
+            return await loop.run_in_executor(self._pool, _parse_chunk, references)
+        return await loop.run_in_executor(None, self._parse_batch, references)
+
+    async def _run_batcher(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Give concurrent requests the chance to join the batch
+            if self._queue.qsize() < self._max_batch:
+                await asyncio.sleep(self._max_delay)
+            while len(batch) < self._max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Each distinct reference is parsed once
+            unique = list(dict.fromkeys(reference for reference, _ in batch))
+            try:
+                results = dict(zip(unique, await self._parse(unique)))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._batched += len(batch)
+            for reference, future in batch:
+                if not future.done():
+                    future.set_result(results[reference])
+
+    async def validate(self, references):
+        """Returns the results of parse_reference() for a list of references"""
+        if len(references) > self._max_batch:
+            return await self._parse(references)
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for reference in references:
+            future = loop.create_future()
+            self._queue.put_nowait((reference, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+
+                # If the request cannot be read completely (413, invalid Content-Length, ...), its unread rest
+                # would be taken for the next request: the connection is closed
+                keep_alive = False
+                try:
+                    method, target, headers, body = await self._read_request(reader, request_line)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, response = 200, await self._dispatch(method, target, body)
+                except _HttpError as e:
+                    self._errors += 1
+                    status, response = e.status, {'error': str(e)}
+
+                data = json.dumps(response, ensure_ascii=False).encode('utf-8')
+                writer.write(f'HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json; '
+                             f'charset=utf-8\r\nContent-Length: {len(data)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1'))
+                writer.write(data)
+                await writer.drain()
+
+                self._requests += 1
+                self._latencies.append(time.perf_counter() - start)
+                self._request_times.append(time.monotonic())
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # The client went away, or the service is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, request_line):
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise _HttpError(400, 'Invalid request line')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise _HttpError(400, 'Invalid Content-Length')
+        if length > _MAX_BODY:
+            raise _HttpError(413, 'Request body too large')
+        body = await reader.readexactly(length) if length else b''
+        return parts[0].upper(), parts[1], headers, body
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/stats':
+            if method != 'GET':
+                raise _HttpError(405, 'Use GET')
+            return self.get_stats()
+
+        if url.path != '/parse':
+            raise _HttpError(404, f'Unknown path {url.path}')
+
+        if method == 'GET':
+            references = parse_qs(url.query).get('reference')
+            if not references:
+                raise _HttpError(400, 'Missing parameter "reference"')
+            return (await self.validate(references[:1]))[0]
+
+        if method != 'POST':
+            raise _HttpError(405, 'Use GET or POST')
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            raise _HttpError(400, f'Invalid JSON: {e}')
+
+        if isinstance(request, dict) and isinstance(request.get('reference'), str):
+            return (await self.validate([request['reference']]))[0]
+        if isinstance(request, dict) and isinstance(request.get('references'), list) \
+                and all(isinstance(reference, str) for reference in request['references']):
+            return await self.validate(request['references'])
+        raise _HttpError(400, 'Expected {"reference": "..."} or {"references": ["...", ...]}')
+
+    def get_stats(self):
+        """Request rate (per second, over the uptime and over the recent requests), latency percentiles (seconds)"""
+        uptime = time.monotonic() - self._started if self._started is not None else 0.0
+        recent = self._request_times
+        recent_span = recent[-1] - recent[0] if len(recent) > 1 else 0.0
+        latencies = list(self._latencies)
+        return {
+            'uptime': uptime,
+            'requests': self._requests,
+            'errors': self._errors,
+            'references': self._parsed,
+            'batches': self._batches,
+            'mean_batch_size': self._parsed / self._batches if self._batches else 0.0,
+            'batched_requests': self._batched,
+            'request_rate': self._requests / uptime if uptime > 0 else 0.0,
+            'recent_request_rate': (len(recent) - 1) / recent_span if recent_span > 0 else 0.0,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99),
+            'latency_max': max(latencies) if latencies else None,
+        }
+
+
+# Worker processes of the pool watch the XML files themselves
+_worker_watcher = None
+
+
+def _init_worker(watch):
+    global _worker_watcher
+    if watch:
+        _worker_watcher = CatalogWatcher(interval=watch).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reference validation service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-delay', type=float, default=0.002, help='seconds a request waits for a batch')
+    parser.add_argument('--cache-size', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help='reload edited XML files, checked every SECONDS')
+    args = parser.parse_args(argv)
+
+    service = ValidationService(args.host, args.port, args.unix, args.max_batch, args.max_delay, args.cache_size,
+                                args.processes, args.watch)
+
+    async def run():
+        address = await service.start()
+        print(f'Listening on {address}')
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
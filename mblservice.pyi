@@ -0,0 +1,64 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .mblcatalog import Catalog, CatalogWatcher
+from .mblreferences import References
+
+_LATENCY_WINDOW: int
+_MAX_BODY: int
+_REASONS: Dict[int, str]
+
+
+class _HttpError(Exception):
+    status: int
+
+    def __init__(self, status: int, message: str) -> None: ...
+
+
+class ValidationService:
+    _host: str
+    _port: int
+    _path: Optional[str]
+    _max_batch: int
+    _max_delay: float
+    _processes: int
+    _watch: Optional[float]
+    _references: References
+    _server: Optional[asyncio.AbstractServer]
+    _queue: Optional[asyncio.Queue]
+    _batcher: Optional[asyncio.Task]
+    _pool: Optional[ProcessPoolExecutor]
+    _watcher: Optional[CatalogWatcher]
+    _started: Optional[float]
+    _requests: int
+    _parsed: int
+    _batches: int
+    _batched: int
+    _errors: int
+    _latencies: deque
+    _request_times: deque
+
+    def __init__(self, host: str = ..., port: int = ..., path: Optional[str] = ..., max_batch: int = ...,
+                 max_delay: float = ..., cache_size: Optional[int] = ..., processes: int = ...,
+                 watch: Optional[float] = ...) -> None: ...
+    async def start(self) -> Union[str, Tuple[str, int]]: ...
+    async def serve_forever(self) -> None: ...
+    async def close(self) -> None: ...
+    def _on_reload(self, catalog: Catalog, sources: List[str]) -> None: ...
+    def _parse_batch(self, references: Sequence[str]) -> List[Dict[str, Any]]: ...
+    async def _parse(self, references: Sequence[str]) -> List[Dict[str, Any]]: ...
+    async def _run_batcher(self) -> None: ...
+    async def validate(self, references: Sequence[str]) -> List[Dict[str, Any]]: ...
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None: ...
+    async def _read_request(self, reader: asyncio.StreamReader,
+                            request_line: bytes) -> Tuple[str, str, Dict[str, str], bytes]: ...
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Any: ...
+    def get_stats(self) -> Dict[str, Any]: ...
+
+
+_worker_watcher: Optional[CatalogWatcher]
+
+def _init_worker(watch: Optional[float]) -> None: ...
+def main(argv: Optional[List[str]] = ...) -> None: ...
@@ -0,0 +1,123 @@
+# Sorting, deduplicating and grouping many references in canonical order
+from msbiblelib.mblbooks import Books, _import_numpy
+from msbiblelib.mblreferences import References
+
+
+# Digits of the radix sort, in bits. NumPy sorts 16-bit integers with a counting sort
+_RADIX_BITS = 16
+
+# Below this number of keys, the radix sort does not pay off
+_RADIX_THRESHOLD = 1000
+
+
+def get_sort_keys(references, parser=None):
+    """
+    Returns the sort keys (see References.get_sort_key()) of many references as a list of integers
+    The references can be strings or results of parse_reference(). Invalid references get a key that is higher
+    than all valid keys, so they are sorted to the end, in their original order
+    """
+    if parser is None:
+        parser = References()
+    base = Books().get_verse_count() + 1
+    invalid = base * base
+    parse = parser.parse_reference
+    get_key = parser.get_sort_key
+
+    keys = []
+    for reference in references:
+        if isinstance(reference, str):
+            reference = parse(reference)
+        key = get_key(reference)
+        keys.append(invalid if key is None else key)
+    return keys
+
+
+def argsort_keys(keys):
+    """
+    Returns the positions of the keys in stable sorted order (equal keys keep their order)
+    With NumPy, an LSD radix sort: one stable counting sort per 16-bit digit, linear in the number of keys.
+    Without NumPy, Python's sort, which on plain integers is faster than a radix sort written in Python
+    """
+    np = _import_numpy() if len(keys) >= _RADIX_THRESHOLD else None
+    if np is None:
+        return sorted(range(len(keys)), key=keys.__getitem__)
+
+    keys = np.asarray(keys, dtype=np.uint64)
+    highest = int(keys.max())
+    mask = np.uint64((1 << _RADIX_BITS) - 1)
+    order = np.arange(len(keys))
+    shift = 0
+    while True:
+        digits = ((keys[order] >> np.uint64(shift)) & mask).astype(np.uint16)
+        order = order[np.argsort(digits, kind='stable')]
+        shift += _RADIX_BITS
+        if highest >> shift == 0:
+            return order.tolist()
+
+
+def _sorted_with_keys(references, parser):
+    # (references as a list, their keys, positions in sorted order, key of invalid references)
+    references = list(references)
+    keys = get_sort_keys(references, parser)
+    base = Books().get_verse_count() + 1
+    return references, keys, argsort_keys(keys), base * base
+
+
+def sort_references(references, parser=None):
+    """
+    Returns the references in canonical order (book, chapter, verse, end of the span); invalid references
+    are at the end. The references can be strings or results of parse_reference()
+    """
+    references, _, order, _ = _sorted_with_keys(references, parser)
+    return [references[i] for i in order]
+
+
+def dedupe_references(references, parser=None):
+    """
+    Returns the references in canonical order without duplicates, see sort_references()
+    References for the same verses are duplicates, also if they are written differently ("gen1", "Gen1.1-31"):
+    the first of them is kept. Invalid references are left out
+    """
+    references, keys, order, invalid = _sorted_with_keys(references, parser)
+    result = []
+    previous = None
+    for i in order:
+        key = keys[i]
+        if key >= invalid:
+            break
+        if key != previous:
+            result.append(references[i])
+            previous = key
+    return result
+
+
+def group_by_book(references, parser=None, dedupe=False):
+    """
+    Returns {abbreviation: references of the book in canonical order}, with the books in canonical order
+    A reference belongs to the book it starts in (gen-ex belongs to GEN). Invalid references are left out;
+    with dedupe, duplicates too (see dedupe_references())
+    """
+    books = Books()
+    base = books.get_verse_count() + 1
+    references, keys, order, invalid = _sorted_with_keys(references, parser)
+
+    groups = {}
+    group = None
+    book_last = 0
+    previous = None
+    for i in order:
+        key = keys[i]
+        if key >= invalid:
+            break
+        if dedupe and key == previous:
+            continue
+        previous = key
+
+        # The keys are sorted, so the books follow each other: a new book starts after the last verse of the current
+        first = key // base
+        if first > book_last:
+            abbrev = books.get_verse_from_ordinal(first)[0]
+            book_last = books.get_book_ordinal_range(abbrev)[1]
+            group = groups[abbrev] = []
+        group.append(references[i])
+    return groups
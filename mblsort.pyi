@@ -0,0 +1,16 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from .mblreferences import References
+
+_Reference = Union[str, Mapping[str, Any]]
+
+_RADIX_BITS: int
+_RADIX_THRESHOLD: int
+
+def get_sort_keys(references: Iterable[_Reference], parser: Optional[References] = ...) -> List[int]: ...
+def argsort_keys(keys: Sequence[int]) -> List[int]: ...
+def _sorted_with_keys(references: Iterable[_Reference],
+                      parser: Optional[References]) -> Tuple[List[_Reference], List[int], List[int], int]: ...
+def sort_references(references: Iterable[_Reference], parser: Optional[References] = ...) -> List[_Reference]: ...
+def dedupe_references(references: Iterable[_Reference], parser: Optional[References] = ...) -> List[_Reference]: ...
+def group_by_book(references: Iterable[_Reference], parser: Optional[References] = ...,
+                  dedupe: bool = ...) -> Dict[str, List[_Reference]]: ...
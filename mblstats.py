@@ -0,0 +1,207 @@
+# Instrumentation: call counts and times of the hot paths
+#
+#   from msbiblelib import mblstats
+#   mblstats.enable()
+#   ...
+#   mblstats.get_stats()   # {'Books.get_max_chapter': {'calls': 12, 'seconds': 0.00001}, ...}
+#
+# While disabled, the library runs its original, unwrapped functions, so there is no overhead at all.
+# enable() replaces the instrumented methods on their classes by timing wrappers; disable() puts the originals back.
+# Worker processes of References.parse_references() are not counted.
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from msbiblelib import mblcatalog
+from msbiblelib.mblbooks import Books
+from msbiblelib.mblcoverage import Coverage
+from msbiblelib.mblreferences import References
+from msbiblelib.mblservers import Bibleservers
+from msbiblelib.mblversions import Versions
+
+
+# Classes whose lookups are counted: all public methods whose names start with one of the prefixes
+_LOOKUP_CLASSES = (Books, Versions, Bibleservers, Coverage)
+_LOOKUP_PREFIXES = ('get_', 'is_')
+
+# Validation failures of parse_reference(), recognized by their messages
+_FAILURE_REASONS = (
+    (re.compile(r'^Ungültiges Muster'), 'pattern'),
+    (re.compile(r'^Ungültige Abkürzung'), 'abbreviation'),
+    (re.compile(r'^Reihenfolge der Bücher'), 'book_order'),
+    (re.compile(r'^Bis-Kapitel'), 'chapter_order'),
+    (re.compile(r'^To chapter and verse'), 'chapter_verse_order'),
+    (re.compile(r'^Bis-Vers'), 'verse_order'),
+    (re.compile(r'hat nur \d+ Kapitel$'), 'chapter_range'),
+    (re.compile(r'hat kein Kapitel \d+$'), 'chapter_range'),
+    (re.compile(r'hat nur \d+ Verse$'), 'verse_range'),
+    (re.compile(r'hat keinen Vers \d+$'), 'verse_range'),
+)
+
+_lock = threading.Lock()
+
+# Counter name -> [calls, seconds]
+_counters = {}
+
+# (owner, attribute name, original value) of everything that enable() replaced
+_originals = []
+
+
+def _failure_reasons(messages):
+    reasons = []
+    for message in messages.split('\n'):
+        for pattern, reason in _FAILURE_REASONS:
+            if pattern.search(message):
+                reasons.append(reason)
+                break
+        else:
+            reasons.append('other')
+    return reasons
+
+
+def _count(name, seconds):
+    with _lock:
+        counter = _counters.get(name)
+        if counter is None:
+            _counters[name] = [1, seconds]
+        else:
+            counter[0] += 1
+            counter[1] += seconds
+
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _count(name, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _timed_parse_reference(func):
+    # Like _timed(), and also by type of the reference and by reason of the failure
+    @functools.wraps(func)
+    def parse_reference(self, reference):
+        start = time.perf_counter()
+        parsed_info = func(self, reference)
+        seconds = time.perf_counter() - start
+
+        _count('References.parse_reference', seconds)
+        _count(f'References.parse_reference.type.{parsed_info["type"] or "none"}', seconds)
+        if not parsed_info['passed']:
+            for reason in _failure_reasons(parsed_info['messages']):
+                _count(f'References.parse_reference.failure.{reason}', seconds)
+        return parsed_info
+
+    return parse_reference
+
+
+def _set(owner, attribute, value):
+    # owner is a class, a module or a dictionary
+    if isinstance(owner, dict):
+        owner[attribute] = value
+    else:
+        setattr(owner, attribute, value)
+
+
+def _replace(owner, attribute, value):
+    original = owner[attribute] if isinstance(owner, dict) else getattr(owner, attribute)
+    _originals.append((owner, attribute, original))
+    _set(owner, attribute, value)
+
+
+def enable():
+    """
+    Starts counting; the counters keep their values
+    The XML files are loaded only once per process, so enable() must be called before the first Books, Versions,
+    Bibleservers or References object is created if the loading should be counted
+    """
+    with _lock:
+        if _originals:
+            return
+
+        # XML loading: the parsers used by the catalog, and the snapshot
+        for source, parser in list(mblcatalog._PARSERS.items()):
+            _replace(mblcatalog._PARSERS, source, _timed(f'catalog.parse_{source}', parser))
+        _replace(mblcatalog, 'read_snapshot', _timed('catalog.read_snapshot', mblcatalog.read_snapshot))
+
+        # Lookups; classmethods must stay classmethods
+        for cls in _LOOKUP_CLASSES:
+            for attribute, value in list(vars(cls).items()):
+                if not attribute.startswith(_LOOKUP_PREFIXES):
+                    continue
+                name = f'{cls.__name__}.{attribute}'
+                if isinstance(value, classmethod):
+                    _replace(cls, attribute, classmethod(_timed(name, value.__func__)))
+                elif callable(value):
+                    _replace(cls, attribute, _timed(name, value))
+
+        _replace(References, 'parse_reference', _timed_parse_reference(vars(References)['parse_reference']))
+
+
+def disable():
+    """Stops counting and restores the original functions; the counters keep their values"""
+    with _lock:
+        while _originals:
+            _set(*_originals.pop())
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def reset_stats():
+    with _lock:
+        _counters.clear()
+
+
+def get_stats():
+    """
+    Returns {counter name: {'calls': number of calls, 'seconds': total time}}
+    Counter names: catalog.parse_books/_versions/_servers, catalog.read_snapshot, <Class>.<method> for the lookups,
+    References.parse_reference with .type.<type> (.type.none: no pattern matched) and .failure.<reason>
+    (pattern, abbreviation, book_order, chapter_order, chapter_verse_order, verse_order, chapter_range,
+    verse_range, other). chapter_range and verse_range count numbers beyond the last chapter or verse, and
+    chapter or verse 0. A reference with several failures is counted for each reason
+    """
+    with _lock:
+        return {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in sorted(_counters.items())}
+
+
+def _difference(before, after):
+    result = {}
+    for name, counter in after.items():
+        previous = before.get(name, {'calls': 0, 'seconds': 0.0})
+        calls = counter['calls'] - previous['calls']
+        if calls:
+            result[name] = {'calls': calls, 'seconds': counter['seconds'] - previous['seconds']}
+    return result
+
+
+@contextmanager
+def profile():
+    """
+    Counts the calls of one block of work:
+
+        with mblstats.profile() as stats:
+            ...
+        print(stats)
+
+    The dictionary is filled when the block ends, in the format of get_stats(). Calls by other threads
+    during the block are included. Counting is switched off afterwards, unless it was enabled before
+    """
+    was_enabled = is_enabled()
+    enable()
+    before = get_stats()
+    stats = {}
+    try:
+        yield stats
+    finally:
+        stats.update(_difference(before, get_stats()))
+        if not was_enabled:
+            disable()
@@ -0,0 +1,26 @@
+import re
+import threading
+from typing import Any, Callable, ContextManager, Dict, List, Tuple, TypeVar
+
+_F = TypeVar('_F', bound=Callable[..., Any])
+
+_LOOKUP_CLASSES: Tuple[type, ...]
+_LOOKUP_PREFIXES: Tuple[str, ...]
+_FAILURE_REASONS: Tuple[Tuple[re.Pattern, str], ...]
+_lock: threading.Lock
+_counters: Dict[str, List[Any]]
+_originals: List[Tuple[Any, str, Any]]
+
+def _failure_reasons(messages: str) -> List[str]: ...
+def _count(name: str, seconds: float) -> None: ...
+def _timed(name: str, func: _F) -> _F: ...
+def _timed_parse_reference(func: _F) -> _F: ...
+def _set(owner: Any, attribute: str, value: Any) -> None: ...
+def _replace(owner: Any, attribute: str, value: Any) -> None: ...
+def enable() -> None: ...
+def disable() -> None: ...
+def is_enabled() -> bool: ...
+def reset_stats() -> None: ...
+def get_stats() -> Dict[str, Dict[str, Any]]: ...
+def _difference(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]: ...
+def profile() -> ContextManager[Dict[str, Dict[str, Any]]]: ...
@@ -0,0 +1,201 @@
+# Chapter URLs on the Bible servers
+import re
+
+from msbiblelib.mblbooks import Books
+from msbiblelib.mblcatalog import get_catalog
+from msbiblelib.mblcoverage import Coverage
+from msbiblelib.mblreferences import References
+from msbiblelib.mblservers import Bibleservers
+from msbiblelib.mblversions import Versions
+
+
+# Placeholders in the chapter URLs of servers.xml: {book}, {chapter}, {la}, {language}, {version}, {testament}
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+# Values for {language}
+_LANGUAGE_NAMES = {
+    'de': 'german',
+    'en': 'english',
+    'gr': 'greek',
+    'he': 'hebrew',
+}
+
+# The server's book names that can be used in the URLs
+BOOK_NAME_FIELDS = ('name_de', 'name_en', 'name_extra')
+
+
+class ServerUrlTemplate:
+    """
+    The chapter URL of one server, split into literal parts and placeholders once,
+    with the server's book names by internal abbreviation
+    """
+
+    def __init__(self, server):
+        self.server = server['name']
+
+        # Literal, placeholder, literal, placeholder, ..., literal
+        self._parts = _PLACEHOLDER.split(server['url'] + server['chapterurl'])
+
+        # Upper case abbreviation -> {'name_de': ..., 'name_en': ..., 'name_extra': ...}
+        self._book_names = {book['abbreviation'].upper(): book for book in server['books']}
+
+    def has_book(self, abbrev):
+        return abbrev.upper() in self._book_names
+
+    def get_book_name(self, abbrev, book_name='name_de'):
+        book = self._book_names.get(abbrev.upper())
+        if book is None:
+            return None
+        return book[book_name]
+
+    def bind(self, values):
+        """
+        Fills in all placeholders except {chapter}
+        Returns a format string that only needs the chapter: bind(...).format(3)
+        Unknown placeholders are left in the URL as they are
+        """
+        parts = []
+        for i, part in enumerate(self._parts):
+            if i % 2 == 0:
+                # Literal text; braces must be escaped for format()
+                parts.append(part.replace('{', '{{').replace('}', '}}'))
+            elif part == 'chapter':
+                parts.append('{0}')
+            else:
+                value = values.get(part)
+                value = '{' + part + '}' if value is None else str(value)
+                parts.append(value.replace('{', '{{').replace('}', '}}'))
+        return ''.join(parts)
+
+
+def _build_url_templates(catalog):
+    # Lower case server name -> ServerUrlTemplate
+    templates = {}
+    for server in catalog.servers:
+        templates.setdefault(server['name'].lower(), ServerUrlTemplate(server))
+    return templates
+
+
+class ChapterUrls:
+    """
+    Builds the URLs of chapters of a version on the server that hosts it
+    For many URLs at once, use get_book_urls(), get_version_urls() or get_reference_urls()
+    """
+
+    def __init__(self):
+        self._biblebooks = Books()
+        self._versions = Versions()
+        self._servers = Bibleservers()
+        self._references = References()
+        self._coverage = Coverage()
+        get_catalog().bind(self, {'_templates': ('urls.templates', _build_url_templates)})
+
+    def get_template(self, version):
+        """Returns the ServerUrlTemplate of the server that hosts a version, None if there is none"""
+        server = self._versions.get_version_server(version)
+        if not server:
+            return None
+        return self._templates.get(server.lower())
+
+    def _get_book_name_field(self, record, book_name):
+        # German versions use the German book names, all others the English ones
+        if book_name is not None:
+            if book_name not in BOOK_NAME_FIELDS:
+                raise ValueError(f'Unknown book name field "{book_name}"')
+            return book_name
+        return 'name_de' if record['language'].lower() == 'de' else 'name_en'
+
+    def _bind(self, record, template, abbrev, book_name):
+        # Format string for all chapters of a book in a version; None if the server does not have the book
+        name = template.get_book_name(abbrev, self._get_book_name_field(record, book_name))
+        if name is None:
+            return None
+
+        la = record['language'].lower()
+        testament = self._biblebooks.get_testament(abbrev)
+        return template.bind({
+            'book': name,
+            'la': la,
+            'language': _LANGUAGE_NAMES.get(la, la),
+            'version': record['servername'],
+            'testament': testament.lower() if testament else None,
+        })
+
+    def get_chapter_url(self, version, abbrev, chapter, book_name=None):
+        """
+        Returns the URL of a chapter, None if the version, its server or the book on the server is unknown
+        book_name: 'name_de', 'name_en' or 'name_extra'; default: by the language of the version
+        """
+        record = self._versions.get_version_record(version)
+        template = self.get_template(version)
+        if record is None or template is None:
+            return None
+
+        fmt = self._bind(record, template, abbrev, book_name)
+        return fmt.format(chapter) if fmt is not None else None
+
+    def get_book_urls(self, version, abbrev, book_name=None):
+        """Returns the URLs of all chapters of a book, in order; empty if the version or the book is not available"""
+        record = self._versions.get_version_record(version)
+        template = self.get_template(version)
+        if record is None or template is None:
+            return []
+
+        fmt = self._bind(record, template, abbrev, book_name)
+        max_chapter = self._biblebooks.get_max_chapter(abbrev)
+        if fmt is None or max_chapter is None:
+            return []
+        return [fmt.format(ch) for ch in range(1, max_chapter + 1)]
+
+    def get_version_books(self, version):
+        """Returns the abbreviations of the books that a version contains (content and extracontent), in order"""
+        return self._coverage.get_version_books(version) or []
+
+    def get_version_urls(self, version, book_name=None):
+        """
+        Returns (abbreviation, chapter, URL) for all chapters of all books of a version that its server provides
+        """
+        record = self._versions.get_version_record(version)
+        template = self.get_template(version)
+        if record is None or template is None:
+            return []
+
+        urls = []
+        for abbrev in self.get_version_books(version):
+            fmt = self._bind(record, template, abbrev, book_name)
+            if fmt is None:
+                continue
+            for ch in range(1, self._biblebooks.get_max_chapter(abbrev) + 1):
+                urls.append((abbrev, ch, fmt.format(ch)))
+        return urls
+
+    def get_reference_urls(self, version, references, book_name=None):
+        """
+        Returns (reference, list of URLs) for a list of references: one URL per chapter the reference covers
+        Invalid references get an empty list
+        """
+        record = self._versions.get_version_record(version)
+        template = self.get_template(version)
+
+        # Format strings by book, so each book is bound only once
+        formats = {}
+        result = []
+        for reference in references:
+            urls = []
+            span = self._references.get_ordinal_range(self._references.parse_reference(reference))
+            if record is not None and template is not None and span is not None:
+                abbrev, ch, _ = self._biblebooks.get_verse_from_ordinal(span[0])
+                last_abbrev, last_ch, _ = self._biblebooks.get_verse_from_ordinal(span[1])
+                while True:
+                    if abbrev not in formats:
+                        formats[abbrev] = self._bind(record, template, abbrev, book_name)
+                    fmt = formats[abbrev]
+                    if fmt is not None:
+                        urls.append(fmt.format(ch))
+                    if abbrev == last_abbrev and ch == last_ch:
+                        break
+                    # Next chapter, possibly in the next book
+                    first_of_next = self._biblebooks.get_chapter_ordinal_range(abbrev, ch)[1] + 1
+                    abbrev, ch, _ = self._biblebooks.get_verse_from_ordinal(first_of_next)
+            result.append((reference, urls))
+        return result
@@ -0,0 +1,47 @@
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from .mblbooks import Books
+from .mblcatalog import Catalog
+from .mblcoverage import Coverage
+from .mblreferences import References
+from .mblservers import Bibleservers
+from .mblversions import Versions
+
+_PLACEHOLDER: re.Pattern
+_LANGUAGE_NAMES: Dict[str, str]
+BOOK_NAME_FIELDS: Tuple[str, ...]
+
+
+class ServerUrlTemplate:
+    server: str
+    _parts: List[str]
+    _book_names: Dict[str, Dict[str, Any]]
+
+    def __init__(self, server: Mapping[str, Any]) -> None: ...
+    def has_book(self, abbrev: str) -> bool: ...
+    def get_book_name(self, abbrev: str, book_name: str = ...) -> Optional[str]: ...
+    def bind(self, values: Mapping[str, Any]) -> str: ...
+
+
+def _build_url_templates(catalog: Catalog) -> Dict[str, ServerUrlTemplate]: ...
+
+
+class ChapterUrls:
+    _biblebooks: Books
+    _versions: Versions
+    _servers: Bibleservers
+    _references: References
+    _coverage: Coverage
+    _templates: Dict[str, ServerUrlTemplate]
+
+    def __init__(self) -> None: ...
+    def get_template(self, version: str) -> Optional[ServerUrlTemplate]: ...
+    def _get_book_name_field(self, record: Mapping[str, Any], book_name: Optional[str]) -> str: ...
+    def _bind(self, record: Mapping[str, Any], template: ServerUrlTemplate, abbrev: str,
+              book_name: Optional[str]) -> Optional[str]: ...
+    def get_chapter_url(self, version: str, abbrev: str, chapter: int, book_name: Optional[str] = ...) -> Optional[str]: ...
+    def get_book_urls(self, version: str, abbrev: str, book_name: Optional[str] = ...) -> List[str]: ...
+    def get_version_books(self, version: str) -> List[str]: ...
+    def get_version_urls(self, version: str, book_name: Optional[str] = ...) -> List[Tuple[str, int, str]]: ...
+    def get_reference_urls(self, version: str, references: Iterable[str],
+                           book_name: Optional[str] = ...) -> List[Tuple[str, List[str]]]: ...
@@ -0,0 +1,158 @@
+# Conversion of verse numbers between versions with different versifications
+from array import array
+
+from msbiblelib.mblbooks import Books
+from msbiblelib.mblcatalog import get_catalog
+from msbiblelib.mblreferences import References
+from msbiblelib.mblversions import Versions
+
+
+# Versifications (see versions.xml) -> True if the headings of the psalms are not numbered as verses
+_SCHEMES = {
+    'MT': False,
+    'EN': True,
+}
+
+
+def _build_scheme_tables(catalog, scheme):
+    """
+    Returns (to_mt, from_mt) for a versification: two tables indexed by verse ordinal
+    Verse ordinals are computed from the chapter and verse numbers with the MT verse counts of books.xml,
+    also for verses numbered in another versification (Books.get_verse_ordinal())
+    to_mt[o]: the MT ordinal of the verse with ordinal o in the versification; 0 if there is no such verse
+    from_mt[o]: the ordinal in the versification of the MT verse o; 0 if it has no number there (a heading)
+    """
+    books = Books()
+    count = books.get_verse_count()
+    to_mt = array('L', range(count + 1))
+    from_mt = array('L', range(count + 1))
+    if not _SCHEMES[scheme]:
+        return to_mt, from_mt
+
+    for book in catalog.books:
+        for ch, heading in enumerate(book['headings']):
+            if not heading:
+                continue
+            first, last = books.get_chapter_ordinal_range(book['abbrev'], ch)
+            for o in range(first, last + 1):
+                if o < first + heading:
+                    # The heading has no verse number
+                    from_mt[o] = 0
+                else:
+                    from_mt[o] = o - heading
+                    to_mt[o - heading] = o
+            # The chapter has fewer verses than in MT
+            for o in range(last - heading + 1, last + 1):
+                to_mt[o] = 0
+    return to_mt, from_mt
+
+
+def _build_conversion_table(catalog, from_scheme, to_scheme):
+    # Ordinal in from_scheme -> ordinal in to_scheme (0: no equivalent), through MT
+    to_mt = catalog.get_derived(f'versification.{from_scheme}', lambda c: _build_scheme_tables(c, from_scheme))[0]
+    from_mt = catalog.get_derived(f'versification.{to_scheme}', lambda c: _build_scheme_tables(c, to_scheme))[1]
+    return array('L', (from_mt[o] for o in to_mt))
+
+
+class Versification:
+    """
+    Converts verses between the numbering of two versions
+    MT (the Hebrew text, and most German versions) counts the heading of many psalms as verse 1 (or 1-2);
+    English versions do not number it. The versification of a version is <versification> in versions.xml,
+    the headings are marked in books.xml
+    A version of None stands for the MT numbering
+
+    The conversion uses a table per pair of versifications, built once per process, so whole lists of verses
+    or verse ordinals are converted without any further computation
+    """
+
+    def __init__(self):
+        self._catalog = get_catalog()
+        self._biblebooks = Books()
+        self._versions = Versions()
+        self._references = References()
+
+    def get_scheme(self, version):
+        """Returns the versification of a version; MT for None"""
+        if version is None:
+            return 'MT'
+        scheme = self._versions.get_version_versification(version)
+        if scheme is None:
+            raise ValueError(f'Unknown version "{version}"')
+        if scheme.upper() not in _SCHEMES:
+            raise ValueError(f'Unknown versification "{scheme}" of version "{version}"')
+        return scheme.upper()
+
+    def get_table(self, from_version, to_version):
+        """
+        Returns the conversion table: ordinal in from_version -> ordinal in to_version, 0 if the verse has
+        no equivalent (it is a heading in to_version, or it does not exist in from_version)
+        """
+        from_scheme = self.get_scheme(from_version)
+        to_scheme = self.get_scheme(to_version)
+        return self._catalog.get_derived(f'versification.{from_scheme}.{to_scheme}',
+                                         lambda c: _build_conversion_table(c, from_scheme, to_scheme))
+
+    def convert_ordinals(self, ordinals, from_version, to_version):
+        """
+        Converts verse ordinals (see Books.get_verse_ordinal()) from the numbering of one version to the other
+        Returns an array('L') of the same length; 0 where a verse has no equivalent
+        """
+        table = self.get_table(from_version, to_version)
+        return array('L', map(table.__getitem__, ordinals))
+
+    def convert_verses(self, verses, from_version, to_version):
+        """
+        Converts (abbreviation, chapter, verse) tuples from the numbering of one version to the other
+        Returns a list of tuples; None for verses that do not exist or have no equivalent
+        """
+        table = self.get_table(from_version, to_version)
+        books = self._biblebooks
+        result = []
+        for abbr, ch, v in verses:
+            ordinal = books.get_verse_ordinal(abbr, ch, v)
+            converted = table[ordinal] if ordinal is not None else 0
+            result.append(books.get_verse_from_ordinal(converted) if converted else None)
+        return result
+
+    def convert_verse(self, abbr, ch, v, from_version, to_version):
+        return self.convert_verses([(abbr, ch, v)], from_version, to_version)[0]
+
+    def convert_reference(self, reference, from_version, to_version):
+        """
+        Converts the verse numbers of a reference (see References.parse_reference()) to the other numbering
+        Returns the normalized reference, None if it is invalid or has no equivalent at all
+        Book and chapter references stay as they are. Verses without equivalent are left out of a range:
+        ps3.1-3 (MT) is ps3.1-2 in EN, ps3.1 (the heading in MT) has no equivalent
+        """
+        parsed_info = self._references.parse_reference(reference)
+        span = self._references.get_ordinal_range(parsed_info)
+        if span is None:
+            return None
+
+        pattern_type = parsed_info['type']
+        if pattern_type in ('FB', 'FBTB', 'FBFC', 'FBFCTC'):
+            return parsed_info['reference']
+
+        # The first and the last verse of the range that have an equivalent
+        table = self.get_table(from_version, to_version)
+        first, last = span
+        while first <= last and not table[first]:
+            first += 1
+        while last >= first and not table[last]:
+            last -= 1
+        if first > last:
+            return None
+
+        _, ch1, v1 = self._biblebooks.get_verse_from_ordinal(table[first])
+        _, ch2, v2 = self._biblebooks.get_verse_from_ordinal(table[last])
+        book = parsed_info['frombook']
+        if ch1 == ch2 and v1 == v2:
+            return f'{book}{ch1}.{v1}'
+        if ch1 == ch2:
+            return f'{book}{ch1}.{v1}-{v2}'
+        return f'{book}{ch1}.{v1}-{ch2}.{v2}'
+
+    def convert_references(self, references, from_version, to_version):
+        """Converts a list of references, see convert_reference()"""
+        return [self.convert_reference(reference, from_version, to_version) for reference in references]
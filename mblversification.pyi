@@ -0,0 +1,33 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .mblbooks import Books
+from .mblcatalog import Catalog
+from .mblreferences import References
+from .mblversions import Versions
+
+_SCHEMES: Dict[str, bool]
+
+def _build_scheme_tables(catalog: Catalog, scheme: str) -> Tuple[array, array]: ...
+def _build_conversion_table(catalog: Catalog, from_scheme: str, to_scheme: str) -> array: ...
+
+
+class Versification:
+    _catalog: Catalog
+    _biblebooks: Books
+    _versions: Versions
+    _references: References
+
+    def __init__(self) -> None: ...
+    def get_scheme(self, version: Optional[str]) -> str: ...
+    def get_table(self, from_version: Optional[str], to_version: Optional[str]) -> array: ...
+    def convert_ordinals(self, ordinals: Iterable[int], from_version: Optional[str],
+                         to_version: Optional[str]) -> array: ...
+    def convert_verses(self, verses: Iterable[Tuple[str, int, int]], from_version: Optional[str],
+                       to_version: Optional[str]) -> List[Optional[Tuple[str, int, int]]]: ...
+    def convert_verse(self, abbr: str, ch: int, v: int, from_version: Optional[str],
+                      to_version: Optional[str]) -> Optional[Tuple[str, int, int]]: ...
+    def convert_reference(self, reference: str, from_version: Optional[str],
+                          to_version: Optional[str]) -> Optional[str]: ...
+    def convert_references(self, references: Iterable[str], from_version: Optional[str],
+                           to_version: Optional[str]) -> List[Optional[str]]: ...
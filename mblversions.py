@@ -1,157 +1,155 @@
 # Everything about Bible versions
-import os
-import xml.etree.ElementTree as ET
+from collections import namedtuple
 
+from msbiblelib.mblcatalog import get_catalog, parse_versions
 
-class Versions:
-    def __init__(self):
 
-        # Read the versions data from the xml file. As this is a package, we need to use the absolute path
-        cwd = os.path.dirname(os.path.abspath(__file__))
-        self._versions = self.parse_xml(os.path.join(cwd, 'versions.xml'))
+# Fields of the version records that can be filtered by
+_INDEXED_FIELDS = ('name', 'language', 'server', 'family', 'content')
 
-    def parse_xml(self, xml_file):
-        versions = []
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-
-        for version in root.findall('version'):
-            # helper: safely get text (returns default when missing or None)
-            def t(tag, default=''):
-                val = version.findtext(tag, default)
-                return val if val is not None else default
-
-            extracontent_text = t('extracontent', '')
-            extracontent = (
-                [s.strip() for s in extracontent_text.split(',') if s.strip()]
-                if extracontent_text
-                else None
-            )
-
-            version_dict = {
-                'name': t('name'),
-                'servername': t('servername'),
-                'language': t('language'),
-                'content': t('content'),
-                'server': t('server'),
-                'fullname': t('fullname'),
-                'year': t('year'),
-                'denomination': t('denomination'),
-                'extracontent': extracontent,
-                'comment': t('comment'),
-                'family': t('family'),
-            }
-            versions.append(version_dict)
-
-        return versions
-
-
-    def get_versions_filtered(self, vfilter, lfilter, sfilter):
-        """
 
-        :param vfilter: list of versions
-        :param lfilter: list of languages
-        :param sfilter: name of a Bible server
-        :return:
-        """
+def _build_versions_index(catalog):
+    # Field -> lower case value -> positions of the matching versions (in the order of versions.xml)
+    index = {field: {} for field in _INDEXED_FIELDS}
+    for i, version in enumerate(catalog.versions):
+        for field in _INDEXED_FIELDS:
+            index[field].setdefault((version.get(field) or '').lower(), []).append(i)
+    return {field: {value: tuple(positions) for value, positions in values.items()}
+            for field, values in index.items()}
 
-        # ToDo: validate version name
 
-        version_filter = None
-        language_filter = None
-        server_filter = None
+def _build_names_index(catalog):
+    # Lower case name -> version record; if a name occurs twice, the first one counts
+    names = {}
+    for version in catalog.versions:
+        names.setdefault(version.get('name', '').lower(), version)
+    return names
 
 
-        # Anything to do?
-        # For comparisons we need the arguments lower case
-        if vfilter is None or vfilter == []:
-            b_filter_by_version = False
-        else:
-            b_filter_by_version = True
-            version_filter = [s.lower() for s in vfilter]
+# Everything Versions takes from the catalog, in one object that is never changed
+_VersionsData = namedtuple('_VersionsData', ('versions', 'index', 'names'))
 
-        if lfilter is None or lfilter == []:
-            b_filter_by_language = False
-        else:
-            b_filter_by_language = True
-            language_filter = [s.lower() for s in lfilter]
 
-        if server_filter is None:
-            b_filter_by_server = False
-        else:
-            b_filter_by_server = True
-            server_filter = sfilter.lower()
+def _build_versions_data(catalog):
+    return _VersionsData(
+        catalog.versions,
 
-        # No filters - return the whole list
-        if b_filter_by_version == False and b_filter_by_language == False and b_filter_by_server == False:
-            return self._versions
+        # Indexes for the lookups and filters; the keys are lower case
+        catalog.get_derived('versions.index', _build_versions_index),
+        catalog.get_derived('versions.names', _build_names_index),
+    )
+
+
+# Attributes of Versions that are taken from the catalog, see Catalog.bind(). One attribute only, so
+# Catalog.reload() replaces all structures at once
+_CATALOG_ATTRIBUTES = {
+    '_data': ('versions.data', _build_versions_data),
+}
+
+
+class Versions:
+    def __init__(self):
 
-        a_selected_versions = []
+        # The versions data is read from versions.xml only once per process and shared by all instances;
+        # the attributes are updated by Catalog.reload()
+        get_catalog().bind(self, _CATALOG_ATTRIBUTES)
 
-        # It makes no sense to filter by both version and language - but like this the procedure is the same
-        # for both filters
-        # Iterate through the versions and select those that match the filters
-        for v in self._versions:
+    def parse_xml(self, xml_file):
+        return parse_versions(xml_file)
 
-            # If they want specific versions, no other filters need to be tested.
-            # If a version is in their list, we take it
-            if b_filter_by_version:
 
-                if v['name'].lower() in version_filter:
-                    a_selected_versions.append(v)
+    def get_versions_filtered(self, vfilter, lfilter, sfilter, ffilter=None, cfilter=None):
+        """
 
-            # So they want to filter by language or by server (maybe both)
-            else:
-                # Initialize flags to determine if the current dictionary matches the filters
-                language_match = True
-                server_match = True
+        :param vfilter: list of versions
+        :param lfilter: list of languages
+        :param sfilter: name of a Bible server
+        :param ffilter: list of families
+        :param cfilter: list of contents (FB, NT, OT)
+        :return:
+        """
+
+        # ToDo: validate version name
 
-                # Check the language filter if enabled
-                if b_filter_by_language:
-                    language_match = v.get('language').lower() in language_filter
+        # Indexes and records of the same version of versions.xml, also if it is reloaded meanwhile
+        data = self._data
 
-                # Check the server filter if enabled
-                if b_filter_by_server:
-                    server_match = v.get('server').lower() == server_filter
+        # If they want specific versions, no other filters need to be tested
+        if vfilter:
+            return self._select(data, [self._lookup(data, 'name', vfilter)])
 
-                # If both conditions are met, add the dictionary to a_selected_versions
-                if language_match and server_match:
-                    a_selected_versions.append(v)
+        # Each filter gives a set of positions; the result is their intersection
+        selections = []
+        if lfilter:
+            selections.append(self._lookup(data, 'language', lfilter))
+        if sfilter:
+            selections.append(self._lookup(data, 'server', [sfilter]))
+        if ffilter:
+            selections.append(self._lookup(data, 'family', ffilter))
+        if cfilter:
+            selections.append(self._lookup(data, 'content', cfilter))
 
-        return a_selected_versions
+        # No filters - return the whole list
+        if not selections:
+            return list(data.versions)
+
+        return self._select(data, selections)
+
+    @staticmethod
+    def _lookup(data, field, values):
+        # Positions of the versions whose field has one of the values
+        index = data.index[field]
+        positions = set()
+        for value in values:
+            positions.update(index.get(value.lower(), ()))
+        return positions
+
+    @staticmethod
+    def _select(data, selections):
+        # Intersect the smallest set first, so the work depends on the size of the result, not of the catalog
+        selections.sort(key=len)
+        positions = selections[0]
+        for selection in selections[1:]:
+            positions = positions & selection
+        return [data.versions[i] for i in sorted(positions)]
 
     def get_versions(self):
-        return self._versions
+        # A new list; the records themselves are read-only
+        return list(self._data.versions)
 
     def get_version_record(self, name):
-        for version in self._versions:
-            if version.get('name', '').lower() == name.lower():
-                return version
-        return None
+        return self._data.names.get(name.lower())
 
 
     def get_version_language(self, name):
-        for version in self._versions:
-            if version.get('name', '').lower() == name.lower():
-                return version.get('language')
+        version = self._data.names.get(name.lower())
+        if version is not None:
+            return version.get('language')
         return None
 
     def get_version_content(self, name):
-        for version in self._versions:
-            if version.get('name', '').lower() == name.lower():
-                return version.get('content')
+        version = self._data.names.get(name.lower())
+        if version is not None:
+            return version.get('content')
         return None
 
     def get_version_extracontent(self, name):
-        for version in self._versions:
-            if version.get('name', '').lower() == name.lower():
-                return version.get('extracontent')
+        version = self._data.names.get(name.lower())
+        if version is not None:
+            return version.get('extracontent')
         return None
 
     def get_version_server(self, name):
-        for version in self._versions:
-            if version.get('name', '').lower() == name.lower():
-                return version.get('server')
+        version = self._data.names.get(name.lower())
+        if version is not None:
+            return version.get('server')
+        return None
+
+    def get_version_versification(self, name):
+        # MT or EN, see versions.xml
+        version = self._data.names.get(name.lower())
+        if version is not None:
+            return version.get('versification', 'MT')
         return None
 
 
@@ -162,7 +160,7 @@ class Versions:
         :return: dictionary with information about the hosting server
         """
         # Search the version records for the given name
-        for v in self._versions:
-            if v['name'] == ver['name']:
-                return v
+        v = self._data.names.get(ver['name'].lower())
+        if v is not None and v['name'] == ver['name']:
+            return v
         return None
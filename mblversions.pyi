@@ -1,9 +1,36 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional, Sequence, Set, Tuple
+from .mblcatalog import Catalog
+from .mblrecords import VersionRecord
+
+_INDEXED_FIELDS: Tuple[str, ...]
+
+
+class _VersionsData(NamedTuple):
+    versions: Tuple[VersionRecord, ...]
+    index: Dict[str, Dict[str, Tuple[int, ...]]]
+    names: Dict[str, VersionRecord]
+
+
+def _build_versions_data(catalog: Catalog) -> _VersionsData: ...
+_CATALOG_ATTRIBUTES: Dict[str, Any]
 
 
 class Versions:
+    _data: _VersionsData
+
     def __init__(self) -> None: ...
     def parse_xml(self, xml_file: str) -> List[Dict[str, Any]]: ...
-    def get_versions_filtered(self, vfilter: Optional[List[str]], lfilter: Optional[List[str]], sfilter: Optional[str]) -> List[Dict[str, Any]]: ...
-    def get_versions(self) -> List[Dict[str, Any]]: ...
-    def get_hosting_server(self, ver: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
+    def get_versions_filtered(self, vfilter: Optional[List[str]], lfilter: Optional[List[str]], sfilter: Optional[str],
+                              ffilter: Optional[List[str]] = ..., cfilter: Optional[List[str]] = ...) -> List[VersionRecord]: ...
+    @staticmethod
+    def _lookup(data: _VersionsData, field: str, values: Iterable[str]) -> Set[int]: ...
+    @staticmethod
+    def _select(data: _VersionsData, selections: List[Set[int]]) -> List[VersionRecord]: ...
+    def get_versions(self) -> List[VersionRecord]: ...
+    def get_version_record(self, name: str) -> Optional[VersionRecord]: ...
+    def get_version_language(self, name: str) -> Optional[str]: ...
+    def get_version_content(self, name: str) -> Optional[str]: ...
+    def get_version_extracontent(self, name: str) -> Optional[Tuple[str, ...]]: ...
+    def get_version_server(self, name: str) -> Optional[str]: ...
+    def get_version_versification(self, name: str) -> Optional[str]: ...
+    def get_hosting_server(self, ver: VersionRecord) -> Optional[VersionRecord]: ...